@@ -6,10 +6,11 @@ Add a test product with image to verify image display
 import sqlite3
 import os
 from datetime import datetime
+from config import Config
 
 def add_test_product():
     """Add a test product with image"""
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = sqlite3.connect(Config.DATABASE_PATH)
     cursor = conn.cursor()
     
     # Get first artisan ID
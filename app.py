@@ -18,113 +18,79 @@ import json
 from datetime import datetime
 import hashlib
 import random
+import uuid
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from gcp_services import gcp_services
 from chatbot_service import chatbot_service
+from chat_executor import chat_executor
+from conversation_memory import conversation_memory
+from intent_router import intent_router
+from chatbot_service import FALLBACK_RESPONSES
+from rate_limiter import rate_limiter
+from image_pipeline import load_image_variants
+from image_worker import enqueue_image_job, ensure_embedded_worker, image_worker
+from upload_serving import send_upload, upload_url
+from upload_store import upload_store
+from compression import init_compression
+from metrics import init_metrics
+from query_profiler import init_query_profiler, query_profiler
+from tracing import init_tracing
+from memory_profiler import init_memory_profiler
+from fragment_cache import bump_catalog_version, fragment_cache, get_catalog_version
+from conditional_get import conditional_page, page_etag, parse_timestamp
+from db import connect_db
+from schema import init_db
+from template_cache import init_template_cache
+from assets import init_assets
 
 app = Flask(__name__)
 app.secret_key = Config.SECRET_KEY
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
+app.config['USE_X_SENDFILE'] = Config.UPLOAD_SENDFILE_MODE == 'x-sendfile'
+app.jinja_env.globals['upload_url'] = upload_url
+
+# Trust X-Forwarded-For from our own proxies so per-IP limits see the client
+if Config.TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_COUNT)
+
+# Request, SQL and upstream metrics at /metrics
+init_metrics(app)
+
+# Slow statements and N+1 patterns of sampled requests, for the admin dashboard
+init_query_profiler(app)
+
+# Span trees of sampled requests (SQL, AI calls, template renders)
+init_tracing(app)
+
+# Peak and retained memory per route with MEMORY_PROFILE=true
+init_memory_profiler(app)
+
+# gzip/brotli for HTML and JSON, precompressed CSS/JS
+init_compression(app)
+
+# Fingerprinted CSS/JS bundles with far-future caching
+init_assets(app)
+
+# Load compiled templates from disk and compile all of them before the first request
+init_template_cache(app)
 
 # Create upload directory if it doesn't exist
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
-# Database initialization
-def init_db():
-    conn = sqlite3.connect('artisan_marketplace.db')
-    cursor = conn.cursor()
-    
-    # Create artisans table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS artisans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            name TEXT NOT NULL,
-            location TEXT,
-            language TEXT DEFAULT 'en',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create buyers table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS buyers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            name TEXT NOT NULL,
-            preferences TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create products table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            artisan_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            image_path TEXT,
-            category TEXT NOT NULL,
-            price REAL NOT NULL,
-            ai_story TEXT,
-            language TEXT DEFAULT 'en',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (artisan_id) REFERENCES artisans (id)
-        )
-    ''')
-    
-    # Create cart table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS cart (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            buyer_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity INTEGER DEFAULT 1,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (buyer_id) REFERENCES buyers (id),
-            FOREIGN KEY (product_id) REFERENCES products (id),
-            UNIQUE(buyer_id, product_id)
-        )
-    ''')
-    
-    # Create buyer interactions table for recommendations
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS buyer_interactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            buyer_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            interaction_type TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (buyer_id) REFERENCES buyers (id),
-            FOREIGN KEY (product_id) REFERENCES products (id)
-        )
-    ''')
-    
-    # Create admin table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
 # Initialize database
 init_db()
 
+# Uploads staged by requests that died before committing them
+upload_store.purge_stale_temp_files()
+
+@app.before_request
+def start_image_worker():
+    """Run the image worker in-process when no separate worker service is deployed"""
+    ensure_embedded_worker()
+
 # Helper functions
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -150,7 +116,7 @@ def translate_text(text, target_language, source_language='en'):
 
 def get_recommendations(buyer_id, limit=6):
     """Enhanced recommendation engine using GCP Vertex AI"""
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Get buyer's preferences and interaction history
@@ -224,6 +190,42 @@ def get_recommendations(buyer_id, limit=6):
     conn.close()
     return recommendations
 
+def build_browse_query(category='all', search='', sort_by='newest'):
+    """SQL and parameters for the browse catalog with the given filters"""
+    query = '''
+        SELECT p.category, p.id, p.name, p.description, p.price, p.image_path, p.ai_story, a.name as artisan_name
+        FROM products p
+        JOIN artisans a ON p.artisan_id = a.id
+        WHERE 1=1
+    '''
+    params = []
+    
+    if category != 'all':
+        query += ' AND p.category = ?'
+        params.append(category)
+    
+    if search:
+        query += ' AND (p.name LIKE ? OR p.description LIKE ?)'
+        params.extend([f'%{search}%', f'%{search}%'])
+    
+    # Add sorting
+    if sort_by == 'newest':
+        query += ' ORDER BY p.created_at DESC'
+    elif sort_by == 'oldest':
+        query += ' ORDER BY p.created_at ASC'
+    elif sort_by == 'price_low':
+        query += ' ORDER BY p.price ASC'
+    elif sort_by == 'price_high':
+        query += ' ORDER BY p.price DESC'
+    elif sort_by == 'name':
+        query += ' ORDER BY p.name ASC'
+    
+    return query, params
+
+def cart_total(cart_items):
+    """Sum of price * quantity over cart rows"""
+    return sum(item[5] * item[1] for item in cart_items)
+
 # Routes
 @app.route('/')
 def index():
@@ -233,7 +235,7 @@ def index():
 def register_artisan():
     if request.method == 'POST':
         data = request.get_json()
-        conn = sqlite3.connect('artisan_marketplace.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         try:
@@ -256,7 +258,7 @@ def register_artisan():
 def register_buyer():
     if request.method == 'POST':
         data = request.get_json()
-        conn = sqlite3.connect('artisan_marketplace.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         try:
@@ -279,7 +281,7 @@ def register_buyer():
 def login_artisan():
     if request.method == 'POST':
         data = request.get_json()
-        conn = sqlite3.connect('artisan_marketplace.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -305,7 +307,7 @@ def login_artisan():
 def login_buyer():
     if request.method == 'POST':
         data = request.get_json()
-        conn = sqlite3.connect('artisan_marketplace.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -332,19 +334,26 @@ def artisan_dashboard():
     if 'user_id' not in session or session['user_type'] != 'artisan':
         return redirect(url_for('index'))
     
-    conn = sqlite3.connect('artisan_marketplace.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, name, description, category, price, image_path, ai_story, created_at
-        FROM products WHERE artisan_id = ?
-        ORDER BY created_at DESC
-    ''', (session['user_id'],))
+    artisan_id = session['user_id']
     
-    products = cursor.fetchall()
-    conn.close()
+    def render_products():
+        conn = connect_db()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, name, description, category, price, image_path, ai_story, created_at
+            FROM products WHERE artisan_id = ?
+            ORDER BY created_at DESC
+        ''', (artisan_id,))
+        
+        products = cursor.fetchall()
+        conn.close()
+        
+        images = load_image_variants(product[5] for product in products)
+        return render_template('artisan_products.html', products=products, images=images)
     
-    return render_template('artisan_dashboard.html', products=products)
+    product_list = fragment_cache.get_or_render(('artisan_dashboard', artisan_id), render_products)
+    return render_template('artisan_dashboard.html', product_list=product_list)
 
 @app.route('/buyer_dashboard')
 def buyer_dashboard():
@@ -352,78 +361,88 @@ def buyer_dashboard():
         return redirect(url_for('index'))
     
     recommendations = get_recommendations(session['user_id'])
-    return render_template('buyer_dashboard.html', recommendations=recommendations)
+    images = load_image_variants(product[5] for product in recommendations)
+    return render_template('buyer_dashboard.html', recommendations=recommendations, images=images)
 
 @app.route('/add_product', methods=['POST'])
+@rate_limiter.limit('add_product')
 def add_product():
     if 'user_id' not in session or session['user_type'] != 'artisan':
         return jsonify({'success': False, 'message': 'Unauthorized'})
     
-    # Handle form data (including file upload)
-    if 'image' in request.files:
-        # Handle file upload
-        file = request.files['image']
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Add timestamp to make filename unique
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            image_path = filename
-        else:
-            image_path = None
-    else:
-        # Handle JSON data (from AJAX)
-        data = request.get_json()
-        image_path = None
+    # Handle form data (including file upload), or JSON data (from AJAX)
+    data = request.form if 'image' in request.files else request.get_json()
     
-    # Get form data
-    if 'image' in request.files:
-        name = request.form.get('name')
-        description = request.form.get('description')
-        category = request.form.get('category')
-        price = float(request.form.get('price'))
-        language = request.form.get('language', 'en')
-    else:
+    # Validate before anything is written to disk
+    try:
         name = data['name']
         description = data['description']
         category = data['category']
         price = float(data['price'])
         language = data.get('language', 'en')
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid product details'})
     
-    conn = sqlite3.connect('artisan_marketplace.db')
-    cursor = conn.cursor()
-    
-    # Get artisan name for AI story
-    cursor.execute('SELECT name FROM artisans WHERE id = ?', (session['user_id'],))
-    artisan_data = cursor.fetchone()
-    artisan_name = artisan_data[0] if artisan_data else ""
-    
-    # Generate AI story using GCP services
-    ai_story = generate_ai_story(description, category, artisan_name)
-    
-    # Translate if needed
-    if language != 'en':
-        translated_description = translate_text(description, language)
-        translated_name = translate_text(name, language)
-    else:
-        translated_description = description
-        translated_name = name
+    staged_image = None
+    image_path = None
+    if 'image' in request.files:
+        # Stream the upload to disk and hash it; it is stored under its
+        # content hash once the product row is written
+        file = request.files['image']
+        if file and allowed_file(file.filename):
+            staged_image = upload_store.stage(file.stream, secure_filename(file.filename))
     
-    # Price is already in INR (no conversion needed)
-    cursor.execute('''
-        INSERT INTO products (artisan_id, name, description, category, price, ai_story, language, image_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (session['user_id'], translated_name, translated_description, 
-          category, price, ai_story, language, image_path))
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        
+        # Get artisan name for AI story
+        cursor.execute('SELECT name FROM artisans WHERE id = ?', (session['user_id'],))
+        artisan_data = cursor.fetchone()
+        artisan_name = artisan_data[0] if artisan_data else ""
+        
+        # Generate AI story using GCP services
+        ai_story = generate_ai_story(description, category, artisan_name)
+        
+        # Translate if needed
+        if language != 'en':
+            translated_description = translate_text(description, language)
+            translated_name = translate_text(name, language)
+        else:
+            translated_description = description
+            translated_name = name
+        
+        # Identical images share one stored file
+        if staged_image:
+            image_path, new_image = upload_store.commit(cursor, staged_image)
+        
+        # Price is already in INR (no conversion needed)
+        cursor.execute('''
+            INSERT INTO products (artisan_id, name, description, category, price, ai_story, language, image_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (session['user_id'], translated_name, translated_description, 
+              category, price, ai_story, language, image_path))
+        
+        # Variants are produced by the background image worker; listing pages
+        # show a placeholder until they are ready
+        if staged_image and new_image:
+            enqueue_image_job(cursor, image_path)
+        
+        bump_catalog_version(cursor)
+        conn.commit()
+        conn.close()
+    except Exception:
+        # Don't leave the staged upload behind in the store's temp folder
+        upload_store.discard(staged_image)
+        raise
     
-    conn.commit()
-    conn.close()
+    if staged_image and new_image:
+        image_worker.wake()
     
     return jsonify({'success': True, 'message': 'Product added successfully'})
 
 @app.route('/generate_story', methods=['POST'])
+@rate_limiter.limit('generate_story')
 def generate_story():
     if 'user_id' not in session or session['user_type'] != 'artisan':
         return jsonify({'success': False, 'message': 'Unauthorized'})
@@ -431,7 +450,7 @@ def generate_story():
     data = request.get_json()
     
     # Get artisan name for better story generation
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     cursor.execute('SELECT name FROM artisans WHERE id = ?', (session['user_id'],))
     artisan_data = cursor.fetchone()
@@ -447,11 +466,12 @@ def view_product(product_id):
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('''
-        SELECT p.id, p.name, p.description, p.category, p.price, p.image_path, p.ai_story, a.name as artisan_name
+        SELECT p.id, p.name, p.description, p.category, p.price, p.image_path, p.ai_story, a.name as artisan_name,
+               p.updated_at
         FROM products p
         JOIN artisans a ON p.artisan_id = a.id
         WHERE p.id = ?
@@ -473,7 +493,13 @@ def view_product(product_id):
     if not product:
         return redirect(url_for('index'))
     
-    return render_template('product_detail.html', product=product)
+    # The view is still recorded above; an unchanged page costs one header exchange
+    def render_product():
+        images = load_image_variants([product[5]])
+        return render_template('product_detail.html', product=product, images=images)
+    
+    return conditional_page(page_etag('product', product_id, product[8]), render_product,
+                            last_modified=parse_timestamp(product[8]))
 
 @app.route('/browse')
 def browse():
@@ -486,49 +512,32 @@ def browse():
     search = request.args.get('search', '')
     sort_by = request.args.get('sort', 'newest')
     
-    conn = sqlite3.connect('artisan_marketplace.db')
-    cursor = conn.cursor()
-    
-    # Build query based on filters
-    query = '''
-        SELECT p.category, p.id, p.name, p.description, p.price, p.image_path, p.ai_story, a.name as artisan_name
-        FROM products p
-        JOIN artisans a ON p.artisan_id = a.id
-        WHERE 1=1
-    '''
-    params = []
-    
-    if category != 'all':
-        query += ' AND p.category = ?'
-        params.append(category)
-    
-    if search:
-        query += ' AND (p.name LIKE ? OR p.description LIKE ?)'
-        params.extend([f'%{search}%', f'%{search}%'])
-    
-    # Add sorting
-    if sort_by == 'newest':
-        query += ' ORDER BY p.created_at DESC'
-    elif sort_by == 'oldest':
-        query += ' ORDER BY p.created_at ASC'
-    elif sort_by == 'price_low':
-        query += ' ORDER BY p.price ASC'
-    elif sort_by == 'price_high':
-        query += ' ORDER BY p.price DESC'
-    elif sort_by == 'name':
-        query += ' ORDER BY p.name ASC'
-    
-    cursor.execute(query, params)
-    products = cursor.fetchall()
-    
-    # Get categories for filter dropdown
-    cursor.execute('SELECT DISTINCT category FROM products')
-    categories = [row[0] for row in cursor.fetchall()]
+    def render_catalog():
+        conn = connect_db()
+        cursor = conn.cursor()
+        
+        cursor.execute(*build_browse_query(category, search, sort_by))
+        products = cursor.fetchall()
+        
+        # Get categories for filter dropdown
+        cursor.execute('SELECT DISTINCT category FROM products')
+        categories = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+        
+        images = load_image_variants(product[5] for product in products)
+        
+        return render_template('browse_catalog.html', products=products, categories=categories, images=images,
+                               current_category=category, current_search=search, current_sort=sort_by)
     
-    conn.close()
+    # Filters and grid are shared by everyone; the page around them has the per-user navigation
+    def render_page():
+        catalog = fragment_cache.get_or_render(('browse', category, search, sort_by), render_catalog)
+        return render_template('browse.html', catalog=catalog)
     
-    return render_template('browse.html', products=products, categories=categories, 
-                         current_category=category, current_search=search, current_sort=sort_by)
+    # Unchanged catalog: 304 without touching the cache or templates
+    etag = page_etag('browse', get_catalog_version(), category, search, sort_by)
+    return conditional_page(etag, render_page)
 
 @app.route('/add_to_cart', methods=['POST'])
 def add_to_cart():
@@ -540,7 +549,7 @@ def add_to_cart():
     product_id = data.get('product_id')
     quantity = data.get('quantity', 1)
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     try:
@@ -574,7 +583,7 @@ def cart():
     if 'user_id' not in session or session['user_type'] != 'buyer':
         return redirect(url_for('index'))
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -588,12 +597,13 @@ def cart():
     
     cart_items = cursor.fetchall()
     
-    # Calculate total
-    total = sum(item[5] * item[1] for item in cart_items)  # price * quantity
+    total = cart_total(cart_items)
     
     conn.close()
     
-    return render_template('cart.html', cart_items=cart_items, total=total)
+    images = load_image_variants(item[6] for item in cart_items)
+    
+    return render_template('cart.html', cart_items=cart_items, total=total, images=images)
 
 @app.route('/remove_from_cart', methods=['POST'])
 def remove_from_cart():
@@ -604,7 +614,7 @@ def remove_from_cart():
     data = request.get_json()
     cart_item_id = data.get('cart_item_id')
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('DELETE FROM cart WHERE id = ? AND buyer_id = ?', 
@@ -628,7 +638,7 @@ def update_cart_quantity():
     if quantity <= 0:
         return jsonify({'success': False, 'message': 'Quantity must be positive'})
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('UPDATE cart SET quantity = ? WHERE id = ? AND buyer_id = ?', 
@@ -639,16 +649,16 @@ def update_cart_quantity():
     
     return jsonify({'success': True, 'message': 'Quantity updated'})
 
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    """Serve uploaded files"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Serve uploaded files (immutable when requested with their fingerprint)"""
+    return send_upload(filename)
 
 @app.route('/admin_login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         data = request.get_json()
-        conn = sqlite3.connect('artisan_marketplace.db')
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -675,7 +685,7 @@ def admin_dashboard():
     if 'user_id' not in session or session['user_type'] != 'admin':
         return redirect(url_for('index'))
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
     # Get statistics
@@ -718,17 +728,25 @@ def admin_dashboard():
     }
     
     return render_template('admin_dashboard.html', stats=stats, recent_products=recent_products, 
-                         artisans=artisans, buyers=buyers)
+                         artisans=artisans, buyers=buyers, query_log=query_profiler.report())
 
 @app.route('/admin_delete_product/<int:product_id>')
 def admin_delete_product(product_id):
     if 'user_id' not in session or session['user_type'] != 'admin':
         return redirect(url_for('index'))
     
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = connect_db()
     cursor = conn.cursor()
     
+    cursor.execute('SELECT image_path FROM products WHERE id = ?', (product_id,))
+    product = cursor.fetchone()
+    
     cursor.execute('DELETE FROM products WHERE id = ?', (product_id,))
+    
+    # Delete the image once no other product uses it
+    if product:
+        upload_store.release(cursor, product[0])
+    bump_catalog_version(cursor)
     conn.commit()
     conn.close()
     
@@ -741,6 +759,7 @@ def chatbot_page():
     return render_template('chatbot.html')
 
 @app.route('/api/chat', methods=['POST'])
+@rate_limiter.limit('chat')
 def chat_api():
     """API endpoint for chatbot interactions"""
     try:
@@ -760,12 +779,30 @@ def chat_api():
             user_name = session.get('name', 'User')
             user_context = f"User type: {user_type}, Name: {user_name}"
         
-        # Check if user is asking about products
-        product_keywords = ['product', 'item', 'buy', 'purchase', 'show me', 'find', 'search', 'recommend']
-        if any(keyword in user_message.lower() for keyword in product_keywords):
+        # Each browser session gets its own conversation history
+        chat_session_id = session.get('chat_session_id')
+        if not chat_session_id:
+            chat_session_id = uuid.uuid4().hex
+            session['chat_session_id'] = chat_session_id
+        
+        # Route locally: product searches go to the catalog, confident FAQ
+        # intents get canned answers, everything else goes to the LLM
+        intent, _ = intent_router.route(user_message)
+        if intent == 'product_search':
             response = chatbot_service.get_product_recommendations(user_message)
+        elif intent in FALLBACK_RESPONSES:
+            response = chatbot_service.get_intent_response(intent)
         else:
-            response = chatbot_service.get_chat_response(user_message, user_context)
+            history = conversation_memory.build_history(chat_session_id)
+            # Upstream AI calls go through the bounded pool; when it is saturated
+            # the canned fallback answers immediately instead of holding a worker
+            response = chat_executor.run(
+                chatbot_service.get_chat_response, user_message, user_context, history,
+                fallback=lambda: chatbot_service._get_fallback_response(user_message)
+            )
+        
+        if response.get('success'):
+            conversation_memory.record_exchange(chat_session_id, user_message, response['message'])
         
         return jsonify(response)
         
@@ -776,11 +813,31 @@ def chat_api():
             'message': 'Sorry, I encountered an error. Please try again.'
         })
 
+@app.route('/api/chat/metrics')
+def chat_metrics():
+    """Queue depth, wait time and load-shedding counters for the chat pool"""
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    return jsonify({'success': True, 'metrics': chat_executor.get_metrics()})
+
 @app.route('/logout')
 def logout():
+    if 'chat_session_id' in session:
+        conversation_memory.clear(session['chat_session_id'])
     session.clear()
     return redirect(url_for('index'))
 
+def reset_after_fork():
+    """
+    Called by gunicorn's post_fork hook when the app is preloaded in the
+    master: drop state a worker must not share with its parent. SQLite
+    connections are reopened on next use; GCP and Gemini clients are created
+    lazily per process.
+    """
+    rate_limiter.reset_after_fork()
+    chat_executor.reset_after_fork()
+
 # ...existing code...
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Static asset bundles
+Concatenates and minifies the site's CSS and JS into content-hashed files
+under static/dist with a manifest; templates resolve bundle names through
+asset_urls(), which falls back to the raw source files when no build
+exists (development)
+
+Run as a build step (before `python compression.py`):
+    python assets.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List
+from flask import current_app, request, url_for
+from config import Config
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # bundles are concatenated but not minified
+    rcssmin = rjsmin = None
+
+# Logical bundle name -> source files, relative to static/
+BUNDLES = {
+    'css/site.css': ['css/style.css'],
+    'css/chatbot.css': ['css/style.css', 'css/chatbot.css'],
+    'js/site.js': ['js/main.js'],
+    'js/chatbot.js': ['js/chatbot.js'],
+}
+
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+FINGERPRINT_LENGTH = 10
+
+
+class AssetManifest:
+    def __init__(self, static_folder: str = 'static'):
+        self.static_folder = static_folder
+        self.path = os.path.join(static_folder, DIST_FOLDER, MANIFEST_NAME)
+        self._mtime = None
+        self._entries: Dict[str, str] = {}
+        self._version = ''
+
+    def entries(self) -> Dict[str, str]:
+        """Bundle name -> fingerprinted file, reloaded when the build is rerun"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime, self._entries, self._version = None, {}, ''
+            return self._entries
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+            self._version = hashlib.sha1(json.dumps(self._entries, sort_keys=True).encode()).hexdigest()[:12]
+            self._mtime = mtime
+        return self._entries
+
+    def version(self) -> str:
+        """Digest of the bundle URLs pages link to ('' for the raw sources)"""
+        if not Config.ASSET_BUNDLES_ENABLED:
+            return ''
+        self.entries()
+        return self._version
+
+    def built_at(self) -> float:
+        """Modification time of the manifest (0 without a build)"""
+        self.entries()
+        return self._mtime or 0.0
+
+    def is_stale(self, name: str) -> bool:
+        """True when a source was edited after the bundle was built"""
+        built = os.path.getmtime(os.path.join(self.static_folder, self.entries()[name]))
+        return any(os.path.getmtime(os.path.join(self.static_folder, source)) > built
+                   for source in BUNDLES[name])
+
+    def urls(self, name: str) -> List[str]:
+        entries = self.entries() if Config.ASSET_BUNDLES_ENABLED else {}
+        if name in entries and not (current_app.debug and self.is_stale(name)):
+            return [url_for('static', filename=entries[name])]
+        return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+# Global manifest instance
+asset_manifest = AssetManifest()
+
+
+def asset_urls(name: str) -> List[str]:
+    """URLs to include for a bundle: one fingerprinted file, or its raw sources"""
+    return asset_manifest.urls(name)
+
+
+def cache_fingerprinted_assets(response):
+    """after_request hook: bundles never change under a given name"""
+    if request.path.startswith(f'/static/{DIST_FOLDER}/') and response.status_code in (200, 304):
+        response.cache_control.public = True
+        response.cache_control.max_age = Config.ASSET_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
+
+def init_assets(app):
+    app.jinja_env.globals['asset_urls'] = asset_urls
+    app.after_request(cache_fingerprinted_assets)
+
+
+def minify(name: str, source: str) -> str:
+    if name.endswith('.css') and rcssmin is not None:
+        return rcssmin.cssmin(source)
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(source)
+    return source
+
+
+def build_bundles(static_folder: str = 'static'):
+    """Write fingerprinted bundles and the manifest, replacing the previous build"""
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+        # ';' keeps concatenated scripts from running into each other
+        separator = '\n;\n' if name.endswith('.js') else '\n'
+        content = minify(name, separator.join(parts)).encode('utf-8')
+
+        stem, extension = os.path.splitext(name)
+        digest = hashlib.sha256(content).hexdigest()[:FINGERPRINT_LENGTH]
+        output = f'{DIST_FOLDER}/{stem}.{digest}{extension}'
+        os.makedirs(os.path.dirname(os.path.join(static_folder, output)), exist_ok=True)
+        with open(os.path.join(static_folder, output), 'wb') as f:
+            f.write(content)
+
+        manifest[name] = output
+        raw_size = sum(len(part.encode('utf-8')) for part in parts)
+        print(f"✓ {name} -> {output}: {raw_size} -> {len(content)} bytes")
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if rcssmin is None:
+        print("rcssmin/rjsmin are not installed; bundles were concatenated without minifying")
+    print(f"\nWrote {len(manifest)} bundles and {DIST_FOLDER}/{MANIFEST_NAME}")
+
+if __name__ == "__main__":
+    build_bundles()
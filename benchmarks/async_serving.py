@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Throughput of sync vs gevent gunicorn workers on an AI-bound route
+Starts gunicorn with each worker class and SIMULATED_UPSTREAM_LATENCY
+seconds of delay on the mock Gemini call, then keeps a fixed number of
+concurrent clients posting free-form messages to /api/chat
+
+Run from the project root (uses the local database and mock services):
+    python benchmarks/async_serving.py [--workers 2] [--clients 50] [--duration 20] [--latency 2]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Routed to the LLM by the intent router, so each request waits on the upstream call
+MESSAGE = 'what is the meaning of life'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(worker_class: str, workers: int, latency: float, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_WORKER_CLASS=worker_class,
+               SIMULATED_UPSTREAM_LATENCY=str(latency), GCP_PROJECT_ID='your-project-id', GEMINI_API_KEY='',
+               RATE_LIMIT_ENABLED='false', IMAGE_WORKER_EMBEDDED='false')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login_buyer', timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f'{worker_class} server did not start')
+
+
+def load(port: int, clients: int, duration: float):
+    """Closed-loop load: every client sends its next request as soon as the last one returns"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+    body = json.dumps({'message': MESSAGE}).encode()
+
+    def client():
+        nonlocal errors
+        while time.time() < stop_at:
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/api/chat', data=body,
+                                             headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(request, timeout=60).read()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except OSError:
+                with lock:
+                    errors += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sync and gevent workers under slow upstream calls')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of load per worker class')
+    parser.add_argument('--latency', type=float, default=2.0, help='simulated upstream latency in seconds')
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.clients} concurrent clients, {args.latency}s upstream latency\n")
+    print(f"{'worker class':<14}{'req/s':>8}{'p50 s':>8}{'p95 s':>8}{'upstream':>10}{'fallback':>10}{'errors':>8}")
+    for worker_class in ('sync', 'gevent'):
+        port = free_port()
+        server = start_server(worker_class, args.workers, args.latency, port)
+        try:
+            latencies, errors, elapsed = load(port, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies.sort()
+        # Answers faster than the upstream call came from the executor's load-shedding fallback
+        upstream = sum(1 for latency in latencies if latency >= args.latency)
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        print(f"{worker_class:<14}{len(latencies) / elapsed:>8.1f}{statistics.median(latencies or [0]):>8.2f}"
+              f"{p95:>8.2f}{upstream:>10}{len(latencies) - upstream:>10}{errors:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+First-request latency per route in a fresh worker
+Each mode starts a new Python process (like a new gunicorn worker after a
+deploy or recycle), imports the app and times the first GET of every
+page route:
+
+    cold      no bytecode cache, no warm-up (the previous behaviour)
+    bytecode  templates loaded from the on-disk bytecode cache
+    warm      bytecode cache plus warm-up at import
+
+Run from the project root:
+    python benchmarks/first_request.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (path, session) pairs; only GETs without side effects for the session used
+ROUTES = [
+    ('/', None),
+    ('/login_artisan', None),
+    ('/login_buyer', None),
+    ('/register_artisan', None),
+    ('/register_buyer', None),
+    ('/admin_login', None),
+    ('/chatbot', None),
+    ('/browse', {'user_id': 1, 'user_type': 'artisan', 'name': 'Bench'}),
+    ('/view_product/{product_id}', {'user_id': 1, 'user_type': 'artisan', 'name': 'Bench'}),
+    ('/artisan_dashboard', {'user_id': 1, 'user_type': 'artisan', 'name': 'Bench'}),
+    ('/cart', {'user_id': 1, 'user_type': 'buyer', 'name': 'Bench'}),
+    ('/admin_dashboard', {'user_id': 1, 'user_type': 'admin', 'name': 'Bench'}),
+]
+
+CHILD = '''
+import json, sqlite3, sys, time
+start = time.perf_counter()
+from app import app
+import_seconds = time.perf_counter() - start
+
+from config import Config
+row = sqlite3.connect(Config.DATABASE_PATH).execute('SELECT MIN(id) FROM products').fetchone()
+product_id = row[0] or 1
+
+timings = {}
+for path, user in json.loads(sys.argv[1]):
+    client = app.test_client()
+    if user:
+        with client.session_transaction() as session:
+            session.update(user)
+    path = path.format(product_id=product_id)
+    start = time.perf_counter()
+    response = client.get(path)
+    timings[path] = (time.perf_counter() - start) * 1000
+    response.close()
+print(json.dumps({'import_ms': import_seconds * 1000, 'routes': timings}))
+'''
+
+
+def run_worker(cache_dir: str, warmup: bool):
+    """Import the app in a fresh process and time the first request per route"""
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=cache_dir, TEMPLATE_WARMUP=str(warmup).lower(),
+               IMAGE_WORKER_EMBEDDED='false', RATE_LIMIT_ENABLED='false')
+    output = subprocess.run([sys.executable, '-c', CHILD, json.dumps(ROUTES)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure first-request latency per route')
+    parser.add_argument('--runs', type=int, default=5, help='fresh workers per mode')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='jinja_cache_')
+    run_worker(cache_dir, warmup=True)  # prime the bytecode cache
+
+    modes = [('cold', '', False), ('bytecode', cache_dir, False), ('warm', cache_dir, True)]
+    results = {}
+    for name, directory, warmup in modes:
+        runs = [run_worker(directory, warmup) for _ in range(args.runs)]
+        results[name] = {
+            'import_ms': statistics.median(run['import_ms'] for run in runs),
+            'routes': {path: statistics.median(run['routes'][path] for run in runs)
+                       for path in runs[0]['routes']}
+        }
+
+    paths = list(results['cold']['routes'])
+    width = max(len(path) for path in paths)
+    print(f"Median first-request latency over {args.runs} fresh workers (ms)\n")
+    print(f"{'route':<{width}}  " + ''.join(f'{name:>10}' for name, _, _ in modes))
+    for path in paths:
+        print(f'{path:<{width}}  ' + ''.join(f"{results[name]['routes'][path]:>10.2f}" for name, _, _ in modes))
+
+    print(f"{'max':<{width}}  " + ''.join(f"{max(results[name]['routes'].values()):>10.2f}"
+                                          for name, _, _ in modes))
+    print(f"{'total':<{width}}  " + ''.join(f"{sum(results[name]['routes'].values()):>10.2f}"
+                                            for name, _, _ in modes))
+    print(f"{'app import':<{width}}  " + ''.join(f"{results[name]['import_ms']:>10.2f}" for name, _, _ in modes))
+
+if __name__ == "__main__":
+    main()
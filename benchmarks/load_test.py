@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Route-level load test
+Virtual users log in as synthetic buyers, artisans and admins (accounts
+from generate_data.py) and loop over a weighted mix of page views, cart
+updates and chat messages. Reports requests/s and p50/p95/p99 latency per
+route, and writes JSON that can be compared across commits.
+
+The AI services never reach the cloud: by default they run on the
+in-process mocks (--upstream-latency adds a fixed delay to each call);
+--upstream fake starts fake_upstream.py's server, with the latency
+distributions, error rate and throttling set by FAKE_UPSTREAM_*.
+
+Run from the project root against a generated database:
+    python generate_data.py --size small --output benchmark.db
+    DATABASE_PATH=benchmark.db python benchmarks/load_test.py [--users 10] [--duration 30] \\
+        [--serve | --url http://127.0.0.1:5000] [--output run.json] [--compare baseline.json]
+
+Modes:
+    (default)  in-process, through Flask's test client: measures the app's
+               own cost, without sockets or a WSGI server
+    --serve    starts `python serve.py` on a free port and drives it over HTTP
+    --url      drives an already running server (it must use the same
+               DATABASE_PATH and mock services)
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline: mock translation/story/Gemini paths; one client IP must not be rate limited
+STUB_ENV = {
+    'GCP_PROJECT_ID': 'your-project-id',
+    'GEMINI_API_KEY': '',
+    'RATE_LIMIT_ENABLED': 'false',
+    'IMAGE_WORKER_EMBEDDED': 'false',
+}
+
+# Share of virtual users per role
+ROLES = {'buyer': 90, 'artisan': 8, 'admin': 2}
+
+# Weighted actions per role
+MIX = {
+    'buyer': {'browse': 25, 'view_product': 30, 'add_to_cart': 10, 'cart': 10, 'buyer_dashboard': 10, 'chat': 15},
+    'artisan': {'artisan_dashboard': 50, 'browse': 25, 'view_product': 25},
+    'admin': {'admin_dashboard': 100},
+}
+
+CATEGORIES = ['handicraft', 'jewelry', 'textile', 'pottery', 'woodwork']
+SORTS = ['newest', 'oldest', 'price_low', 'price_high', 'name']
+SEARCHES = ['vase', 'necklace', 'scarf', 'handcrafted', 'wooden', 'silk']
+# Intent hits, product searches and free-form questions routed to the (stubbed) LLM
+CHAT_MESSAGES = ['hello', 'how do I register?', 'show me pottery', 'silver necklace under 3000',
+                 'what makes handmade textiles special?', 'tell me about the artisans here']
+
+
+class InProcessClient:
+    """One logged-in session through Flask's test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None) -> int:
+        response = self.client.open(path, method=method, json=body)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects (e.g. to a login page) instead of following them"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """One logged-in session against a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, body=None) -> int:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return 0
+
+
+class Dataset:
+    """Account and product ids from the database under test"""
+
+    def __init__(self, db_path):
+        conn = sqlite3.connect(db_path)
+        self.counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                       for table in ('artisans', 'buyers', 'admins', 'products', 'buyer_interactions')}
+        self.product_ids = [row[0] for row in conn.execute('SELECT id FROM products ORDER BY id')]
+        self.usernames = {
+            role: [row[0] for row in conn.execute(f"SELECT username FROM {table} WHERE username LIKE ?",
+                                                  (f'{role}_______',))]
+            for role, table in (('buyer', 'buyers'), ('artisan', 'artisans'), ('admin', 'admins'))
+        }
+        conn.close()
+        missing = [role for role, names in self.usernames.items() if not names]
+        if missing or not self.product_ids:
+            raise SystemExit(f"{db_path} has no synthetic {', '.join(missing) or 'products'}; "
+                             "create one with generate_data.py and set DATABASE_PATH")
+
+        # Views follow the same Zipfian popularity as the generated interactions
+        from generate_data import PRODUCT_POPULARITY_SKEW, zipf_cum_weights
+        self.product_weights = zipf_cum_weights(len(self.product_ids), PRODUCT_POPULARITY_SKEW)
+
+
+def next_request(role, rng, dataset):
+    """(route name, method, path, JSON body) for the user's next action"""
+    actions = MIX[role]
+    action = rng.choices(list(actions), weights=list(actions.values()))[0]
+    if action == 'browse':
+        params = []
+        if rng.random() < 0.7:
+            params.append(f'category={rng.choice(CATEGORIES)}')
+        if rng.random() < 0.2:
+            params.append(f'search={rng.choice(SEARCHES)}')
+        params.append(f'sort={rng.choice(SORTS)}')
+        return 'GET /browse', 'GET', '/browse?' + '&'.join(params), None
+    if action in ('view_product', 'add_to_cart'):
+        product_id = rng.choices(dataset.product_ids, cum_weights=dataset.product_weights)[0]
+        if action == 'view_product':
+            return 'GET /view_product/<id>', 'GET', f'/view_product/{product_id}', None
+        return 'POST /add_to_cart', 'POST', '/add_to_cart', {'product_id': product_id, 'quantity': 1}
+    if action == 'chat':
+        return 'POST /api/chat', 'POST', '/api/chat', {'message': rng.choice(CHAT_MESSAGES)}
+    return f'GET /{action}', 'GET', f'/{action}', None
+
+
+def login(client, role, username) -> bool:
+    path = {'buyer': '/login_buyer', 'artisan': '/login_artisan', 'admin': '/admin_login'}[role]
+    return client.request('POST', path, {'username': username, 'password': 'password123'}) == 200
+
+
+def run_load(make_client, dataset, users, duration, warmup, think, seed):
+    """Closed loop: each virtual user sends its next request when the last one returns"""
+    samples = []  # (route, seconds, ok)
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+    roles = [role for role, share in ROLES.items() for _ in range(share)]
+
+    def user(index):
+        rng = random.Random(f'{seed}:{index}')
+        role = roles[index * len(roles) // max(users, 1) % len(roles)]
+        client = make_client()
+        if not login(client, role, rng.choice(dataset.usernames[role])):
+            print(f"user {index}: {role} login failed", file=sys.stderr)
+            return
+        while True:
+            route, method, path, body = next_request(role, rng, dataset)
+            began = time.monotonic()
+            if began >= stop_at:
+                return
+            status = client.request(method, path, body)
+            elapsed = time.monotonic() - began
+            if began >= measure_from:
+                with lock:
+                    samples.append((route, elapsed, 200 <= status < 300 or status == 304))
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(samples, duration):
+    def stats(entries):
+        latencies = sorted(seconds * 1000 for _, seconds, _ in entries)
+        return {
+            'requests': len(entries),
+            'errors': sum(1 for _, _, ok in entries if not ok),
+            'rps': round(len(entries) / duration, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        }
+
+    routes = {}
+    for sample in samples:
+        routes.setdefault(sample[0], []).append(sample)
+    return {'total': stats(samples), 'routes': {route: stats(routes[route]) for route in sorted(routes)}}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(env) -> tuple:
+    port = free_port()
+    server = subprocess.Popen([sys.executable, 'serve.py'], cwd=ROOT, env=dict(env, PORT=str(port)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/login_buyer', timeout=1).read()
+            return server, base_url
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError('server did not start')
+
+
+def print_table(result, baseline=None):
+    """Human-readable summary on stderr; with a baseline, rps and p95 change per route"""
+    header = f"{'route':<26}{'req':>7}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header + ('  vs baseline (rps / p95)' if baseline else ''), file=sys.stderr)
+    rows = list(result['routes'].items()) + [('total', result['total'])]
+    for route, stats in rows:
+        line = (f"{route:<26}{stats['requests']:>7}{stats['errors']:>5}{stats['rps']:>8.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        before = baseline['total'] if baseline and route == 'total' else (baseline or {}).get('routes', {}).get(route)
+        if before:
+            def change(new, old):
+                return f"{(new - old) / old * 100:+.0f}%" if old else 'n/a'
+            line += f"  {change(stats['rps'], before['rps']):>7} / {change(stats['p95_ms'], before['p95_ms'])}"
+        print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the marketplace routes with synthetic users')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--serve', action='store_true', help='start serve.py and test it over HTTP')
+    target.add_argument('--url', help='test a running server at this base URL')
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='unmeasured seconds before the run')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between a user\'s requests (s)')
+    parser.add_argument('--upstream', choices=['mock', 'fake'], default='mock',
+                        help='in-process mock AI services, or the fake upstream server')
+    parser.add_argument('--upstream-latency', type=float, default=0.0, help='delay added to each mock AI call (s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON result here instead of stdout')
+    parser.add_argument('--compare', help='JSON result of an earlier run to compare against')
+    args = parser.parse_args()
+
+    env = dict(os.environ, **STUB_ENV, SIMULATED_UPSTREAM_LATENCY=str(args.upstream_latency),
+               AI_BACKEND=args.upstream)
+    if args.upstream == 'fake':
+        env['FAKE_UPSTREAM_URL'] = f'http://127.0.0.1:{free_port()}'
+    os.environ.update(env)
+    os.chdir(ROOT)
+    from config import Config
+    fake_upstream = None
+    if args.upstream == 'fake':
+        from fake_upstream import FakeUpstream, FakeUpstreamServer
+        port = int(Config.FAKE_UPSTREAM_URL.rsplit(':', 1)[1])
+        fake_upstream = FakeUpstreamServer(('127.0.0.1', port), FakeUpstream(seed=args.seed)).start()
+    dataset = Dataset(Config.DATABASE_PATH)
+
+    server = None
+    if args.serve or args.url:
+        if args.serve:
+            server, base_url = start_server(env)
+        else:
+            base_url = args.url
+        make_client = lambda: HttpClient(base_url)
+        mode = 'serve' if args.serve else 'url'
+    else:
+        from app import app
+        make_client = lambda: InProcessClient(app)
+        mode = 'in-process'
+
+    try:
+        samples = run_load(make_client, dataset, args.users, args.duration, args.warmup, args.think, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        if fake_upstream:
+            fake_upstream.shutdown()
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'mode': mode,
+        'users': args.users,
+        'duration_s': args.duration,
+        'upstream': args.upstream,
+        'upstream_latency_s': args.upstream_latency,
+        'seed': args.seed,
+        'database': os.path.basename(Config.DATABASE_PATH),
+        'dataset': dataset.counts,
+        **summarize(samples, args.duration),
+    }
+    if fake_upstream:
+        result['upstream_calls'] = fake_upstream.upstream.stats
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(result, baseline)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"\nWrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Per-route memory budgets
+Generates the synthetic dataset named in the budgets file, requests each
+budgeted route through Flask's test client (logged in as the listed role)
+and measures its peak and retained memory with tracemalloc. Exits 1 when a
+route goes over its budget and prints where that route's memory went.
+
+Run from the project root (test_memory_budgets.py runs it too):
+    python benchmarks/memory_budgets.py [--db benchmark.db] [--update]
+
+--update rewrites the budgets from this run's measurements plus the file's
+headroom; commit the new file together with the change that needed it.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from load_test import STUB_ENV, InProcessClient, login
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'memory_budgets.json')
+# Background threads allocate while a request is measured: budgets allow at least this much over
+NOISE_KB = 64
+
+# Profile only what this script measures; keep the other samplers quiet
+PROFILE_ENV = {
+    'MEMORY_PROFILE': 'true',
+    'MEMORY_PROFILE_SAMPLE_RATE': '0',
+    'TRACE_SAMPLE_RATE': '0',
+    'QUERY_PROFILE_SAMPLE_RATE': '0',
+}
+
+
+def measure_routes(routes, repeat, sites=False):
+    """
+    Worst peak of each route over repeat requests, after a warm-up request,
+    and the least it retained: a leak keeps memory on every request, while
+    background threads (metrics flusher, chat executor) only sometimes
+    allocate while a request is measured. Snapshots for the top sites hold
+    memory of their own, so budgets are measured without them and
+    sites=True is only for reports.
+    """
+    from app import app
+    from memory_profiler import memory_profiler
+
+    clients = {}
+    results = {}
+    for name, route in routes.items():
+        role = route.get('as')
+        if role not in clients:
+            client = clients[role] = InProcessClient(app)
+            if role and not login(client, role, f'{role}0000001'):
+                raise SystemExit(f"Could not log in as {role}0000001")
+        client = clients[role]
+        method, path = name.split(' ', 1)
+        body = route.get('json')
+
+        status = client.request(method, path, body)
+        if status >= 400:
+            raise SystemExit(f"{name} returned {status}")
+        profiles = [memory_profiler.measure(lambda: client.request(method, path, body), name, sites)[1]
+                    for _ in range(repeat)]
+        worst = max(profiles, key=lambda profile: profile.peak)
+        results[name] = worst._replace(retained=min(profile.retained for profile in profiles))
+    return results
+
+
+def budget_kb(measured, headroom):
+    """Budget for a measured byte count, rounded up to 10 KB"""
+    kb = max(measured, 0) / 1024
+    return math.ceil(max(kb * headroom, kb + NOISE_KB) / 10) * 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check per-route memory budgets on the synthetic dataset')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+    parser.add_argument('--db', help='existing synthetic database (default: generate the one the budgets name)')
+    parser.add_argument('--repeat', type=int, default=3, help='measured requests per route')
+    parser.add_argument('--update', action='store_true', help='write the measured values (plus headroom) as budgets')
+    args = parser.parse_args()
+
+    with open(args.budgets) as f:
+        budgets = json.load(f)
+    dataset = budgets['dataset']
+
+    workdir = tempfile.mkdtemp(prefix='memory-budgets-')
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, 'budgets.db')
+    os.environ.update(STUB_ENV, **PROFILE_ENV, DATABASE_PATH=db_path, METRICS_DIR=os.path.join(workdir, 'metrics'))
+    os.chdir(ROOT)
+    if not args.db:
+        from generate_data import generate
+        generate(db_path, dataset['size'], dataset['seed'])
+
+    results = measure_routes(budgets['routes'], args.repeat)
+
+    if args.update:
+        for name, profile in results.items():
+            budgets['routes'][name]['peak_kb'] = budget_kb(profile.peak, budgets['headroom'])
+            budgets['routes'][name]['retained_kb'] = budget_kb(profile.retained, budgets['headroom'])
+        with open(args.budgets, 'w') as f:
+            json.dump(budgets, f, indent=2)
+            f.write('\n')
+        print(f"Updated {args.budgets}")
+
+    print(f"\nMemory per request on the '{dataset['size']}' dataset (peak: worst of {args.repeat}, retained: least):")
+    print(f"{'route':40} {'peak KB':>16} {'retained KB':>16}")
+    over = []
+    for name, profile in results.items():
+        budget = budgets['routes'][name]
+        peak_kb, retained_kb = profile.peak / 1024, profile.retained / 1024
+        failed = peak_kb > budget['peak_kb'] or retained_kb > budget['retained_kb']
+        print(f"{name:40} {peak_kb:7.0f} / {budget['peak_kb']:<6} {retained_kb:7.0f} / {budget['retained_kb']:<6}"
+              f"{'  OVER BUDGET' if failed else ''}")
+        if failed:
+            over.append(name)
+
+    if over:
+        # One more run per failing route, this time recording where the memory went
+        for profile in measure_routes({name: budgets['routes'][name] for name in over}, 1, sites=True).values():
+            print(f"\n{profile.route}: largest allocations when rendering started")
+            for site in profile.top_sites:
+                print(f"  {site.size / 1024:9.1f} KB  {site.count:7} blocks  {site.location}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
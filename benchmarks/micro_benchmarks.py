@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot functions
+Times the functions behind the busiest pages on synthetic datasets of
+several sizes, each in a fresh process:
+
+    get_recommendations    buyer dashboard recommendations (mock Vertex AI)
+    browse_build           build_browse_query for a search
+    browse_all             browse catalog query, all products, newest first
+    browse_search          browse catalog query for a search, cheapest first
+    chatbot_search         ChatbotService.get_product_recommendations
+    mock_story             GCPServices._mock_generate_story
+    cart_total             cart_total over the largest cart
+
+Every run is appended to a JSONL history and compared with a saved
+baseline: a benchmark regressed when its samples are slower with a one-sided
+Mann-Whitney U p-value under --alpha and its median grew by more than
+--threshold. Regressions exit 1.
+
+Run from the project root:
+    python benchmarks/micro_benchmarks.py [--sizes tiny small] [--save-baseline]
+
+Timings only compare on the same machine, so the history and baseline
+live in benchmarks/results/ (not committed). Generated databases are
+reused from --data-dir when given.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from load_test import STUB_ENV, git_commit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BENCHMARKS = ['get_recommendations', 'browse_build', 'browse_all', 'browse_search',
+              'chatbot_search', 'mock_story', 'cart_total']
+
+
+def make_benchmarks():
+    """Zero-argument callables for each benchmark, on the database in DATABASE_PATH"""
+    from app import build_browse_query, cart_total, get_recommendations
+    from chatbot_service import chatbot_service
+    from db import connect_db
+    from gcp_services import gcp_services
+    from search_index import product_search_index
+
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT buyer_id FROM buyer_interactions WHERE interaction_type = 'view'
+        GROUP BY buyer_id ORDER BY COUNT(*) DESC, buyer_id LIMIT 1
+    ''')
+    buyer_id = cursor.fetchone()[0]
+    cursor.execute('SELECT buyer_id FROM cart GROUP BY buyer_id ORDER BY COUNT(*) DESC, buyer_id LIMIT 1')
+    cart_buyer_id = cursor.fetchone()[0]
+    # Same columns as the cart page
+    cursor.execute('''
+        SELECT c.id, c.quantity, p.id, p.name, p.description, p.price, p.image_path, a.name as artisan_name
+        FROM cart c
+        JOIN products p ON c.product_id = p.id
+        JOIN artisans a ON p.artisan_id = a.id
+        WHERE c.buyer_id = ?
+    ''', (cart_buyer_id,))
+    cart_items = cursor.fetchall()
+    cursor.execute('SELECT description FROM products ORDER BY id LIMIT 1')
+    description = cursor.fetchone()[0]
+    conn.close()
+    product_search_index.refresh(force=True)
+
+    def browse(category, search, sort_by):
+        conn = connect_db()
+        rows = conn.execute(*build_browse_query(category, search, sort_by)).fetchall()
+        conn.close()
+        return rows
+
+    return {
+        'get_recommendations': lambda: get_recommendations(buyer_id),
+        'browse_build': lambda: build_browse_query('jewelry', 'silver', 'price_low'),
+        'browse_all': lambda: browse('all', '', 'newest'),
+        'browse_search': lambda: browse('all', 'silver', 'price_low'),
+        'chatbot_search': lambda: chatbot_service.get_product_recommendations('handmade silver jewelry for a gift'),
+        'mock_story': lambda: gcp_services._mock_generate_story(description, 'pottery', 'Asha'),
+        'cart_total': lambda: cart_total(cart_items),
+    }
+
+
+def calibrate(fn, min_time):
+    """Calls per sample for a sample to take at least min_time"""
+    fn()  # warm caches and the bytecode
+    loops = 1
+    while True:
+        elapsed = _run(fn, loops)
+        if elapsed >= min_time:
+            return loops
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.1))
+
+
+def _run(fn, loops):
+    """Seconds for loops calls of fn, with the garbage collector off (as timeit does)"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def summarize(loops, seconds):
+    """Per-call statistics in microseconds, with the samples kept for later comparisons"""
+    samples = [s * 1e6 for s in seconds]
+    quartiles = statistics.quantiles(samples, n=4)
+    return {
+        'loops': loops,
+        'median_us': round(statistics.median(samples), 3),
+        'mean_us': round(statistics.fmean(samples), 3),
+        'stdev_us': round(statistics.stdev(samples), 3),
+        'min_us': round(min(samples), 3),
+        'iqr_us': round(quartiles[2] - quartiles[0], 3),
+        'samples_us': [round(s, 3) for s in samples],
+    }
+
+
+def mann_whitney_p(before, after):
+    """
+    One-sided p-value for after being slower than before: Mann-Whitney U
+    with the normal approximation, tie correction and continuity correction.
+    Needs no assumption about the shape of the timing distribution.
+    """
+    n1, n2 = len(before), len(after)
+    if not n1 or not n2:
+        return 1.0
+    values = sorted([(v, 0) for v in before] + [(v, 1) for v in after])
+    ranks = [0.0] * len(values)
+    tie_sum = 0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tie_sum += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+
+    u = sum(rank for rank, (_, group) in zip(ranks, values) if group == 1) - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_sum / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(result, baseline, alpha, threshold):
+    """(size, benchmark, baseline median, median, p-value, verdict) for benchmarks in both runs"""
+    rows = []
+    for size, benchmarks in result['sizes'].items():
+        for name, stats in benchmarks.items():
+            before = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not before:
+                continue
+            change = stats['median_us'] / before['median_us'] - 1
+            slower = mann_whitney_p(before['samples_us'], stats['samples_us'])
+            faster = mann_whitney_p(stats['samples_us'], before['samples_us'])
+            if slower < alpha and change > threshold:
+                verdict = 'REGRESSION'
+            elif faster < alpha and change < -threshold:
+                verdict = 'faster'
+            else:
+                verdict = ''
+            rows.append((size, name, before['median_us'], stats['median_us'], min(slower, faster), verdict))
+    return rows
+
+
+def measure(args):
+    """
+    Child process: benchmark the database in DATABASE_PATH and print seconds
+    per call as JSON. Samples are taken in rounds over all benchmarks, so a
+    burst of noise from the rest of the machine doesn't land on one of them.
+    """
+    benchmarks = make_benchmarks()
+    loops = {name: calibrate(benchmarks[name], args.min_time) for name in args.benchmarks}
+    seconds = {name: [] for name in args.benchmarks}
+    for _ in range(args.samples):
+        for name in args.benchmarks:
+            seconds[name].append(_run(benchmarks[name], loops[name]) / loops[name])
+    print(json.dumps({name: {'loops': loops[name], 'seconds': seconds[name]} for name in args.benchmarks}))
+
+
+def run_size(size, args, workdir):
+    """
+    Generate (or reuse) the size's database and benchmark it in --processes
+    fresh processes; their samples are pooled, so differences between
+    processes (memory layout, caches) are part of the measured spread.
+    """
+    db_path = os.path.join(args.data_dir or workdir, f'micro-{size}-{args.seed}.db')
+    if not os.path.exists(db_path):
+        from generate_data import generate
+        generate(db_path, size, args.seed)
+
+    env = dict(os.environ, **STUB_ENV, DATABASE_PATH=db_path, PYTHONHASHSEED='0', METRICS_ENABLED='false',
+               METRICS_DIR=os.path.join(workdir, 'metrics'), TRACE_SAMPLE_RATE='0',
+               QUERY_PROFILE_SAMPLE_RATE='0', MEMORY_PROFILE='false')
+    command = [sys.executable, os.path.abspath(__file__), '--measure', '--samples', str(args.samples),
+               '--min-time', str(args.min_time), '--benchmarks', *args.benchmarks]
+    runs = []
+    for _ in range(args.processes):
+        output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {name: summarize(max(run[name]['loops'] for run in runs),
+                            [s for run in runs for s in run[name]['seconds']])
+            for name in args.benchmarks}
+
+
+def print_table(result, comparison):
+    for size, benchmarks in result['sizes'].items():
+        print(f"\n'{size}' dataset ({result['processes']} processes x {result['samples']} samples)")
+        print(f"{'benchmark':22}{'median':>12}{'iqr':>10}{'min':>12}{'loops':>8}")
+        for name, stats in benchmarks.items():
+            print(f"{name:22}{format_us(stats['median_us']):>12}{format_us(stats['iqr_us']):>10}"
+                  f"{format_us(stats['min_us']):>12}{stats['loops']:>8}")
+
+    if comparison:
+        print(f"\nAgainst baseline {result['baseline']}:")
+        print(f"{'size':8}{'benchmark':22}{'baseline':>12}{'now':>12}{'change':>9}{'p':>9}")
+        for size, name, before, after, p_value, verdict in comparison:
+            print(f"{size:8}{name:22}{format_us(before):>12}{format_us(after):>12}"
+                  f"{(after / before - 1) * 100:>+8.1f}%{p_value:>9.4f}  {verdict}")
+
+
+def format_us(value):
+    if value >= 1000:
+        return f'{value / 1000:.2f} ms'
+    return f'{value:.2f} µs'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark the hot functions on synthetic datasets')
+    parser.add_argument('--sizes', nargs='+', default=['tiny', 'small'],
+                        help="generate_data.py presets (medium takes minutes to generate)")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--processes', type=int, default=4, help='fresh processes per dataset')
+    parser.add_argument('--samples', type=int, default=5, help='timed samples per benchmark and process')
+    parser.add_argument('--min-time', type=float, default=0.02, help='seconds per sample')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help='keep generated databases here and reuse them')
+    parser.add_argument('--history', default=os.path.join(RESULTS_DIR, 'history.jsonl'),
+                        help='JSONL file each run is appended to')
+    parser.add_argument('--baseline', default=os.path.join(RESULTS_DIR, 'baseline.json'),
+                        help='run to compare against (skipped if missing)')
+    parser.add_argument('--save-baseline', action='store_true', help='make this run the baseline')
+    parser.add_argument('--alpha', type=float, default=0.01, help='significance level')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='smallest median slowdown that counts as a regression (0.10 = 10%%)')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args)
+        return
+
+    os.chdir(ROOT)
+    workdir = tempfile.mkdtemp(prefix='micro-benchmarks-')
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': f'{platform.machine()} {platform.node()} ({os.cpu_count()} CPUs)',
+        'processes': args.processes,
+        'samples': args.samples,
+        'min_time_s': args.min_time,
+        'seed': args.seed,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        result['sizes'][size] = run_size(size, args, workdir)
+
+    comparison = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        result['baseline'] = baseline.get('commit')
+        comparison = compare(result, baseline, args.alpha, args.threshold)
+        result['regressions'] = [f'{size}/{name}' for size, name, *_, verdict in comparison
+                                 if verdict == 'REGRESSION']
+    print_table(result, comparison)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a') as f:
+        f.write(json.dumps(result) + '\n')
+    print(f"\nAppended to {args.history}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline {args.baseline}")
+
+    if result.get('regressions'):
+        print(f"\nSignificant regressions: {', '.join(result['regressions'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Bounded executor for upstream chatbot calls
+Keeps a burst of Gemini requests from tying up every request worker by
+limiting concurrency, bounding the wait queue and shedding load early
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict
+from config import Config
+from tracing import propagate
+
+# Sentinel returned by a job that sat in the queue past its wait budget
+_EXPIRED = object()
+
+# Smoothing factor for the moving average of queue wait time
+EWMA_ALPHA = 0.2
+
+
+class ChatExecutor:
+    def __init__(self, max_workers: int, max_queue: int, queue_wait_budget: float,
+                 response_timeout: float):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_wait_budget = queue_wait_budget
+        self.response_timeout = response_timeout
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queued = 0
+        self._active = 0
+        self._ewma_wait = 0.0
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'shed': 0,
+            'expired': 0,
+            'timed_out': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'wait_count': 0
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the thread pool on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='chat-upstream'
+                    )
+        return self._executor
+
+    def reset_after_fork(self):
+        """
+        Start clean in a forked worker: the parent's pool threads don't exist
+        in the child, so an inherited executor would accept jobs nobody runs
+        """
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queued = 0
+        self._active = 0
+
+    def _should_shed(self) -> bool:
+        """
+        Decide whether to reject a new job before queueing it.
+
+        Jobs are shed when the queue is full, or adaptively when jobs are
+        already waiting and recent queue waits have exceeded the budget
+        (a new job would most likely expire before it starts).
+        """
+        if self._queued >= self.max_queue:
+            return True
+        return self._queued > 0 and self._ewma_wait > self.queue_wait_budget
+
+    def run(self, fn: Callable[..., Any], *args, fallback: Callable[[], Any], **kwargs) -> Any:
+        """
+        Run fn on the upstream pool and wait for its result.
+
+        Args:
+            fn: Upstream call to execute
+            fallback: Called to produce a response when the job is shed,
+                expires in the queue or times out
+
+        Returns:
+            The result of fn, or of fallback when the pool is saturated
+        """
+        with self._lock:
+            if self._should_shed():
+                self._stats['shed'] += 1
+                shed = True
+            else:
+                self._queued += 1
+                self._stats['submitted'] += 1
+                shed = False
+
+        if shed:
+            return fallback()
+
+        enqueued_at = time.monotonic()
+        future = self._get_executor().submit(self._invoke, propagate(fn, 'chat_executor.job'), args, kwargs,
+                                             enqueued_at)
+
+        try:
+            result = future.result(timeout=self.queue_wait_budget + self.response_timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats['timed_out'] += 1
+                # A job that never started still counts as queued
+                if future.cancel():
+                    self._queued -= 1
+            return fallback()
+
+        if result is _EXPIRED:
+            return fallback()
+        return result
+
+    def _invoke(self, fn: Callable[..., Any], args: tuple, kwargs: dict, enqueued_at: float) -> Any:
+        """Worker-side wrapper that records queue wait and enforces the budget"""
+        waited = time.monotonic() - enqueued_at
+
+        with self._lock:
+            self._queued -= 1
+            self._stats['wait_total'] += waited
+            self._stats['wait_count'] += 1
+            self._stats['wait_max'] = max(self._stats['wait_max'], waited)
+            self._ewma_wait = EWMA_ALPHA * waited + (1 - EWMA_ALPHA) * self._ewma_wait
+
+            if waited > self.queue_wait_budget:
+                self._stats['expired'] += 1
+                return _EXPIRED
+            self._active += 1
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._stats['completed'] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, wait times and shedding counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            queued = self._queued
+            active = self._active
+            ewma_wait = self._ewma_wait
+
+        wait_count = stats.pop('wait_count')
+        wait_total = stats.pop('wait_total')
+        stats.update({
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_depth': queued,
+            'active': active,
+            'wait_avg_ms': round(wait_total / wait_count * 1000, 2) if wait_count else 0.0,
+            'wait_max_ms': round(stats.pop('wait_max') * 1000, 2),
+            'wait_ewma_ms': round(ewma_wait * 1000, 2)
+        })
+        return stats
+
+# Global executor for chatbot upstream calls
+chat_executor = ChatExecutor(
+    max_workers=Config.CHAT_MAX_WORKERS,
+    max_queue=Config.CHAT_MAX_QUEUE,
+    queue_wait_budget=Config.CHAT_QUEUE_WAIT_BUDGET,
+    response_timeout=Config.CHAT_RESPONSE_TIMEOUT
+)
@@ -5,16 +5,51 @@ import os
 import json
 import google.generativeai as genai
 from config import Config
-import sqlite3
+from db import connect_db
+from intent_router import intent_router
+from search_index import product_search_index
+from gcp_services import simulate_upstream_latency
+from fake_upstream import FakeGenerativeModel
+from metrics import track_upstream
+from tracing import traced
 from datetime import datetime
 
+# Canned answers keyed by intent (see intent_router.DEFAULT_INTENTS)
+FALLBACK_RESPONSES = {
+    'hello': "Hello! Welcome to the Artisan Marketplace. How can I help you today?",
+    'products': "You can browse our artisan products by visiting the Browse page. We have handmade items in various categories like pottery, jewelry, textiles, and more.",
+    'artisan': "Artisans can register and showcase their handmade products on our platform. They can add product details, images, and stories.",
+    'buy': "To purchase items, browse our products, add them to your cart, and proceed to checkout. You'll need to register as a buyer first.",
+    'register': "You can register as either an artisan (to sell products) or a buyer (to purchase items). Visit our registration pages to get started.",
+    'help': "I'm here to help! You can ask me about products, artisans, registration, or any general questions about our marketplace.",
+    'price': "All prices on our marketplace are in Indian Rupees (₹). You can filter products by price range when browsing.",
+    'categories': "We have various product categories including pottery, jewelry, textiles, woodwork, paintings, and more handcrafted items."
+}
+
+DEFAULT_FALLBACK_RESPONSE = "I'm here to help you with the Artisan Marketplace. You can ask me about products, artisans, registration, or any other questions about our platform. How can I assist you?"
+
 class ChatbotService:
     def __init__(self):
-        self.model = None
-        self.setup_gemini()
+        self._model = None
+        # Gemini is configured on first use in each worker process, never
+        # in a preloading master (see gunicorn.conf.py)
+        self._initialized_pid = None
+
+    @property
+    def model(self):
+        if self._initialized_pid != os.getpid():
+            self._initialized_pid = os.getpid()
+            self.setup_gemini()
+        return self._model
     
     def setup_gemini(self):
         """Initialize Gemini AI model"""
+        self._model = None
+        if Config.AI_BACKEND == 'fake':
+            self._model = FakeGenerativeModel(Config.GEMINI_MODEL_NAME, Config.FAKE_UPSTREAM_URL)
+            return
+        if Config.AI_BACKEND == 'mock':
+            return
         try:
             # Configure Gemini API
             api_key = os.getenv('GEMINI_API_KEY')
@@ -23,23 +58,28 @@ class ChatbotService:
                 return
             
             genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
+            self._model = genai.GenerativeModel('gemini-pro')
             print("Gemini AI initialized successfully")
         except Exception as e:
             print(f"Error initializing Gemini AI: {e}")
-            self.model = None
+            self._model = None
     
-    def get_chat_response(self, user_message, user_context=None):
+    @traced('ChatbotService.get_chat_response')
+    def get_chat_response(self, user_message, user_context=None, history=None):
         """
-        Get response from Gemini AI based on user message and context
+        Get response from Gemini AI based on user message, context and the
+        (already budgeted) conversation history
         """
         try:
             if not self.model:
+                simulate_upstream_latency()
                 return self._get_fallback_response(user_message)
             
             # Build context for the AI
             context = self._build_context(user_context)
             
+            history_section = f"\nConversation so far:\n{history}\n" if history else ""
+            
             # Create prompt with context
             prompt = f"""
             You are a helpful assistant for the Artisan Marketplace, a platform connecting local artisans with buyers. 
@@ -47,7 +87,7 @@ class ChatbotService:
             
             Context about the marketplace:
             {context}
-            
+            {history_section}
             User message: {user_message}
             
             Please provide a helpful, friendly response. If the user is asking about products, artisans, or marketplace features, 
@@ -55,7 +95,8 @@ class ChatbotService:
             """
             
             # Generate response
-            response = self.model.generate_content(prompt)
+            with track_upstream('gemini', 'generate_content'):
+                response = self.model.generate_content(prompt)
             
             if response.text:
                 return {
@@ -89,7 +130,7 @@ class ChatbotService:
         
         # Add some recent product info if available
         try:
-            conn = sqlite3.connect('artisan_marketplace.db')
+            conn = connect_db()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -114,62 +155,28 @@ class ChatbotService:
     
     def _get_fallback_response(self, user_message):
         """Provide fallback responses when AI is not available"""
-        fallback_responses = {
-            'hello': "Hello! Welcome to the Artisan Marketplace. How can I help you today?",
-            'products': "You can browse our artisan products by visiting the Browse page. We have handmade items in various categories like pottery, jewelry, textiles, and more.",
-            'artisan': "Artisans can register and showcase their handmade products on our platform. They can add product details, images, and stories.",
-            'buy': "To purchase items, browse our products, add them to your cart, and proceed to checkout. You'll need to register as a buyer first.",
-            'register': "You can register as either an artisan (to sell products) or a buyer (to purchase items). Visit our registration pages to get started.",
-            'help': "I'm here to help! You can ask me about products, artisans, registration, or any general questions about our marketplace.",
-            'price': "All prices on our marketplace are in Indian Rupees (₹). You can filter products by price range when browsing.",
-            'categories': "We have various product categories including pottery, jewelry, textiles, woodwork, paintings, and more handcrafted items."
-        }
-        
-        message_lower = user_message.lower()
-        
-        for key, response in fallback_responses.items():
-            if key in message_lower:
-                return {
-                    'success': True,
-                    'message': response,
-                    'timestamp': datetime.now().isoformat()
-                }
+        intent, _ = intent_router.route(user_message)
+        return self.get_intent_response(intent)
+    
+    def get_intent_response(self, intent):
+        """Canned response for a routed intent (default message if it has none)"""
+        if intent == 'product_search':
+            intent = 'products'
         
-        # Default response
+        message = FALLBACK_RESPONSES.get(intent, DEFAULT_FALLBACK_RESPONSE)
         return {
             'success': True,
-            'message': "I'm here to help you with the Artisan Marketplace. You can ask me about products, artisans, registration, or any other questions about our platform. How can I assist you?",
+            'message': message,
             'timestamp': datetime.now().isoformat()
         }
     
+    @traced('ChatbotService.get_product_recommendations')
     def get_product_recommendations(self, user_message):
         """Get product recommendations based on user query"""
         try:
-            conn = sqlite3.connect('artisan_marketplace.db')
-            cursor = conn.cursor()
-            
-            # Extract keywords from user message
-            keywords = user_message.lower().split()
-            
-            # Search for products matching keywords
-            query = '''
-                SELECT p.id, p.name, p.description, p.category, p.price, p.image_path, a.name as artisan_name
-                FROM products p
-                JOIN artisans a ON p.artisan_id = a.id
-                WHERE 1=1
-            '''
-            params = []
-            
-            for keyword in keywords:
-                if len(keyword) > 2:  # Only search meaningful words
-                    query += ' AND (p.name LIKE ? OR p.description LIKE ? OR p.category LIKE ?)'
-                    params.extend([f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'])
-            
-            query += ' LIMIT 5'
-            cursor.execute(query, params)
-            products = cursor.fetchall()
-            
-            conn.close()
+            # Ranked (BM25) search over the in-memory catalog index
+            results = product_search_index.search(user_message, limit=5)
+            products = [product for score, product in results]
             
             if products:
                 response = "Here are some products that might interest you:\n\n"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Response compression
+Dynamic HTML/JSON responses are gzip- or brotli-encoded according to the
+client's Accept-Encoding; CSS and JS are compressed once at build time
+and the precompressed files are served as-is
+
+Run as a build step to precompress static assets:
+    python compression.py
+"""
+
+import gzip
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Build-time levels: spend CPU once so requests don't have to
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 11
+
+
+def _accepted(encoding: str) -> bool:
+    return request.accept_encodings.quality(encoding) > 0
+
+
+def negotiate_encoding(available=('br', 'gzip')):
+    """Best encoding the client accepts, preferring brotli"""
+    for encoding in available:
+        if encoding == 'br' and brotli is None:
+            continue
+        if _accepted(encoding):
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook: compress buffered text responses above the size threshold"""
+    if (response.status_code != 200
+            or response.direct_passthrough          # send_file: uploads and static assets
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in Config.COMPRESSION_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # The encoded body is a different representation than the identity one;
+    # weak ETags (rendered pages) only promise equivalent content and stay
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def send_static(filename):
+    """Static file view that prefers a precompressed sibling (.br/.gz) of the asset"""
+    static_folder = current_app.static_folder
+    source = os.path.join(static_folder, filename)
+
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        compressed = source + suffix
+        if (_accepted(encoding) and os.path.isfile(compressed) and os.path.isfile(source)
+                and os.path.getmtime(compressed) >= os.path.getmtime(source)):
+            response = send_from_directory(static_folder, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+
+    response = send_from_directory(static_folder, filename)
+    if filename.endswith(Config.PRECOMPRESS_EXTENSIONS):
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_compression(app):
+    """Compress dynamic responses and serve precompressed static assets"""
+    if not Config.COMPRESSION_ENABLED:
+        return
+    app.after_request(compress_response)
+    app.view_functions['static'] = send_static
+
+
+def precompress_static(static_folder: str = 'static'):
+    """Write .gz (and .br when brotli is installed) next to every CSS/JS asset"""
+    written = 0
+    for directory in Config.PRECOMPRESS_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, directory)):
+            for name in files:
+                if not name.endswith(Config.PRECOMPRESS_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    data = f.read()
+
+                outputs = [('.gz', gzip.compress(data, compresslevel=PRECOMPRESS_GZIP_LEVEL, mtime=0))]
+                if brotli is not None:
+                    outputs.append(('.br', brotli.compress(data, quality=PRECOMPRESS_BROTLI_QUALITY)))
+
+                for suffix, compressed in outputs:
+                    if len(compressed) >= len(data):
+                        continue
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+                    print(f"✓ {path}{suffix}: {len(data)} -> {len(compressed)} bytes")
+
+    if brotli is None:
+        print("brotli is not installed; wrote gzip files only")
+    print(f"\nWrote {written} precompressed files")
+
+if __name__ == "__main__":
+    precompress_static()
@@ -0,0 +1,98 @@
+"""
+Conditional GET for rendered pages
+Pages get a weak ETag built from what they were rendered from (a
+product's updated_at, the catalog version) plus the viewer and the
+templates and asset bundles, so repeat visits are answered with 304
+before any template is rendered, and a deploy invalidates every page
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+from flask import Response, current_app, make_response, request, session
+from assets import asset_manifest
+
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+@lru_cache(maxsize=1)
+def _template_state() -> Tuple[str, float]:
+    """Digest and newest modification time of the templates, read once per
+    process (a deploy restarts the workers)"""
+    digest = hashlib.sha1()
+    newest = 0.0
+    for root, dirs, files in os.walk(TEMPLATE_FOLDER):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digest.update(os.path.relpath(path, TEMPLATE_FOLDER).encode() + b'\0' + f.read())
+            newest = max(newest, os.path.getmtime(path))
+    return digest.hexdigest()[:12], newest
+
+
+def render_version() -> Tuple[str, float]:
+    """
+    What every page's markup depends on besides its data: the templates and
+    the bundle URLs from the asset manifest. Returns (digest, newest
+    modification time as a UNIX timestamp).
+    """
+    if current_app.debug:
+        # Templates are reloaded as they are edited
+        _template_state.cache_clear()
+    templates, templates_mtime = _template_state()
+    return templates + asset_manifest.version(), max(templates_mtime, asset_manifest.built_at())
+
+
+def page_etag(*parts) -> str:
+    """ETag for a page rendered from parts; the viewer's role and id are always included
+    because the navigation (and some page content) depends on them, and so is the
+    render version, so a deploy never answers 304 with markup linking old bundles"""
+    key = repr(parts + (session.get('user_type'), session.get('user_id'), render_version()[0]))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """SQLite CURRENT_TIMESTAMP / strftime text (UTC) as an aware datetime"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """RFC 9110 evaluation: If-None-Match wins, If-Modified-Since only without it"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return _effective_last_modified(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _effective_last_modified(last_modified: datetime) -> datetime:
+    """A page is as new as its data or the templates and bundles, whichever changed last"""
+    deployed = datetime.fromtimestamp(render_version()[1], timezone.utc)
+    return max(last_modified, deployed)
+
+
+def conditional_page(etag: str, render: Callable[[], str],
+                     last_modified: Optional[datetime] = None) -> Response:
+    """
+    Answer 304 when the client's copy is current, otherwise render.
+
+    Weak ETags: the same page gzip- or brotli-encoded is still a match.
+    The response must be revalidated on every use and only cached by the
+    browser, since it depends on the session.
+    """
+    if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = _effective_last_modified(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
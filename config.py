@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 try:
     from dotenv import load_dotenv
@@ -6,6 +7,11 @@ try:
 except ImportError:
     print("Warning: python-dotenv not installed. Using system environment variables only.")
 
+def _rate(name, default):
+    """Parse a 'count/seconds' rate limit setting into (capacity, period)"""
+    count, seconds = os.getenv(name, default).split('/')
+    return int(count), float(seconds)
+
 class Config:
     # Google Cloud Configuration
     GCP_PROJECT_ID = os.getenv('GCP_PROJECT_ID', 'your-project-id')
@@ -21,11 +27,67 @@ class Config:
     # Flask configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     
+    # SQLite database (point at a generate_data.py database to benchmark at scale)
+    DATABASE_PATH = os.getenv('DATABASE_PATH', 'artisan_marketplace.db')
+    
     # Upload configuration
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     
+    # Serving uploads: fingerprinted URLs are cached for a year; a front
+    # proxy can serve the bytes via 'x-sendfile' (Apache/lighttpd) or
+    # 'x-accel' (nginx internal location at UPLOAD_ACCEL_PREFIX)
+    UPLOAD_CACHE_MAX_AGE = 365 * 24 * 3600
+    UPLOAD_SENDFILE_MODE = os.getenv('UPLOAD_SENDFILE_MODE', '')
+    UPLOAD_ACCEL_PREFIX = os.getenv('UPLOAD_ACCEL_PREFIX', '/_protected_uploads/')
+    
+    # Rendered catalog fragments (browse filters, artisan product lists)
+    FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', '256'))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+    
+    # Fingerprinted CSS/JS bundles built by `python assets.py` (raw files when absent)
+    ASSET_BUNDLES_ENABLED = os.getenv('ASSET_BUNDLES_ENABLED', 'true').lower() == 'true'
+    ASSET_CACHE_MAX_AGE = 365 * 24 * 3600
+    
+    # Compiled Jinja templates cached on disk (empty disables) and compiled at startup
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', '.jinja_cache')
+    TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', 'true').lower() == 'true'
+    
+    # Response compression (brotli is used when the package is installed)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+    COMPRESSION_MIMETYPES = {'text/html', 'application/json', 'text/css', 'application/javascript',
+                             'text/javascript', 'text/plain', 'image/svg+xml'}
+    # Assets precompressed at build time by `python compression.py`
+    PRECOMPRESS_DIRS = ('css', 'js', 'dist')
+    PRECOMPRESS_EXTENSIONS = ('.css', '.js')
+    
+    # Responsive image derivatives generated for each upload
+    IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+    IMAGE_WEBP_QUALITY = 80
+    IMAGE_JPEG_QUALITY = 82
+    # Tiny blurred preview inlined in listing HTML as a data URI
+    IMAGE_PLACEHOLDER_WIDTH = 20
+    IMAGE_PLACEHOLDER_QUALITY = 50
+    # Uploads larger than this many pixels are rejected by the image worker
+    IMAGE_MAX_PIXELS = 40_000_000
+    
+    # Background image worker (process pool fed from the image_jobs table)
+    IMAGE_WORKER_PROCESSES = int(os.getenv('IMAGE_WORKER_PROCESSES', str(os.cpu_count() or 1)))
+    IMAGE_WORKER_MAX_TASKS_PER_CHILD = 50
+    IMAGE_WORKER_POLL_INTERVAL = 1.0  # seconds
+    IMAGE_WORKER_MAX_ATTEMPTS = 3
+    IMAGE_WORKER_STALE_AFTER = 300  # seconds before a 'processing' job is retried
+    IMAGE_WORKER_RECOVERY_INTERVAL = 60  # seconds between stale-job checks (well under STALE_AFTER)
+    IMAGE_WORKER_RETRY_BACKOFF = 10  # seconds before the first retry, doubling with each attempt
+    # Run the worker inside the web process (one per host) when no separate
+    # `python image_worker.py` service is deployed
+    IMAGE_WORKER_EMBEDDED = os.getenv('IMAGE_WORKER_EMBEDDED', 'true').lower() == 'true'
+    
     # Currency configuration
     CURRENCY_SYMBOL = '₹'
     CURRENCY_CODE = 'INR'
@@ -37,6 +99,89 @@ class Config:
     VERTEX_AI_MODEL_NAME = 'text-bison@001'  # For text generation
     VERTEX_AI_ENDPOINT = None  # Will be set dynamically
     
+    # Seconds of delay added where mock services stand in for Vertex AI,
+    # Translation and Gemini, to load-test with realistic upstream latency
+    SIMULATED_UPSTREAM_LATENCY = float(os.getenv('SIMULATED_UPSTREAM_LATENCY', '0'))
+    
+    # Where AI calls go: 'auto' (GCP/Gemini when configured, otherwise the
+    # in-process mocks), 'mock' (always the mocks) or 'fake' (the local fake
+    # upstream server started with `python fake_upstream.py`)
+    AI_BACKEND = os.getenv('AI_BACKEND', 'auto')
+    FAKE_UPSTREAM_URL = os.getenv('FAKE_UPSTREAM_URL', 'http://127.0.0.1:8089')
+    FAKE_UPSTREAM_TIMEOUT = float(os.getenv('FAKE_UPSTREAM_TIMEOUT', '30'))  # client-side, seconds
+    # Fake server behaviour. Latency per operation (translate, vertex, gemini)
+    # as 'op=distribution:params', distributions: fixed:s, uniform:lo:hi,
+    # normal:mean:sd, lognormal:median:sigma ('*' sets the default)
+    FAKE_UPSTREAM_LATENCY = os.getenv('FAKE_UPSTREAM_LATENCY',
+                                      'translate=lognormal:0.15:0.4,vertex=lognormal:1.5:0.5,gemini=lognormal:0.9:0.6')
+    FAKE_UPSTREAM_ERROR_RATE = float(os.getenv('FAKE_UPSTREAM_ERROR_RATE', '0'))  # share of 503s
+    FAKE_UPSTREAM_RATE_LIMIT = os.getenv('FAKE_UPSTREAM_RATE_LIMIT', '')  # 'count/seconds' per operation, 429 above
+    FAKE_UPSTREAM_STREAM_CHUNKS = int(os.getenv('FAKE_UPSTREAM_STREAM_CHUNKS', '8'))
+    FAKE_UPSTREAM_CHUNK_INTERVAL = float(os.getenv('FAKE_UPSTREAM_CHUNK_INTERVAL', '0.05'))  # seconds
+    
     # Gemini AI configuration (for chatbot)
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    GEMINI_MODEL_NAME = 'gemini-pro'
\ No newline at end of file
+    GEMINI_MODEL_NAME = 'gemini-pro'
+    
+    # Chatbot upstream concurrency (bounded executor + load shedding)
+    CHAT_MAX_WORKERS = int(os.getenv('CHAT_MAX_WORKERS', '4'))
+    CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', '8'))
+    CHAT_QUEUE_WAIT_BUDGET = float(os.getenv('CHAT_QUEUE_WAIT_BUDGET', '2.0'))  # seconds
+    CHAT_RESPONSE_TIMEOUT = float(os.getenv('CHAT_RESPONSE_TIMEOUT', '20.0'))  # seconds
+    
+    # Chatbot conversation memory (per-session history sent with each prompt)
+    CHAT_HISTORY_MAX_MESSAGES = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '20'))
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '600'))
+    CHAT_HISTORY_MAX_MESSAGE_CHARS = 1000
+    CHAT_HISTORY_TTL = int(os.getenv('CHAT_HISTORY_TTL', '86400'))  # seconds
+    
+    # Chatbot intent routing
+    CHAT_INTENT_THRESHOLD = float(os.getenv('CHAT_INTENT_THRESHOLD', '0.6'))
+    
+    # Chatbot product search index
+    SEARCH_INDEX_REFRESH_INTERVAL = float(os.getenv('SEARCH_INDEX_REFRESH_INTERVAL', '5.0'))  # seconds
+    
+    # Rate limiting for AI-backed routes (token bucket, 'count/seconds')
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', 'rate_limits.db')
+    RATE_LIMITS = {
+        'chat': _rate('RATE_LIMIT_CHAT', '20/60'),
+        'generate_story': _rate('RATE_LIMIT_GENERATE_STORY', '5/60'),
+        'add_product': _rate('RATE_LIMIT_ADD_PRODUCT', '10/60')
+    }
+    # Per-IP buckets are this many times larger (several users can share an IP)
+    RATE_LIMIT_IP_MULTIPLIER = int(os.getenv('RATE_LIMIT_IP_MULTIPLIER', '3'))
+    # Number of reverse proxies in front of the app that set X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    
+    # Slow-query log (sampled requests; shown on the admin dashboard)
+    QUERY_PROFILE_SAMPLE_RATE = float(os.getenv('QUERY_PROFILE_SAMPLE_RATE', '0.05'))  # share of requests, 0 disables
+    QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', '100'))
+    QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_N_PLUS_ONE_THRESHOLD', '10'))  # same statement per request
+    QUERY_LOG_RETENTION_DAYS = int(os.getenv('QUERY_LOG_RETENTION_DAYS', '7'))
+    QUERY_LOG_MAX_ENTRIES = int(os.getenv('QUERY_LOG_MAX_ENTRIES', '200'))
+    
+    # Request tracing (sampled; spans for SQL, AI calls and template renders)
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))  # share of requests, 0 disables
+    # Follow an incoming traceparent's sampled flag; otherwise callers only pick the trace id,
+    # so clients can't force tracing on every request
+    TRACE_TRUST_PARENT = os.getenv('TRACE_TRUST_PARENT', 'false').lower() == 'true'
+    TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', 'jsonl')  # 'jsonl' or 'otlp'
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+    TRACE_FILE_MAX_BYTES = int(os.getenv('TRACE_FILE_MAX_BYTES', str(50 * 1024 * 1024)))  # then rotated to .1
+    TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', 'http://127.0.0.1:4318/v1/traces')
+    TRACE_EXPORT_INTERVAL = float(os.getenv('TRACE_EXPORT_INTERVAL', '1.0'))  # seconds
+    TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '500'))  # per trace
+    TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'artisan-marketplace')
+    
+    # tracemalloc profiling per route (slow; run with one sync worker)
+    MEMORY_PROFILE = os.getenv('MEMORY_PROFILE', 'false').lower() == 'true'
+    MEMORY_PROFILE_SAMPLE_RATE = float(os.getenv('MEMORY_PROFILE_SAMPLE_RATE', '1.0'))  # share of requests
+    MEMORY_PROFILE_FRAMES = int(os.getenv('MEMORY_PROFILE_FRAMES', '1'))  # traceback depth kept per allocation
+    MEMORY_PROFILE_TOP_SITES = int(os.getenv('MEMORY_PROFILE_TOP_SITES', '10'))
+    
+    # Prometheus metrics at /metrics (per-worker snapshots merged on scrape)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'artisan-marketplace-metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))  # seconds
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # Bearer token to scrape; unset: loopback only
@@ -0,0 +1,163 @@
+"""
+Server-side conversation memory for the chatbot
+Keeps a bounded ring buffer of messages per chat session in SQLite and
+renders it into a prompt section that fits a fixed token budget
+"""
+
+import threading
+from typing import List, Tuple
+from config import Config
+from db import connect_db
+
+# Rough token estimate used for budgeting (about four characters per token)
+CHARS_PER_TOKEN = 4
+
+# Share of the budget kept for the summary line when older turns are dropped
+SUMMARY_BUDGET_SHARE = 0.25
+
+# Expired sessions are purged once every this many recorded exchanges
+PURGE_EVERY = 100
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens in text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ConversationMemory:
+    def __init__(self, db_path: str = Config.DATABASE_PATH,
+                 max_messages: int = Config.CHAT_HISTORY_MAX_MESSAGES,
+                 token_budget: int = Config.CHAT_HISTORY_TOKEN_BUDGET,
+                 max_message_chars: int = Config.CHAT_HISTORY_MAX_MESSAGE_CHARS,
+                 ttl: int = Config.CHAT_HISTORY_TTL):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.max_message_chars = max_message_chars
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """Create the history table if it doesn't exist"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_chat_history_session
+            ON chat_history (session_id, id)
+        ''')
+        conn.commit()
+        conn.close()
+
+    def record_exchange(self, session_id: str, user_message: str, reply: str):
+        """
+        Append a user message and the assistant's reply to a session.
+
+        Only the newest max_messages rows are kept per session, so the
+        table behaves as a ring buffer.
+        """
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT INTO chat_history (session_id, role, content)
+            VALUES (?, ?, ?)
+        ''', [(session_id, 'user', user_message[:self.max_message_chars]),
+              (session_id, 'assistant', reply[:self.max_message_chars])])
+
+        cursor.execute('''
+            DELETE FROM chat_history
+            WHERE session_id = ? AND id <= (
+                SELECT id FROM chat_history
+                WHERE session_id = ?
+                ORDER BY id DESC
+                LIMIT 1 OFFSET ?
+            )
+        ''', (session_id, session_id, self.max_messages))
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+        if purge:
+            cursor.execute("DELETE FROM chat_history WHERE created_at < datetime('now', ?)",
+                           (f'-{self.ttl} seconds',))
+
+        conn.commit()
+        conn.close()
+
+    def get_messages(self, session_id: str) -> List[Tuple[str, str]]:
+        """Stored (role, content) pairs for a session, oldest first"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT role, content FROM chat_history
+            WHERE session_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (session_id, self.max_messages))
+        messages = cursor.fetchall()
+        conn.close()
+
+        messages.reverse()
+        return messages
+
+    def build_history(self, session_id: str) -> str:
+        """
+        Render a session's history as prompt text within the token budget.
+
+        The newest messages are kept verbatim; messages that don't fit are
+        collapsed into a one-line summary of what the user asked earlier.
+        """
+        messages = self.get_messages(session_id)
+        if not messages:
+            return ""
+
+        lines = [f"{'User' if role == 'user' else 'Assistant'}: {content}"
+                 for role, content in messages]
+        costs = [estimate_tokens(line) for line in lines]
+        if sum(costs) <= self.token_budget:
+            return "\n".join(lines)
+
+        # Not everything fits: keep the newest lines verbatim and reserve
+        # part of the budget for a summary of the ones that are dropped
+        summary_tokens = int(self.token_budget * SUMMARY_BUDGET_SHARE)
+        available = self.token_budget - summary_tokens
+        kept = []
+        used = 0
+        for line, cost in zip(reversed(lines), reversed(costs)):
+            if used + cost > available:
+                if not kept:
+                    kept.append(line[:available * CHARS_PER_TOKEN])
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+
+        older = messages[:len(messages) - len(kept)]
+        asked = "; ".join(content[:60] for role, content in older if role == 'user')
+        if asked:
+            summary = f"Earlier the user asked about: {asked}"
+            kept.insert(0, summary[:summary_tokens * CHARS_PER_TOKEN])
+
+        return "\n".join(kept)
+
+    def clear(self, session_id: str):
+        """Forget a session's history"""
+        conn = connect_db(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+        conn.commit()
+        conn.close()
+
+# Global conversation memory instance
+conversation_memory = ConversationMemory()
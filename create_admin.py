@@ -5,13 +5,14 @@ Create admin user for AI Artisan Marketplace
 
 import sqlite3
 import hashlib
+from config import Config
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def create_admin():
     """Create admin user"""
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = sqlite3.connect(Config.DATABASE_PATH)
     cursor = conn.cursor()
     
     # Check if admin already exists
@@ -6,10 +6,11 @@ Database Viewer and Management Tool for AI Artisan Marketplace
 import sqlite3
 import os
 from datetime import datetime
+from config import Config
 
 def connect_db():
     """Connect to the database"""
-    return sqlite3.connect('artisan_marketplace.db')
+    return sqlite3.connect(Config.DATABASE_PATH)
 
 def view_all_users():
     """View all users in the database"""
@@ -0,0 +1,86 @@
+"""
+Small SQLite helpers shared by the app and its background services
+"""
+
+import sqlite3
+from time import perf_counter
+from config import Config
+
+# Called as observer(cursor, sql, parameters, seconds, fetch) for every
+# statement run on a connect_db() connection (fetch=False, time spent in
+# execute) and for every fetchone/fetchmany/fetchall on its cursor
+# (fetch=True, time spent stepping through the rows of that statement).
+# parameters is None for executemany
+query_observers = []
+
+
+def _notify(cursor, sql, parameters, seconds, fetch):
+    for observer in query_observers:
+        observer(cursor, sql, parameters, seconds, fetch)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    _sql = None
+    _parameters = ()
+
+    def execute(self, sql, parameters=()):
+        if not query_observers:
+            return super().execute(sql, parameters)
+        self._sql, self._parameters = sql, parameters
+        started = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify(self, sql, parameters, perf_counter() - started, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not query_observers:
+            return super().executemany(sql, seq_of_parameters)
+        self._sql, self._parameters = sql, None
+        started = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify(self, sql, None, perf_counter() - started, False)
+
+    def _timed_fetch(self, fetch, *args):
+        if not query_observers or self._sql is None:
+            return fetch(*args)
+        started = perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            _notify(self, self._sql, self._parameters, perf_counter() - started, True)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The connection shortcuts don't go through cursor() on their own
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect_db(db_path: str = None, **kwargs) -> sqlite3.Connection:
+    """Connection to the app database whose statements are reported to query_observers"""
+    return sqlite3.connect(db_path or Config.DATABASE_PATH, factory=InstrumentedConnection, **kwargs)
+
+
+def add_column_if_missing(cursor, table: str, column: str, definition: str):
+    """Add a column to an existing table (CREATE TABLE IF NOT EXISTS won't)"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
@@ -7,13 +7,14 @@ Adds sample artisans, buyers, and products for testing
 import sqlite3
 import hashlib
 from datetime import datetime
+from config import Config
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def add_demo_data():
     """Add demo data to the database"""
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = sqlite3.connect(Config.DATABASE_PATH)
     cursor = conn.cursor()
     
     # Add sample artisans
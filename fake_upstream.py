@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Vertex AI, Translation and Gemini
+A small HTTP server that answers the REST shapes of the three APIs with
+configurable latency distributions, error rates, throttling (429 with
+Retry-After) and streamed Gemini responses, plus client shims with the
+SDK methods the app calls (translate_v2.Client.translate,
+aiplatform.Model.predict, GenerativeModel.generate_content). With
+AI_BACKEND=fake, gcp_services and chatbot_service use the shims, so
+timeouts, caching and concurrency can be tuned offline.
+
+    python fake_upstream.py [--port 8089] [--seed 1]
+    AI_BACKEND=fake python serve.py
+
+Behaviour comes from the FAKE_UPSTREAM_* settings in config.py.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from config import Config
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # google libraries not installed; shims raise UpstreamError
+    google_exceptions = None
+
+OPERATIONS = ('translate', 'vertex', 'gemini')
+
+ROUTES = [
+    (re.compile(r'^/language/translate/v2$'), 'translate'),
+    (re.compile(r'^/v1/models/(?P<model>[^/:]+):predict$'), 'vertex'),
+    (re.compile(r'^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$'), 'gemini'),
+]
+
+STORY = ("Shaped by hand in a small family workshop, this piece carries techniques passed down "
+         "through generations. Every mark of the tool is deliberate, every finish applied with patience, "
+         "so that no two pieces are ever quite alike.")
+CHAT_REPLY = ("Happy to help! You can browse handmade pottery, jewelry, textiles and woodwork from "
+              "artisans across India and beyond, filter by category or price, and read the story "
+              "behind each piece on its product page.")
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """'fixed:s', 'uniform:lo:hi', 'normal:mean:sd' or 'lognormal:median:sigma' -> sampler (seconds)"""
+    kind, *params = spec.split(':')
+    values = [float(value) for value in params]
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def parse_latencies(spec: str) -> Dict[str, Callable[[random.Random], float]]:
+    """'translate=fixed:0.1,*=lognormal:1:0.5' -> sampler per operation (default: no delay)"""
+    entries = dict(item.split('=', 1) for item in spec.split(',') if item.strip())
+    default = entries.pop('*', 'fixed:0')
+    return {operation: parse_distribution(entries.get(operation, default)) for operation in OPERATIONS}
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 when a request may pass, otherwise seconds until the next token"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeUpstream:
+    """Request behaviour shared by the server threads: latency, failures, throttling and counters"""
+
+    def __init__(self, latency: str = Config.FAKE_UPSTREAM_LATENCY,
+                 error_rate: float = Config.FAKE_UPSTREAM_ERROR_RATE,
+                 rate_limit: str = Config.FAKE_UPSTREAM_RATE_LIMIT,
+                 stream_chunks: int = Config.FAKE_UPSTREAM_STREAM_CHUNKS,
+                 chunk_interval: float = Config.FAKE_UPSTREAM_CHUNK_INTERVAL,
+                 seed: Optional[int] = None):
+        self.latencies = parse_latencies(latency)
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.chunk_interval = chunk_interval
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        if rate_limit:
+            count, seconds = rate_limit.split('/')
+            self._buckets = {operation: TokenBucket(int(count), float(seconds)) for operation in OPERATIONS}
+        self.stats = {operation: {} for operation in OPERATIONS}
+
+    def admit(self, operation: str) -> Tuple[int, float, float]:
+        """(status, latency, retry_after) for the next request to an operation"""
+        with self._lock:
+            retry_after = self._buckets[operation].take() if operation in self._buckets else 0.0
+            failed = self._rng.random() < self.error_rate
+            latency = self.latencies[operation](self._rng)
+        if retry_after:
+            return 429, 0.0, retry_after
+        return (503 if failed else 200), latency, 0.0
+
+    def record(self, operation: str, status: int):
+        with self._lock:
+            counts = self.stats[operation]
+            counts[status] = counts.get(status, 0) + 1
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: dict, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status: int, message: str, headers: Dict[str, str] = None):
+        reason = {429: 'RESOURCE_EXHAUSTED', 503: 'UNAVAILABLE', 404: 'NOT_FOUND'}.get(status, 'UNKNOWN')
+        self.send_json(status, {'error': {'code': status, 'message': message, 'status': reason}}, headers)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, {operation: {str(status): count for status, count in counts.items()}
+                                 for operation, counts in self.server.upstream.stats.items()})
+        else:
+            self.send_error_json(404, 'Not found')
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        for pattern, operation in ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            self.send_error_json(404, 'Not found')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        upstream = self.server.upstream
+        status, latency, retry_after = upstream.admit(operation)
+        upstream.record(operation, status)
+
+        if status == 429:
+            self.send_error_json(429, 'Quota exceeded', {'Retry-After': str(math.ceil(retry_after))})
+            return
+        time.sleep(latency)
+        if status != 200:
+            self.send_error_json(status, 'The service is currently unavailable')
+        elif operation == 'translate':
+            self.send_json(200, {'data': {'translations': [
+                {'translatedText': f"[{body.get('target', '')}] {body.get('q', '')}", 'model': body.get('model')}
+            ]}})
+        elif operation == 'vertex':
+            self.send_json(200, {'predictions': [{'content': STORY} for _ in body.get('instances', [])]})
+        elif match.group('method') == 'generateContent':
+            self.send_json(200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': CHAT_REPLY}]}}]})
+        else:
+            self.stream_reply(CHAT_REPLY, upstream)
+
+    def stream_reply(self, text: str, upstream: FakeUpstream):
+        """Server-sent events, one chunk of the reply every chunk_interval after the first"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = text.split(' ')
+        size = math.ceil(len(words) / max(upstream.stream_chunks, 1))
+        for index in range(0, len(words), size):
+            if index:
+                time.sleep(upstream.chunk_interval)
+            part = ' '.join(words[index:index + size]) + (' ' if index + size < len(words) else '')
+            event = 'data: ' + json.dumps({'candidates': [{'content': {'role': 'model', 'parts': [{'text': part}]}}]})
+            data = (event + '\n\n').encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 8089), upstream: FakeUpstream = None):
+        super().__init__(address, FakeUpstreamHandler)
+        self.upstream = upstream or FakeUpstream()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeUpstreamServer':
+        """Serve from a background thread (tests, benchmarks)"""
+        threading.Thread(target=self.serve_forever, name='fake-upstream', daemon=True).start()
+        return self
+
+
+# Client shims
+
+class UpstreamError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f'{code} {message}')
+        self.code = code
+
+
+def _raise_for_status(error: urllib.error.HTTPError):
+    """Raise what the Google client libraries raise for this status (TooManyRequests, ServiceUnavailable...)"""
+    try:
+        message = json.loads(error.read())['error']['message']
+    except (ValueError, KeyError):
+        message = error.reason
+    if google_exceptions is not None:
+        raise google_exceptions.from_http_status(error.code, message) from None
+    raise UpstreamError(error.code, message) from None
+
+
+def _post(url: str, body: dict):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        return urllib.request.urlopen(request, timeout=Config.FAKE_UPSTREAM_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        _raise_for_status(e)
+
+
+class FakeTranslateClient:
+    """google.cloud.translate_v2.Client.translate against the fake server"""
+
+    def __init__(self, base_url: str = Config.FAKE_UPSTREAM_URL):
+        self.base_url = base_url
+
+    def translate(self, values, target_language=None, format_=None, source_language=None,
+                  customization_ids=(), model=None):
+        single = isinstance(values, str)
+        results = []
+        for value in [values] if single else values:
+            with _post(f'{self.base_url}/language/translate/v2',
+                       {'q': value, 'target': target_language, 'source': source_language, 'model': model}) as response:
+                translation = json.loads(response.read())['data']['translations'][0]
+            results.append({'translatedText': translation['translatedText'], 'input': value, 'model': model})
+        return results[0] if single else results
+
+
+class Prediction:
+    def __init__(self, predictions: List[dict]):
+        self.predictions = predictions
+
+
+class FakeVertexModel:
+    """aiplatform.Model(...).predict against the fake server"""
+
+    def __init__(self, model_name: str, base_url: str = Config.FAKE_UPSTREAM_URL):
+        self.model_name = model_name
+        self.base_url = base_url
+
+    def predict(self, instances: List[dict], parameters: dict = None) -> Prediction:
+        with _post(f'{self.base_url}/v1/models/{self.model_name}:predict',
+                   {'instances': instances, 'parameters': parameters or {}}) as response:
+            return Prediction(json.loads(response.read())['predictions'])
+
+
+class GenerateContentResponse:
+    def __init__(self, candidates: List[dict]):
+        self.candidates = candidates
+
+    @property
+    def text(self) -> str:
+        return ''.join(part.get('text', '') for part in self.candidates[0]['content']['parts'])
+
+
+class StreamedResponse:
+    """Iterable of GenerateContentResponse chunks, like a genai streamed response"""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = []
+        self._done = False
+
+    def __iter__(self) -> Iterator[GenerateContentResponse]:
+        yield from self._chunks
+        if self._done:
+            return
+        with self._response:
+            for line in self._response:
+                if line.startswith(b'data: '):
+                    chunk = GenerateContentResponse(json.loads(line[6:])['candidates'])
+                    self._chunks.append(chunk)
+                    yield chunk
+        self._done = True
+
+    @property
+    def text(self) -> str:
+        return ''.join(chunk.text for chunk in self)
+
+
+class FakeGenerativeModel:
+    """google.generativeai.GenerativeModel against the fake server"""
+
+    def __init__(self, model_name: str = Config.GEMINI_MODEL_NAME, base_url: str = Config.FAKE_UPSTREAM_URL):
+        self.model_name = model_name
+        self.base_url = base_url
+
+    def generate_content(self, contents, stream: bool = False):
+        body = {'contents': [{'role': 'user', 'parts': [{'text': contents}]}]}
+        if stream:
+            response = _post(f'{self.base_url}/v1beta/models/{self.model_name}:streamGenerateContent?alt=sse', body)
+            return StreamedResponse(response)
+        with _post(f'{self.base_url}/v1beta/models/{self.model_name}:generateContent', body) as response:
+            return GenerateContentResponse(json.loads(response.read())['candidates'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve fake Vertex AI, Translation and Gemini endpoints')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(urlparse(Config.FAKE_UPSTREAM_URL).port or 8089))
+    parser.add_argument('--seed', type=int, help='make latencies and failures reproducible')
+    args = parser.parse_args()
+
+    server = FakeUpstreamServer((args.host, args.port), FakeUpstream(seed=args.seed))
+    print(f"Fake upstream listening on {server.url}")
+    print(f"  latency: {Config.FAKE_UPSTREAM_LATENCY}")
+    print(f"  errors: {Config.FAKE_UPSTREAM_ERROR_RATE:.1%}, rate limit: {Config.FAKE_UPSTREAM_RATE_LIMIT or 'none'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
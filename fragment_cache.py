@@ -0,0 +1,117 @@
+"""
+Rendered-fragment cache for catalog pages
+Fragments are keyed on the page's parameters plus a catalog version that
+lives in the database, so bumping it from any process (new product,
+deleted product, finished image job) invalidates every worker's copies;
+memory is bounded by an LRU over entries and total size
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+from markupsafe import Markup
+from config import Config
+from db import connect_db
+
+
+def init_catalog_tables(cursor):
+    """Create the single-row catalog version table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+
+
+def bump_catalog_version(cursor):
+    """Invalidate cached fragments; call in the transaction that changes the catalog"""
+    cursor.execute('UPDATE catalog_version SET version = version + 1 WHERE id = 1')
+
+
+def get_catalog_version(db_path: str = Config.DATABASE_PATH) -> int:
+    conn = connect_db(db_path)
+    row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+class FragmentCache:
+    def __init__(self, max_entries: int = Config.FRAGMENT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = Config.FRAGMENT_CACHE_MAX_BYTES,
+                 enabled: bool = Config.FRAGMENT_CACHE_ENABLED,
+                 db_path: str = Config.DATABASE_PATH):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.db_path = db_path
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        """
+        Cached fragment for key, rendering (queries and template) on a miss.
+
+        The fragment must not contain anything specific to the current
+        user; those parts stay in the surrounding page.
+        """
+        if not self.enabled:
+            return Markup(render())
+
+        version = get_catalog_version(self.db_path)
+        with self._lock:
+            if version != self._version:
+                # Everything cached belongs to an older catalog
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        # Render outside the lock; concurrent misses for one key both render
+        fragment = Markup(render())
+        size = len(fragment)
+        if size > self.max_bytes:
+            return fragment
+
+        with self._lock:
+            if version != self._version:
+                return fragment
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = fragment
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'catalog_version': self._version
+            }
+
+# Global fragment cache instance
+fragment_cache = FragmentCache()
@@ -5,8 +5,13 @@ Handles Translation API and Vertex AI integration
 
 import os
 import json
+import functools
+import time
 from typing import List, Dict, Any, Optional
 from config import Config
+from fake_upstream import FakeTranslateClient, FakeVertexModel
+from metrics import track_upstream
+from tracing import traced
 
 try:
     from google.cloud import translate_v2 as translate
@@ -16,34 +21,68 @@ except ImportError:
     GCP_AVAILABLE = False
     print("Warning: Google Cloud libraries not installed. Using mock services.")
 
+def simulate_upstream_latency():
+    """Stand in for a real API round trip when running on mock services (load testing)"""
+    if Config.SIMULATED_UPSTREAM_LATENCY:
+        time.sleep(Config.SIMULATED_UPSTREAM_LATENCY)
+
 class GCPServices:
     def __init__(self):
         self.project_id = Config.GCP_PROJECT_ID
         self.region = Config.GCP_DEFAULT_REGION
-        self.translate_client = None
-        self.vertex_ai_initialized = False
-        
-        if GCP_AVAILABLE and self.project_id != 'your-project-id':
+        self._translate_client = None
+        self._vertex_ai_initialized = False
+        self._vertex_model = None
+        # Clients are created on first use in the process that uses them:
+        # gRPC channels must not be opened in a preloading master and then
+        # inherited by forked workers
+        self._initialized_pid = None
+
+    @property
+    def translate_client(self):
+        self._ensure_initialized()
+        return self._translate_client
+
+    @property
+    def vertex_ai_initialized(self) -> bool:
+        self._ensure_initialized()
+        return self._vertex_ai_initialized
+
+    def _ensure_initialized(self):
+        """Initialize the clients once per process"""
+        if self._initialized_pid == os.getpid():
+            return
+        self._initialized_pid = os.getpid()
+        self._translate_client = None
+        self._vertex_ai_initialized = False
+        if Config.AI_BACKEND == 'fake':
+            # Local fake upstream server (fake_upstream.py)
+            self._translate_client = FakeTranslateClient(Config.FAKE_UPSTREAM_URL)
+            self._vertex_model = functools.partial(FakeVertexModel, base_url=Config.FAKE_UPSTREAM_URL)
+            self._vertex_ai_initialized = True
+        elif Config.AI_BACKEND == 'auto' and GCP_AVAILABLE and self.project_id != 'your-project-id':
             self._initialize_services()
     
     def _initialize_services(self):
         """Initialize GCP services"""
         try:
             # Initialize Translation API
-            self.translate_client = translate.Client()
+            self._translate_client = translate.Client()
             
             # Initialize Vertex AI
             aiplatform.init(
                 project=self.project_id,
                 location=self.region
             )
-            self.vertex_ai_initialized = True
-            print(f"GCP services initialized for project: {self.project_id}, region: {self.region}")
+            self._vertex_model = aiplatform.Model
+            self._vertex_ai_initialized = True
+            print(f"GCP services initialized for project: {self.project_id}, region: {self.region} (pid {os.getpid()})")
         except Exception as e:
             print(f"Error initializing GCP services: {e}")
-            self.translate_client = None
-            self.vertex_ai_initialized = False
+            self._translate_client = None
+            self._vertex_ai_initialized = False
     
+    @traced('GCPServices.translate_text')
     def translate_text(self, text: str, target_language: str, source_language: str = 'en') -> str:
         """
         Translate text using Google Cloud Translation API
@@ -58,17 +97,19 @@ class GCPServices:
         """
         if not self.translate_client:
             print(f"Translation client not initialized. Falling back to mock translation for {target_language}.")
+            simulate_upstream_latency()
             return self._mock_translate(text, target_language)
         
         try:
             # Ensure target_language is a valid ISO code (e.g., 'hi' for Hindi)
             valid_lang = target_language.split('-')[0].lower()
-            result = self.translate_client.translate(
-                text,
-                target_language=valid_lang,
-                source_language=source_language,
-                model=Config.TRANSLATION_MODEL
-            )
+            with track_upstream('translate', 'translate'):
+                result = self.translate_client.translate(
+                    text,
+                    target_language=valid_lang,
+                    source_language=source_language,
+                    model=Config.TRANSLATION_MODEL
+                )
             return result['translatedText']
         except Exception as e:
             print(f"Translation error for '{text}' to '{target_language}': {e}")
@@ -89,6 +130,7 @@ class GCPServices:
         lang_name = language_names.get(target_language, target_language)
         return f"[Translated to {lang_name}] {text}"
     
+    @traced('GCPServices.generate_ai_story')
     def generate_ai_story(self, description: str, category: str, artisan_name: str = "") -> str:
         """
         Generate AI story using Vertex AI
@@ -102,6 +144,7 @@ class GCPServices:
             Generated AI story
         """
         if not self.vertex_ai_initialized:
+            simulate_upstream_latency()
             return self._mock_generate_story(description, category, artisan_name)
         
         try:
@@ -123,15 +166,16 @@ class GCPServices:
             """
             
             # Use Vertex AI text generation
-            model = aiplatform.Model(Config.VERTEX_AI_MODEL_NAME)
-            response = model.predict(
-                instances=[{"prompt": prompt}],
-                parameters={
-                    "temperature": 0.8,
-                    "max_output_tokens": 500,
-                    "top_p": 0.9
-                }
-            )
+            model = self._vertex_model(Config.VERTEX_AI_MODEL_NAME)
+            with track_upstream('vertex', 'story'):
+                response = model.predict(
+                    instances=[{"prompt": prompt}],
+                    parameters={
+                        "temperature": 0.8,
+                        "max_output_tokens": 500,
+                        "top_p": 0.9
+                    }
+                )
             
             if response.predictions:
                 return response.predictions[0].get('content', '')
@@ -159,6 +203,7 @@ class GCPServices:
         
         return base_story
     
+    @traced('GCPServices.get_enhanced_recommendations')
     def get_enhanced_recommendations(self, user_id: int, user_preferences: str = "", 
                                    interaction_history: List[Dict] = None) -> List[Dict]:
         """
@@ -194,14 +239,15 @@ class GCPServices:
             Focus on categories and styles that align with their behavior.
             """
             
-            model = aiplatform.Model(Config.VERTEX_AI_MODEL_NAME)
-            response = model.predict(
-                instances=[{"prompt": prompt}],
-                parameters={
-                    "temperature": 0.7,
-                    "max_output_tokens": 300
-                }
-            )
+            model = self._vertex_model(Config.VERTEX_AI_MODEL_NAME)
+            with track_upstream('vertex', 'recommendations'):
+                response = model.predict(
+                    instances=[{"prompt": prompt}],
+                    parameters={
+                        "temperature": 0.7,
+                        "max_output_tokens": 300
+                    }
+                )
             
             # Parse the response and return recommendations
             if response.predictions:
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for benchmarking
+Builds a marketplace database at a chosen scale with realistic skew:
+Zipfian product popularity, buyer activity and artisan catalog size, a
+weighted category mix, log-normal prices and product text in the
+languages artisans register with. The same seed always produces the same
+rows.
+
+    python generate_data.py --size medium --output bench.db [--seed 42] [--force]
+    DATABASE_PATH=bench.db python serve.py
+
+Every generated account uses the password 'password123'
+(artisan0000001, buyer0000001, admin0000001, ...).
+"""
+
+import argparse
+import hashlib
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from array import array
+from bisect import bisect
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+from fragment_cache import bump_catalog_version
+from schema import init_db
+
+# (artisans, buyers, products, buyer_interactions, buyers with a cart)
+PRESETS = {
+    'tiny': (20, 100, 500, 5_000, 20),
+    'small': (200, 2_000, 10_000, 100_000, 300),
+    'medium': (2_000, 50_000, 200_000, 2_000_000, 5_000),
+    'large': (10_000, 200_000, 1_000_000, 10_000_000, 20_000),
+    'xlarge': (25_000, 500_000, 3_000_000, 30_000_000, 50_000),
+}
+
+# Rows per executemany call
+BATCH_SIZE = 50_000
+
+# Zipf exponents: a few products and buyers account for most of the traffic,
+# a few artisans for most of the catalog
+PRODUCT_POPULARITY_SKEW = 1.1
+BUYER_ACTIVITY_SKEW = 0.9
+ARTISAN_CATALOG_SKEW = 0.8
+
+# Category -> (share of the catalog, median price in INR)
+CATEGORIES = {
+    'handicraft': (0.30, 900),
+    'jewelry': (0.25, 2500),
+    'textile': (0.20, 1800),
+    'pottery': (0.15, 1500),
+    'woodwork': (0.10, 3000),
+}
+PRICE_SPREAD = 0.6  # sigma of the log-normal price distribution
+
+# Share of artisans per registration language (see register_artisan.html)
+LANGUAGES = {'en': 0.45, 'hi': 0.20, 'es': 0.10, 'fr': 0.07, 'de': 0.05, 'zh': 0.06, 'ja': 0.07}
+STORY_RATE = 0.3  # products with an AI story
+
+# Product vocabulary per language: adjectives and, per category, nouns
+VOCABULARY = {
+    'en': (['Handcrafted', 'Rustic', 'Elegant', 'Hand-painted', 'Vintage', 'Traditional'],
+           {'handicraft': ['Basket', 'Wall Hanging', 'Lamp', 'Mirror Frame'],
+            'jewelry': ['Necklace', 'Bangle', 'Earrings', 'Pendant'],
+            'textile': ['Scarf', 'Rug', 'Cushion Cover', 'Tapestry'],
+            'pottery': ['Vase', 'Bowl', 'Teapot', 'Planter'],
+            'woodwork': ['Clock', 'Tray', 'Jewelry Box', 'Chess Set']},
+           '{adjective} {noun} made by hand with traditional techniques. Each piece is unique.'),
+    'hi': (['हस्तनिर्मित', 'पारंपरिक', 'सुंदर', 'रंगीन', 'प्राचीन', 'नक्काशीदार'],
+           {'handicraft': ['टोकरी', 'दीवार सजावट', 'दीपक', 'दर्पण फ्रेम'],
+            'jewelry': ['हार', 'कंगन', 'झुमके', 'लॉकेट'],
+            'textile': ['दुपट्टा', 'दरी', 'कुशन कवर', 'चादर'],
+            'pottery': ['फूलदान', 'कटोरा', 'केतली', 'गमला'],
+            'woodwork': ['घड़ी', 'ट्रे', 'गहनों का डिब्बा', 'शतरंज']},
+           '{adjective} {noun}, पारंपरिक तकनीकों से हाथ से बना। हर टुकड़ा अनोखा है।'),
+    'es': (['Artesanal', 'Rústico', 'Elegante', 'Pintado a mano', 'Antiguo', 'Tradicional'],
+           {'handicraft': ['Cesta', 'Tapiz de pared', 'Lámpara', 'Marco de espejo'],
+            'jewelry': ['Collar', 'Brazalete', 'Pendientes', 'Colgante'],
+            'textile': ['Bufanda', 'Alfombra', 'Funda de cojín', 'Tapiz'],
+            'pottery': ['Jarrón', 'Cuenco', 'Tetera', 'Maceta'],
+            'woodwork': ['Reloj', 'Bandeja', 'Joyero', 'Ajedrez']},
+           '{noun} {adjective}, hecho a mano con técnicas tradicionales. Cada pieza es única.'),
+    'fr': (['Artisanal', 'Rustique', 'Élégant', 'Peint à la main', 'Ancien', 'Traditionnel'],
+           {'handicraft': ['Panier', 'Tenture murale', 'Lampe', 'Cadre de miroir'],
+            'jewelry': ['Collier', 'Bracelet', "Boucles d'oreilles", 'Pendentif'],
+            'textile': ['Écharpe', 'Tapis', 'Housse de coussin', 'Tapisserie'],
+            'pottery': ['Vase', 'Bol', 'Théière', 'Jardinière'],
+            'woodwork': ['Horloge', 'Plateau', 'Boîte à bijoux', "Jeu d'échecs"]},
+           '{noun} {adjective}, fait main selon des techniques traditionnelles. Chaque pièce est unique.'),
+    'de': (['Handgefertigt', 'Rustikal', 'Elegant', 'Handbemalt', 'Antik', 'Traditionell'],
+           {'handicraft': ['Korb', 'Wandbehang', 'Lampe', 'Spiegelrahmen'],
+            'jewelry': ['Halskette', 'Armreif', 'Ohrringe', 'Anhänger'],
+            'textile': ['Schal', 'Teppich', 'Kissenbezug', 'Wandteppich'],
+            'pottery': ['Vase', 'Schale', 'Teekanne', 'Pflanzgefäß'],
+            'woodwork': ['Uhr', 'Tablett', 'Schmuckkästchen', 'Schachspiel']},
+           '{noun} ({adjective}), in traditioneller Handarbeit gefertigt. Jedes Stück ist ein Unikat.'),
+    'zh': (['手工', '质朴', '优雅', '手绘', '复古', '传统'],
+           {'handicraft': ['篮子', '挂毯', '灯', '镜框'],
+            'jewelry': ['项链', '手镯', '耳环', '吊坠'],
+            'textile': ['围巾', '地毯', '靠垫套', '挂毯'],
+            'pottery': ['花瓶', '碗', '茶壶', '花盆'],
+            'woodwork': ['时钟', '托盘', '首饰盒', '棋盘']},
+           '{adjective}{noun}，采用传统工艺手工制作，每件都独一无二。'),
+    'ja': (['手作り', '素朴な', '上品な', '手描きの', 'ヴィンテージ', '伝統的な'],
+           {'handicraft': ['かご', 'タペストリー', 'ランプ', '鏡枠'],
+            'jewelry': ['ネックレス', 'バングル', 'イヤリング', 'ペンダント'],
+            'textile': ['スカーフ', 'ラグ', 'クッションカバー', 'タペストリー'],
+            'pottery': ['花瓶', '鉢', '急須', '植木鉢'],
+            'woodwork': ['時計', 'トレイ', '宝石箱', 'チェスセット']},
+           '{adjective}{noun}。伝統的な技法で一つひとつ手作りしています。'),
+}
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Rohan', 'Ananya', 'Vikram', 'Meera', 'Arjun', 'Kavya', 'John', 'Maria',
+               'Akira', 'Sophie', 'Lukas', 'Wei', 'Carmen', 'Amélie', 'Yuki', 'Ravi', 'Fatima', 'Diego']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Khan', 'Singh', 'Smith', 'Garcia', 'Tanaka', 'Dubois',
+              'Müller', 'Chen', 'López', 'Martin', 'Sato', 'Das', 'Nair', 'Gupta', 'Rossi', 'Kumar']
+CITIES = ['Jaipur, India', 'Varanasi, India', 'Kutch, India', 'Mysuru, India', 'Kolkata, India',
+          'New York, USA', 'Barcelona, Spain', 'Paris, France', 'Berlin, Germany', 'Kyoto, Japan',
+          'Jingdezhen, China', 'Oaxaca, Mexico']
+
+# Generated rows cover the year before this date, so the same seed gives the same timestamps
+END_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+HISTORY_DAYS = 365
+
+PASSWORD = 'password123'
+ADMINS = 3
+
+
+def zipf_cum_weights(count: int, skew: float) -> array:
+    """Cumulative weights for rank 1..count with weight 1 / rank**skew"""
+    return array('d', itertools.accumulate(1.0 / rank ** skew for rank in range(1, count + 1)))
+
+
+def weighted_keys(shares: Dict[str, float]) -> Tuple[List[str], List[float]]:
+    keys = list(shares)
+    return keys, list(itertools.accumulate(shares[key] for key in keys))
+
+
+def timestamps(rng: random.Random, count: int, days: int = HISTORY_DAYS) -> Iterator[str]:
+    """count ascending 'YYYY-MM-DD HH:MM:SS' stamps spread over the last days before END_DATE"""
+    end = END_DATE.timestamp()
+    step = days * 86400 / max(count, 1)
+    moment = end - days * 86400
+    day, prefix = None, ''
+    for _ in range(count):
+        moment += rng.expovariate(1.0 / step)
+        second = int(min(moment, end - 1))
+        # strftime per row would dominate at tens of millions of rows; format
+        # the date once per day and the time of day arithmetically
+        if second // 86400 != day:
+            day = second // 86400
+            prefix = datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d ')
+        of_day = second % 86400
+        yield f'{prefix}{of_day // 3600:02d}:{of_day // 60 % 60:02d}:{of_day % 60:02d}'
+
+
+def batched(rows: Iterator[tuple], size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class DataGenerator:
+    def __init__(self, conn: sqlite3.Connection, seed: int, artisans: int, buyers: int, products: int,
+                 interactions: int, carts: int):
+        self.conn = conn
+        self.seed = seed
+        self.counts = {'artisans': artisans, 'buyers': buyers, 'products': products,
+                       'buyer_interactions': interactions, 'cart': carts}
+        self.password = hashlib.sha256(PASSWORD.encode()).hexdigest()
+        self.artisan_languages = []
+
+    def rng(self, table: str) -> random.Random:
+        """Independent stream per table: resizing one table leaves the others unchanged"""
+        return random.Random(f'{self.seed}:{table}')
+
+    def insert(self, table: str, columns: Tuple[str, ...], rows: Iterator[tuple]):
+        started = time.perf_counter()
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        total = 0
+        for batch in batched(rows):
+            self.conn.executemany(sql, batch)
+            total += len(batch)
+        self.conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"✓ {table}: {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    def artisan_rows(self) -> Iterator[tuple]:
+        rng = self.rng('artisans')
+        languages, language_weights = weighted_keys(LANGUAGES)
+        created = timestamps(rng, self.counts['artisans'], days=HISTORY_DAYS * 3)
+        for artisan_id in range(1, self.counts['artisans'] + 1):
+            language = languages[bisect(language_weights, rng.random() * language_weights[-1])]
+            self.artisan_languages.append(language)
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            yield (artisan_id, f'artisan{artisan_id:07d}', f'artisan{artisan_id}@example.com', self.password,
+                   name, rng.choice(CITIES), language, next(created))
+
+    def buyer_rows(self) -> Iterator[tuple]:
+        rng = self.rng('buyers')
+        created = timestamps(rng, self.counts['buyers'], days=HISTORY_DAYS * 2)
+        for buyer_id in range(1, self.counts['buyers'] + 1):
+            preferences = ', '.join(sorted(rng.sample(list(CATEGORIES), rng.randint(1, 3))))
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            yield (buyer_id, f'buyer{buyer_id:07d}', f'buyer{buyer_id}@example.com', self.password,
+                   name, preferences, next(created))
+
+    def product_rows(self) -> Iterator[tuple]:
+        rng = self.rng('products')
+        categories, category_weights = weighted_keys({name: share for name, (share, _) in CATEGORIES.items()})
+        # Catalog size per artisan is Zipfian over a random ranking of artisans
+        artisan_ranking = list(range(1, self.counts['artisans'] + 1))
+        rng.shuffle(artisan_ranking)
+        artisan_weights = zipf_cum_weights(len(artisan_ranking), ARTISAN_CATALOG_SKEW)
+        created = timestamps(rng, self.counts['products'])
+
+        for product_id in range(1, self.counts['products'] + 1):
+            artisan_id = artisan_ranking[bisect(artisan_weights, rng.random() * artisan_weights[-1])]
+            language = self.artisan_languages[artisan_id - 1]
+            adjectives, nouns, template = VOCABULARY[language]
+            category = categories[bisect(category_weights, rng.random() * category_weights[-1])]
+            adjective, noun = rng.choice(adjectives), rng.choice(nouns[category])
+            name = f'{adjective} {noun}' if language not in ('zh', 'ja') else f'{adjective}{noun}'
+            description = template.format(adjective=adjective, noun=noun)
+            price = round(rng.lognormvariate(math.log(CATEGORIES[category][1]), PRICE_SPREAD), 2)
+            story = (f'Every {noun.lower()} from this workshop carries a family tradition of {category} '
+                     f'passed down through generations.') if rng.random() < STORY_RATE else None
+            created_at = next(created)
+            # updated_at is set so the products_touch_insert trigger stays idle
+            yield (product_id, artisan_id, name, description, category, price, story, language,
+                   created_at, created_at)
+
+    def interaction_rows(self) -> Iterator[tuple]:
+        rng = self.rng('buyer_interactions')
+        # Popularity follows a random ranking, so popular products are spread over the id range
+        product_ranking = array('l', range(1, self.counts['products'] + 1))
+        rng.shuffle(product_ranking)
+        product_weights = zipf_cum_weights(len(product_ranking), PRODUCT_POPULARITY_SKEW)
+        buyer_ranking = array('l', range(1, self.counts['buyers'] + 1))
+        rng.shuffle(buyer_ranking)
+        buyer_weights = zipf_cum_weights(len(buyer_ranking), BUYER_ACTIVITY_SKEW)
+        product_total, buyer_total = product_weights[-1], buyer_weights[-1]
+        draw = rng.random
+
+        created = timestamps(rng, self.counts['buyer_interactions'])
+        for interaction_id, created_at in enumerate(created, start=1):
+            yield (interaction_id,
+                   buyer_ranking[bisect(buyer_weights, draw() * buyer_total)],
+                   product_ranking[bisect(product_weights, draw() * product_total)],
+                   'view', created_at)
+
+    def cart_rows(self) -> Iterator[tuple]:
+        rng = self.rng('cart')
+        buyers = rng.sample(range(1, self.counts['buyers'] + 1), min(self.counts['cart'], self.counts['buyers']))
+        created = timestamps(rng, len(buyers), days=30)
+        for buyer_id in sorted(buyers):
+            added_at = next(created)
+            items = rng.sample(range(1, self.counts['products'] + 1), min(rng.randint(1, 5), self.counts['products']))
+            for product_id in items:
+                yield (buyer_id, product_id, rng.randint(1, 3), added_at)
+
+    def admin_rows(self) -> Iterator[tuple]:
+        for admin_id in range(1, ADMINS + 1):
+            yield (admin_id, f'admin{admin_id:07d}', f'admin{admin_id}@example.com', self.password,
+                   f'Administrator {admin_id}')
+
+    def run(self):
+        self.insert('admins', ('id', 'username', 'email', 'password', 'name'), self.admin_rows())
+        self.insert('artisans', ('id', 'username', 'email', 'password', 'name', 'location', 'language',
+                                 'created_at'), self.artisan_rows())
+        self.insert('buyers', ('id', 'username', 'email', 'password', 'name', 'preferences', 'created_at'),
+                    self.buyer_rows())
+        self.insert('products', ('id', 'artisan_id', 'name', 'description', 'category', 'price', 'ai_story',
+                                 'language', 'created_at', 'updated_at'), self.product_rows())
+        self.insert('buyer_interactions', ('id', 'buyer_id', 'product_id', 'interaction_type', 'created_at'),
+                    self.interaction_rows())
+        self.insert('cart', ('buyer_id', 'product_id', 'quantity', 'added_at'), self.cart_rows())
+
+
+def generate(output: str, size: str = 'small', seed: int = 42, force: bool = False, **overrides):
+    """
+    Build a database at output with the schema of the app and a preset's row
+    counts (individual counts can be overridden: artisans=..., buyers=...).
+    """
+    if os.path.exists(output):
+        if not force:
+            raise SystemExit(f"{output} already exists; pass --force to replace it")
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(output + suffix):
+                os.remove(output + suffix)
+
+    # Same schema (tables, triggers, migrations) as the app creates
+    init_db(output)
+
+    artisans, buyers, products, interactions, carts = PRESETS[size]
+    counts = dict(artisans=artisans, buyers=buyers, products=products, interactions=interactions, carts=carts)
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    print(f"Generating '{size}' dataset into {output} (seed {seed}):",
+          ', '.join(f'{name}={value:,}' for name, value in counts.items()))
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(output)
+    # Bulk-load settings: no rollback journal or fsync, so a crash mid-run leaves
+    # a corrupt file; rerun with --force
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-262144')  # 256MB
+
+    DataGenerator(conn, seed, **counts).run()
+
+    bump_catalog_version(conn.cursor())
+    conn.commit()
+    print("Analyzing...")
+    conn.execute('ANALYZE')
+    conn.close()
+    print(f"\nDone in {time.perf_counter() - started:.1f}s: {output} ({os.path.getsize(output) / 1e6:,.0f} MB)")
+    print(f"Serve it with: DATABASE_PATH={output} python serve.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic marketplace database for benchmarking')
+    parser.add_argument('--size', choices=list(PRESETS), default='small')
+    parser.add_argument('--output', default='benchmark.db', help='database file to create')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='replace an existing output file')
+    for name in ('artisans', 'buyers', 'products', 'interactions', 'carts'):
+        parser.add_argument(f'--{name}', type=int, help=f'override the number of {name}')
+    args = parser.parse_args()
+
+    generate(args.output, args.size, args.seed, args.force, artisans=args.artisans, buyers=args.buyers,
+             products=args.products, interactions=args.interactions, carts=args.carts)
+
+if __name__ == "__main__":
+    main()
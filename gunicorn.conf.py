@@ -0,0 +1,82 @@
+"""
+Gunicorn configuration
+gevent workers by default: a request waiting on Vertex AI, Translation or
+Gemini yields its worker to other requests instead of pinning it, while
+SQLite-backed routes run as before (their calls are short and don't yield)
+
+    python serve.py     (or: gunicorn -c gunicorn.conf.py app:app)
+
+Workers and threads are derived from the CPUs available and the worker
+class (serve.tuned_settings). The app is preloaded in the master, so the
+database migration and template warm-up run once and workers share the
+result; anything that must not cross a fork (SQLite connections, thread
+pools, gRPC channels) is created lazily per worker or reset in post_fork.
+
+GUNICORN_WORKER_CLASS=sync restores one-request-per-worker serving.
+"""
+
+import os
+import sys
+
+# The config is loaded before gunicorn changes into the app directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from serve import settings_from_env
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+_tuned = settings_from_env()
+workers = _tuned['workers']
+threads = _tuned['threads']
+# Concurrent requests per gevent worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '200'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers to bound slow leaks; the jitter keeps them from all
+# restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# A worker silent for this long is killed (sync: a single request's limit)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# Time to finish in-flight requests on restart or recycle
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Heartbeat files on tmpfs: a slow container disk can stall workers into timeouts
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+if worker_class == 'gevent':
+    # Chat calls run on the executor's (now cooperative) threads; let it
+    # hold as many in-flight upstream calls as a worker has connections
+    os.environ.setdefault('CHAT_MAX_WORKERS', '64')
+    os.environ.setdefault('CHAT_MAX_QUEUE', '128')
+
+    # Patch before the preloaded app imports socket/threading/grpc, and make
+    # gRPC (Google Cloud clients) cooperate before any channel is created
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except ImportError:
+        pass
+
+
+def on_starting(server):
+    """Start /metrics from zero rather than merging a previous run's workers"""
+    from metrics import reset_metrics_dir
+    reset_metrics_dir()
+
+
+def when_ready(server):
+    server.log.info("Serving with %d %s workers x %d threads (preload=%s)",
+                    workers, worker_class, threads, preload_app)
+
+
+def post_fork(server, worker):
+    """Drop per-process state inherited from the preloaded master"""
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.reset_after_fork()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Image derivative pipeline for product uploads
+Strips metadata from uploads (upright, before they are hashed) and writes
+responsive WebP and JPEG variants of each uploaded image, recording them in the database (with
+the dimensions and a tiny inline placeholder) so templates can emit
+srcset and reserve layout space
+
+Run directly to backfill variants and placeholders for existing product images:
+    python image_pipeline.py
+"""
+
+import base64
+import io
+import os
+from typing import Dict, Iterable, List
+from PIL import ExifTags, Image, ImageOps
+from config import Config
+from db import add_column_if_missing, connect_db
+from fragment_cache import bump_catalog_version, init_catalog_tables
+
+# Quality used when re-saving the (metadata-free) original
+MASTER_JPEG_QUALITY = 92
+
+
+def init_image_tables(cursor):
+    """Create the image bookkeeping tables"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            filename TEXT PRIMARY KEY,
+            width INTEGER,
+            height INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_variants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            FOREIGN KEY (filename) REFERENCES images (filename)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_image_variants_filename
+        ON image_variants (filename)
+    ''')
+    # 'pending' until the image worker has produced the variants
+    add_column_if_missing(cursor, 'images', 'status', "TEXT DEFAULT 'ready'")
+    # data: URI of a ~20px WebP shown until the real image arrives
+    add_column_if_missing(cursor, 'images', 'placeholder', 'TEXT')
+    
+    # Queue of uploads waiting for the image worker
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_image_jobs_status
+        ON image_jobs (status, id)
+    ''')
+
+
+def _variant_widths(width: int) -> List[int]:
+    """Configured widths smaller than the original, plus the capped original width"""
+    widths = [w for w in Config.IMAGE_VARIANT_WIDTHS if w < width]
+    widths.append(min(width, Config.IMAGE_VARIANT_WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy of an image, compositing any transparency onto white"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def make_placeholder(image: Image.Image) -> str:
+    """Base64 data URI of a tiny WebP of the image (a few hundred bytes)"""
+    width = Config.IMAGE_PLACEHOLDER_WIDTH
+    height = max(1, round(image.height * width / image.width))
+    thumbnail = _flatten(image).resize((width, height), Image.BILINEAR)
+
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'WEBP', quality=Config.IMAGE_PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def strip_metadata(path: str) -> bool:
+    """
+    Rewrite an image upright and without its EXIF/GPS metadata, in place.
+
+    Only JPEG, PNG and WebP files carrying EXIF are re-encoded, so clean
+    uploads keep their bytes. Files Pillow can't read, or that are over the
+    pixel limit, are left as they are for process_image to reject.
+
+    Returns:
+        True if the file was rewritten
+    """
+    try:
+        with Image.open(path) as original:
+            if 'exif' not in original.info or original.format not in ('JPEG', 'PNG', 'WEBP'):
+                return False
+            if original.width * original.height > Config.IMAGE_MAX_PIXELS:
+                return False
+            original_format = original.format
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        return False
+
+    # Pillow only writes EXIF when it is passed to save()
+    if original_format == 'JPEG':
+        _flatten(image).save(path, 'JPEG', quality=MASTER_JPEG_QUALITY, optimize=True)
+    else:
+        image.save(path, original_format)
+    return True
+
+
+def process_image(filename: str, upload_folder: str = Config.UPLOAD_FOLDER) -> Dict:
+    """
+    Write the responsive variants of an uploaded image.
+
+    The stored original is left untouched: uploads are made upright and
+    stripped of metadata by strip_metadata() before they are hashed, so
+    the file keeps matching its content address.
+
+    Args:
+        filename: Name of the uploaded file inside upload_folder
+        upload_folder: Directory holding uploads and variants
+
+    Returns:
+        Dict with the oriented width and height, the placeholder data URI
+        and a list of variants as (width, height, format, variant filename) tuples
+    """
+    path = os.path.join(upload_folder, filename)
+    stem = os.path.splitext(filename)[0]
+
+    largest = Config.IMAGE_VARIANT_WIDTHS[-1]
+
+    with Image.open(path) as original:
+        if original.width * original.height > Config.IMAGE_MAX_PIXELS:
+            raise ValueError(f'{filename} is {original.width}x{original.height}, over the pixel limit')
+
+        # Bound decode memory: JPEGs are decoded straight at a reduced
+        # scale (still at least the largest variant in both dimensions),
+        # other formats are box-reduced right after decoding
+        original.draft('RGB', (largest, largest))
+        original.load()
+        factor = min(original.width, original.height) // largest
+        decoded = original.reduce(factor) if factor >= 2 else original
+        # Files stored before uploads were stripped may still carry an orientation
+        image = ImageOps.exif_transpose(decoded)
+        image.load()
+
+    width, height = image.size
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    webp_source = image.convert('RGBA' if has_alpha else 'RGB')
+    jpeg_source = _flatten(image)
+
+    variants = []
+    for target_width in _variant_widths(width):
+        target_height = max(1, round(height * target_width / width))
+        size = (target_width, target_height)
+
+        webp_name = f'{stem}_{target_width}w.webp'
+        webp_source.resize(size, Image.LANCZOS).save(
+            os.path.join(upload_folder, webp_name), 'WEBP', quality=Config.IMAGE_WEBP_QUALITY, method=4)
+        variants.append((target_width, target_height, 'webp', webp_name))
+
+        jpeg_name = f'{stem}_{target_width}w.jpg'
+        jpeg_source.resize(size, Image.LANCZOS).save(
+            os.path.join(upload_folder, jpeg_name), 'JPEG', quality=Config.IMAGE_JPEG_QUALITY,
+            optimize=True, progressive=True)
+        variants.append((target_width, target_height, 'jpeg', jpeg_name))
+
+    return {'width': width, 'height': height, 'placeholder': make_placeholder(image), 'variants': variants}
+
+
+def save_image_record(cursor, filename: str, info: Dict):
+    """Store an image's dimensions, placeholder and variants (replacing any previous ones)"""
+    cursor.execute('''
+        INSERT OR REPLACE INTO images (filename, width, height, placeholder, status)
+        VALUES (?, ?, ?, ?, 'ready')
+    ''', (filename, info['width'], info['height'], info['placeholder']))
+    cursor.execute('DELETE FROM image_variants WHERE filename = ?', (filename,))
+    cursor.executemany('''
+        INSERT INTO image_variants (filename, width, height, format, variant)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(filename,) + variant for variant in info['variants']])
+
+
+def load_image_variants(filenames: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Look up variants for a page's worth of images in one pass.
+
+    Returns:
+        {filename: {'status', 'width', 'height', 'placeholder', 'webp': [(width, variant)], 'jpeg': [...]}}
+        for every filename known to the images table
+    """
+    filenames = sorted({name for name in filenames if name})
+    images = {}
+    if not filenames:
+        return images
+
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(filenames), 500):
+        chunk = filenames[start:start + 500]
+        placeholders = ','.join(['?' for _ in chunk])
+        cursor.execute(f'''
+            SELECT i.filename, i.status, i.width, i.height, i.placeholder, v.width, v.format, v.variant
+            FROM images i
+            LEFT JOIN image_variants v ON v.filename = i.filename
+            WHERE i.filename IN ({placeholders})
+            ORDER BY v.width
+        ''', chunk)
+
+        for filename, status, width, height, placeholder, variant_width, variant_format, variant in cursor.fetchall():
+            info = images.setdefault(filename, {'status': status, 'width': width, 'height': height,
+                                                'placeholder': placeholder, 'webp': [], 'jpeg': []})
+            if variant_format:
+                info[variant_format].append((variant_width, variant))
+
+    conn.close()
+    return images
+
+
+def placeholder_for_file(path: str) -> Dict:
+    """Oriented dimensions and placeholder of an existing image, decoded at low resolution"""
+    with Image.open(path) as original:
+        width, height = original.size
+        if original.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            width, height = height, width
+        original.draft('RGB', (Config.IMAGE_PLACEHOLDER_WIDTH * 4, Config.IMAGE_PLACEHOLDER_WIDTH * 4))
+        image = ImageOps.exif_transpose(original)
+    return {'width': width, 'height': height, 'placeholder': make_placeholder(image)}
+
+
+def backfill(upload_folder: str = Config.UPLOAD_FOLDER):
+    """Generate variants for product images that don't have any yet, and
+    placeholders for processed images recorded before placeholders existed"""
+    conn = connect_db()
+    cursor = conn.cursor()
+    init_image_tables(cursor)
+    init_catalog_tables(cursor)
+
+    cursor.execute('''
+        SELECT DISTINCT p.image_path FROM products p
+        LEFT JOIN images i ON i.filename = p.image_path
+        WHERE p.image_path IS NOT NULL AND i.filename IS NULL
+    ''')
+    pending = [row[0] for row in cursor.fetchall()]
+
+    processed = 0
+    for filename in pending:
+        if not os.path.exists(os.path.join(upload_folder, filename)):
+            print(f"✗ Missing file for {filename}")
+            continue
+        try:
+            save_image_record(cursor, filename, process_image(filename, upload_folder))
+            bump_catalog_version(cursor)
+            conn.commit()
+            processed += 1
+            print(f"✓ {filename}")
+        except Exception as e:
+            print(f"✗ Error processing {filename}: {e}")
+
+    print(f"\nProcessed {processed} of {len(pending)} images")
+
+    cursor.execute("SELECT filename FROM images WHERE status = 'ready' AND placeholder IS NULL")
+    missing = [row[0] for row in cursor.fetchall()]
+
+    filled = 0
+    for filename in missing:
+        try:
+            info = placeholder_for_file(os.path.join(upload_folder, filename))
+            cursor.execute('UPDATE images SET width = ?, height = ?, placeholder = ? WHERE filename = ?',
+                           (info['width'], info['height'], info['placeholder'], filename))
+            bump_catalog_version(cursor)
+            conn.commit()
+            filled += 1
+        except Exception as e:
+            print(f"✗ Error creating placeholder for {filename}: {e}")
+
+    conn.close()
+    print(f"Added placeholders for {filled} of {len(missing)} images")
+
+if __name__ == "__main__":
+    backfill()
\ No newline at end of file
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Background image worker
+Claims upload jobs from the image_jobs table and runs the derivative
+pipeline on a process pool, so publishing a product only costs the disk
+write; listing pages show a placeholder until the variants are ready
+
+Run as a service:
+    python image_worker.py [--processes N] [--once]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+from config import Config
+from db import connect_db
+from fragment_cache import bump_catalog_version, init_catalog_tables
+from image_pipeline import init_image_tables, process_image, save_image_record
+
+try:
+    import fcntl
+except ImportError:  # Windows: no host-wide lock, run the worker anyway
+    fcntl = None
+
+# Lock file that keeps a single worker per host (service or embedded)
+LOCK_PATH = 'image_worker.lock'
+
+
+def enqueue_image_job(cursor, filename: str):
+    """Mark an upload as pending and queue it for the worker"""
+    cursor.execute("INSERT OR REPLACE INTO images (filename, status) VALUES (?, 'pending')", (filename,))
+    cursor.execute('INSERT INTO image_jobs (filename) VALUES (?)', (filename,))
+
+
+class ImageWorker:
+    def __init__(self, db_path: Optional[str] = None, upload_folder: str = Config.UPLOAD_FOLDER,
+                 processes: int = Config.IMAGE_WORKER_PROCESSES):
+        self.db_path = db_path  # None: the configured database, read on each connect
+        self.upload_folder = upload_folder
+        self.processes = max(1, processes)
+        self._wake = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        return connect_db(self.db_path, timeout=10)
+
+    def touch_jobs(self, job_ids: List[int]):
+        """Mark jobs this worker is still processing as alive, so recovery leaves them alone"""
+        if not job_ids:
+            return
+        conn = self._connect()
+        conn.executemany('UPDATE image_jobs SET updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                         [(job_id,) for job_id in job_ids])
+        conn.commit()
+        conn.close()
+
+    def recover_stale_jobs(self):
+        """Requeue jobs left 'processing' by a worker that died or was recycled"""
+        conn = self._connect()
+        conn.execute('''
+            UPDATE image_jobs SET status = 'pending', updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'processing' AND updated_at < datetime('now', ?)
+        ''', (f'-{Config.IMAGE_WORKER_STALE_AFTER} seconds',))
+        conn.commit()
+        conn.close()
+
+    def claim_jobs(self, limit: int) -> List[Tuple[int, str]]:
+        """
+        Atomically move up to limit pending jobs to 'processing'. A job that
+        failed waits IMAGE_WORKER_RETRY_BACKOFF seconds before its first
+        retry, doubling with every further attempt.
+        """
+        conn = self._connect()
+        conn.isolation_level = None
+        conn.execute('BEGIN IMMEDIATE')
+        jobs = conn.execute('''
+            SELECT id, filename FROM image_jobs
+            WHERE status = 'pending'
+              AND (attempts = 0
+                   OR updated_at <= datetime('now', '-' || (? << (attempts - 1)) || ' seconds'))
+            ORDER BY id
+            LIMIT ?
+        ''', (Config.IMAGE_WORKER_RETRY_BACKOFF, limit)).fetchall()
+        conn.executemany('''
+            UPDATE image_jobs
+            SET status = 'processing', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [(job_id,) for job_id, _ in jobs])
+        conn.execute('COMMIT')
+        conn.close()
+        return jobs
+
+    def _live_job(self, cursor, job_id: int, filename: str) -> Tuple[bool, bool]:
+        """
+        (job still queued, upload still stored) for a finished job. Uploads
+        can be released while their job runs; paths outside the store
+        (legacy flat uploads) have no blob row and count as stored.
+        """
+        cursor.execute('SELECT 1 FROM image_jobs WHERE id = ?', (job_id,))
+        job_exists = cursor.fetchone() is not None
+        stored = True
+        if '/' in filename:
+            cursor.execute('SELECT 1 FROM upload_blobs WHERE path = ?', (filename,))
+            stored = cursor.fetchone() is not None
+        return job_exists, stored
+
+    def complete_job(self, job_id: int, filename: str, info: dict):
+        """Record the variants and mark the image ready"""
+        conn = self._connect()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        # Checked and written in one transaction, so release() can't drop
+        # the upload in between
+        cursor.execute('BEGIN IMMEDIATE')
+        job_exists, stored = self._live_job(cursor, job_id, filename)
+        if not (job_exists and stored):
+            cursor.execute('ROLLBACK')
+            conn.close()
+            # A re-upload of the same content queued its own job, which
+            # rewrites these files; otherwise nothing refers to them
+            if not stored:
+                for _, _, _, variant in info['variants']:
+                    try:
+                        os.remove(os.path.join(self.upload_folder, variant))
+                    except FileNotFoundError:
+                        pass
+            return
+
+        save_image_record(cursor, filename, info)
+        cursor.execute("UPDATE image_jobs SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                       (job_id,))
+        # Cached listings still show the placeholder
+        bump_catalog_version(cursor)
+        cursor.execute('COMMIT')
+        conn.close()
+
+    def fail_job(self, job_id: int, filename: str, error: Exception):
+        """Retry a failed job, or give up after the configured attempts"""
+        print(f"Image worker error for {filename}: {error}")
+        conn = self._connect()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        job_exists, stored = self._live_job(cursor, job_id, filename)
+        if not (job_exists and stored):
+            # The upload was released while it was processed: nothing to retry
+            cursor.execute('ROLLBACK')
+            conn.close()
+            return
+
+        cursor.execute('SELECT attempts FROM image_jobs WHERE id = ?', (job_id,))
+        attempts = cursor.fetchone()[0]
+
+        status = 'pending' if attempts < Config.IMAGE_WORKER_MAX_ATTEMPTS else 'failed'
+        cursor.execute('''
+            UPDATE image_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, str(error), job_id))
+        if status == 'failed':
+            # Listing pages fall back to the original file
+            cursor.execute("UPDATE images SET status = 'failed' WHERE filename = ?", (filename,))
+            bump_catalog_version(cursor)
+        cursor.execute('COMMIT')
+        conn.close()
+
+    def wake(self):
+        """Skip the poll delay after a job has been queued in this process"""
+        self._wake.set()
+
+    def run(self, once: bool = False):
+        """
+        Process jobs until stopped.
+
+        Args:
+            once: Return as soon as the queue is empty instead of polling
+        """
+        # upload_store imports this module for enqueue_image_job
+        from upload_store import init_upload_tables
+
+        conn = self._connect()
+        init_image_tables(conn.cursor())
+        init_catalog_tables(conn.cursor())
+        init_upload_tables(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        # Spawned (not forked) children: the pool may be started from a
+        # thread inside a web worker
+        pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=Config.IMAGE_WORKER_MAX_TASKS_PER_CHILD
+        )
+        in_flight = {}
+        next_recovery = 0.0
+
+        try:
+            while True:
+                # Jobs abandoned by a worker that crashed or was recycled
+                # while this one keeps running
+                if time.monotonic() >= next_recovery:
+                    self.touch_jobs([job_id for job_id, _ in in_flight.values()])
+                    self.recover_stale_jobs()
+                    next_recovery = time.monotonic() + Config.IMAGE_WORKER_RECOVERY_INTERVAL
+
+                free = self.processes - len(in_flight)
+                if free:
+                    for job_id, filename in self.claim_jobs(free):
+                        future = pool.submit(process_image, filename, self.upload_folder)
+                        in_flight[future] = (job_id, filename)
+
+                if not in_flight:
+                    if once:
+                        break
+                    self._wake.wait(Config.IMAGE_WORKER_POLL_INTERVAL)
+                    self._wake.clear()
+                    continue
+
+                done, _ = wait(in_flight, timeout=Config.IMAGE_WORKER_POLL_INTERVAL,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id, filename = in_flight.pop(future)
+                    try:
+                        self.complete_job(job_id, filename, future.result())
+                    except Exception as e:
+                        self.fail_job(job_id, filename, e)
+        finally:
+            pool.shutdown(wait=True)
+
+
+def acquire_worker_lock():
+    """Non-blocking host-wide lock; returns the open lock file, or None if held elsewhere"""
+    lock_file = open(LOCK_PATH, 'w')
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+
+# Embedded worker state for this process
+image_worker = ImageWorker()
+_embedded_pid = None
+_embedded_lock = threading.Lock()
+
+
+def ensure_embedded_worker():
+    """
+    Start the worker in a daemon thread of this process unless another
+    process on the host already runs one. Cheap to call on every request:
+    after the first call in a process it is a single comparison.
+    """
+    global _embedded_pid
+    if not Config.IMAGE_WORKER_EMBEDDED or _embedded_pid == os.getpid():
+        return
+
+    with _embedded_lock:
+        if _embedded_pid == os.getpid():
+            return
+        _embedded_pid = os.getpid()
+
+        lock_file = acquire_worker_lock()
+        if lock_file is None:
+            return
+
+        def run():
+            try:
+                image_worker.run()
+            finally:
+                lock_file.close()
+
+        threading.Thread(target=run, name='image-worker', daemon=True).start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Process queued product image uploads')
+    parser.add_argument('--processes', type=int, default=Config.IMAGE_WORKER_PROCESSES,
+                        help='number of worker processes')
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    lock = acquire_worker_lock()
+    if lock is None:
+        print("Another image worker is already running on this host")
+    else:
+        print(f"Image worker started with {args.processes} processes")
+        ImageWorker(processes=args.processes).run(once=args.once)
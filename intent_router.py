@@ -0,0 +1,246 @@
+"""
+Intent routing for chatbot messages
+Combines a single compiled keyword matcher with a small naive Bayes
+classifier over message tokens, so each message is routed locally in
+microseconds and only open-ended questions reach the LLM
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+from config import Config
+
+# Log-score bonus for each keyword pattern hit of an intent
+PATTERN_WEIGHT = 3.0
+
+# Intent returned when no intent is confident enough (answered by the LLM)
+DEFAULT_INTENT = 'chat'
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Each intent has literal keyword patterns (matched on word boundaries) and
+# example messages the token classifier is trained on
+DEFAULT_INTENTS = {
+    'product_search': {
+        'patterns': ['show me', 'looking for', 'do you have', 'find me', 'search for', 'recommend',
+                     'suggest', 'i want', 'i need', 'gift', 'under', 'cheap'],
+        'examples': [
+            'show me blue pottery',
+            'i am looking for a silver necklace',
+            'do you have wooden bowls',
+            'find me a gift for my mother',
+            'search for handwoven textiles',
+            'recommend some jewelry under 5000',
+            'suggest a ceramic vase',
+            'i want to buy a scarf',
+            'i need a tea set',
+            'any cheap handicraft items',
+            'show me products made of bamboo',
+            'which woodwork items do you have'
+        ]
+    },
+    'hello': {
+        'patterns': ['hello', 'hi', 'hey', 'namaste', 'good morning', 'good evening'],
+        'examples': [
+            'hello',
+            'hi there',
+            'hey',
+            'namaste',
+            'good morning',
+            'good evening assistant',
+            'hello how are you'
+        ]
+    },
+    'register': {
+        'patterns': ['register', 'sign up', 'signup', 'create an account', 'registration'],
+        'examples': [
+            'how do i register',
+            'how can i sign up as a buyer',
+            'i want to create an account',
+            'registration page',
+            'i cannot find the register page',
+            'how to signup as an artisan'
+        ]
+    },
+    'artisan': {
+        'patterns': ['artisan', 'artisans', 'sell', 'seller', 'my listing', 'my listings'],
+        'examples': [
+            'how can i sell my crafts',
+            'who are the artisans',
+            'i am an artisan how do i add products',
+            'how do i become a seller',
+            'how to manage my listings'
+        ]
+    },
+    'buy': {
+        'patterns': ['checkout', 'how to buy', 'how do i buy', 'how to purchase', 'payment',
+                     'place an order', 'place order', 'how do i order', 'how to order'],
+        'examples': [
+            'how do i buy something',
+            'how to purchase an item',
+            'how does checkout work',
+            'what payment methods are accepted',
+            'how do i place an order',
+            'how do i order',
+            'can i order online'
+        ]
+    },
+    'price': {
+        'patterns': ['price', 'prices', 'cost', 'costs', 'how much is this', 'currency', 'rupees', 'inr'],
+        'examples': [
+            'what is the price',
+            'price of pottery',
+            'how much does this vase cost',
+            'how much is the silver necklace',
+            'what do the scarves cost',
+            'what currency are prices in',
+            'are prices in rupees',
+            'how are prices shown',
+            'do you accept inr'
+        ]
+    },
+    # No canned answer: recognised so delivery questions that mention cost
+    # or an order aren't given the price or checkout answer, and left to the LLM
+    'shipping': {
+        'patterns': ['shipping', 'ship', 'ships', 'delivery', 'deliver', 'delivered', 'courier', 'dispatch',
+                     'dispatched', 'arrive', 'arrives', 'track my order'],
+        'examples': [
+            'what is the shipping cost',
+            'what does shipping cost',
+            'how much is delivery',
+            'how much does delivery cost',
+            'what are the shipping charges',
+            'are delivery charges included',
+            'do you ship internationally',
+            'how long does delivery take',
+            'how long until my order arrives',
+            'when will my order arrive',
+            'when will my order be dispatched',
+            'where can i track my order',
+            'which courier do you use'
+        ]
+    },
+    'categories': {
+        'patterns': ['categories', 'category', 'what kinds', 'what types'],
+        'examples': [
+            'what categories do you have',
+            'which product categories are available',
+            'what kinds of crafts are sold here',
+            'what types of products are there'
+        ]
+    },
+    'products': {
+        'patterns': ['browse', 'catalog', 'catalogue'],
+        'examples': [
+            'where can i browse products',
+            'how do i see all products',
+            'show the catalog',
+            'where is the product list'
+        ]
+    },
+    'help': {
+        'patterns': ['help', 'support', 'assist'],
+        'examples': [
+            'help',
+            'i need help',
+            'can you assist me',
+            'what can you do',
+            'how does this site work'
+        ]
+    },
+    'chat': {
+        'patterns': [],
+        'examples': [
+            'tell me the story behind this craft',
+            'what is the history of block printing',
+            'why is handmade pottery special',
+            'explain how silk is dyed',
+            'what makes indian textiles unique',
+            'can you write a poem about clay',
+            'what is the difference between brass and bronze'
+        ]
+    }
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a message"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class IntentRouter:
+    def __init__(self, intents: Dict[str, Dict] = None, threshold: float = Config.CHAT_INTENT_THRESHOLD,
+                 default_intent: str = DEFAULT_INTENT):
+        self.intents = intents or DEFAULT_INTENTS
+        self.threshold = threshold
+        self.default_intent = default_intent
+        self._matcher = self._compile_patterns()
+        self._train()
+
+    def _compile_patterns(self):
+        """Compile every intent's keywords into one regex with a named group per intent"""
+        groups = []
+        for name, spec in self.intents.items():
+            patterns = sorted(spec.get('patterns', []), key=len, reverse=True)
+            if patterns:
+                alternation = '|'.join(re.escape(pattern) for pattern in patterns)
+                groups.append(f'(?P<{name}>\\b(?:{alternation})\\b)')
+
+        if not groups:
+            return None
+        return re.compile('|'.join(groups), re.IGNORECASE | re.UNICODE)
+
+    def _train(self):
+        """Fit per-intent token log-likelihoods with add-one smoothing"""
+        counts = {}
+        vocabulary = set()
+        for name, spec in self.intents.items():
+            token_counts = Counter()
+            for example in spec.get('examples', []):
+                token_counts.update(tokenize(example))
+            counts[name] = token_counts
+            vocabulary.update(token_counts)
+
+        self._vocabulary = vocabulary
+        self._log_likelihood = {}
+        for name, token_counts in counts.items():
+            denominator = sum(token_counts.values()) + len(vocabulary)
+            self._log_likelihood[name] = {
+                token: math.log((token_counts[token] + 1) / denominator)
+                for token in vocabulary
+            }
+
+    def route(self, message: str) -> Tuple[str, float]:
+        """
+        Classify a chat message.
+
+        Args:
+            message: Raw user message
+
+        Returns:
+            (intent, confidence); the default intent is returned when the
+            best intent's confidence is below the threshold
+        """
+        tokens = [token for token in tokenize(message) if token in self._vocabulary]
+        hits = Counter()
+        if self._matcher:
+            hits.update(match.lastgroup for match in self._matcher.finditer(message))
+
+        if not tokens and not hits:
+            return self.default_intent, 0.0
+
+        scores = {}
+        for name, likelihood in self._log_likelihood.items():
+            scores[name] = sum(likelihood[token] for token in tokens) + PATTERN_WEIGHT * hits[name]
+
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        confidence = 1.0 / sum(math.exp(score - top) for score in scores.values())
+
+        if confidence < self.threshold:
+            return self.default_intent, confidence
+        return best, confidence
+
+# Global intent router instance
+intent_router = IntentRouter()
@@ -0,0 +1,198 @@
+"""
+Per-route memory profiling
+With MEMORY_PROFILE=true every request (or a MEMORY_PROFILE_SAMPLE_RATE
+share of them) is measured with tracemalloc:
+- peak: the most memory the request held at once, above what the process
+  held when it started
+- retained: what was still allocated when it finished (cache growth, leaks)
+- top sites: the source lines owning the most memory allocated by the
+  request when its template started rendering (or when it finished, for
+  views that don't render), which is when fetched rows and template
+  context are all alive
+
+Results are kept per route and served to admins at
+/api/admin/memory_profile. tracemalloc slows the app down several times
+and counts every thread's allocations, so profile with one sync worker:
+    MEMORY_PROFILE=true GUNICORN_WORKER_CLASS=sync WEB_CONCURRENCY=1 python serve.py
+
+benchmarks/memory_budgets.py checks routes against allocation budgets.
+"""
+
+import gc
+import linecache
+import os
+import random
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from flask import before_render_template, jsonify, request, session
+from config import Config
+
+# Allocations made by the profiler and the import system are not the request's
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, os.path.abspath(__file__)),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class AllocationSite(NamedTuple):
+    location: str  # file:line
+    size: int  # bytes
+    count: int  # blocks
+
+
+class RequestProfile(NamedTuple):
+    route: str
+    peak: int
+    retained: int
+    top_sites: List[AllocationSite]
+
+
+def _top_sites(snapshot: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot, limit: int) -> List[AllocationSite]:
+    stats = snapshot.filter_traces(_IGNORED).compare_to(baseline.filter_traces(_IGNORED), 'lineno')
+    root = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    return [AllocationSite(f'{stat.traceback[0].filename.replace(root, "")}:{stat.traceback[0].lineno}',
+                           stat.size_diff, stat.count_diff)
+            for stat in stats[:limit] if stat.size_diff > 0]
+
+
+class MemoryProfiler:
+    def __init__(self, top_sites: int = Config.MEMORY_PROFILE_TOP_SITES):
+        self.top_sites = top_sites
+        self._request = threading.local()
+        self._lock = threading.Lock()
+        self.routes: Dict[str, Dict] = {}
+
+    def begin(self, sites: bool = True):
+        """
+        Start measuring (starts tracemalloc if it isn't running). Finding the
+        top sites takes two snapshots of every live allocation, which costs
+        far more than the request on a large heap; without them only peak and
+        retained memory are measured.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(Config.MEMORY_PROFILE_FRAMES)
+        gc.collect()
+        state = self._request
+        state.base = tracemalloc.get_traced_memory()[0]
+        state.baseline = tracemalloc.take_snapshot() if sites and self.top_sites else None
+        # Held until the request ends; not the request's memory
+        state.overhead = tracemalloc.get_traced_memory()[0] - state.base
+        state.peak = 0
+        state.top = None if state.baseline is not None else []
+        state.active = True
+        state.sampled = False
+        tracemalloc.reset_peak()
+
+    def checkpoint(self):
+        """Record the live allocation sites now; called when a template starts rendering"""
+        state = self._request
+        if not getattr(state, 'active', False) or state.top is not None:
+            return
+        state.peak = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot()
+        state.top = _top_sites(snapshot, state.baseline, self.top_sites)
+        # The snapshot itself mustn't count towards the request's peak
+        del snapshot
+        tracemalloc.reset_peak()
+
+    def end(self, route: str) -> RequestProfile:
+        """Stop measuring and add the request to its route's totals"""
+        self.checkpoint()
+        state = self._request
+        state.active = False
+        peak = max(state.peak, tracemalloc.get_traced_memory()[1]) - state.overhead
+        state.baseline = None
+        # Cycles the request left behind are garbage, not retained memory
+        gc.collect()
+        profile = RequestProfile(route, peak - state.base, tracemalloc.get_traced_memory()[0] - state.base, state.top)
+        state.top = None
+
+        with self._lock:
+            totals = self.routes.setdefault(route, {'requests': 0, 'peak_max': 0, 'peak_total': 0,
+                                                    'retained_total': 0, 'sites': {}})
+            totals['requests'] += 1
+            totals['peak_max'] = max(totals['peak_max'], profile.peak)
+            totals['peak_total'] += profile.peak
+            totals['retained_total'] += profile.retained
+            for site in profile.top_sites:
+                totals['sites'][site.location] = totals['sites'].get(site.location, 0) + site.size
+        return profile
+
+    def measure(self, fn: Callable, route: str, sites: bool = True) -> Tuple[object, RequestProfile]:
+        """Profile one call of fn (e.g. a test client request) as a request to route"""
+        self.begin(sites)
+        try:
+            result = fn()
+        finally:
+            profile = self.end(route)
+        return result, profile
+
+    def report(self) -> List[Dict]:
+        """Routes by their largest peak, with averages and their heaviest allocation sites"""
+        with self._lock:
+            routes = [(route, dict(totals, sites=dict(totals['sites']))) for route, totals in self.routes.items()]
+        report = []
+        for route, totals in routes:
+            requests = totals['requests']
+            sites = sorted(totals['sites'].items(), key=lambda item: item[1], reverse=True)[:self.top_sites]
+            report.append({
+                'route': route,
+                'requests': requests,
+                'peak_max_kb': round(totals['peak_max'] / 1024, 1),
+                'peak_avg_kb': round(totals['peak_total'] / requests / 1024, 1),
+                'retained_avg_kb': round(totals['retained_total'] / requests / 1024, 1),
+                'top_sites': [{'location': location, 'avg_kb': round(size / requests / 1024, 1)}
+                              for location, size in sites]
+            })
+        return sorted(report, key=lambda entry: entry['peak_max_kb'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+
+
+def route_name() -> str:
+    return f'{request.method} {request.url_rule.rule if request.url_rule else "unmatched"}'
+
+
+def _start_request():
+    if random.random() < Config.MEMORY_PROFILE_SAMPLE_RATE:
+        memory_profiler.begin()
+        memory_profiler._request.sampled = True
+
+
+def _finish_request(exc):
+    state = memory_profiler._request
+    if getattr(state, 'sampled', False) and state.active:
+        memory_profiler.end(route_name())
+
+
+def _on_render(sender, template, context, **extra):
+    memory_profiler.checkpoint()
+
+
+def memory_profile_view():
+    """Per-route peak and retained memory, for admins"""
+    if 'user_id' not in session or session['user_type'] != 'admin':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    return jsonify({'success': True, 'tracing': tracemalloc.is_tracing(), 'routes': memory_profiler.report()})
+
+
+def init_memory_profiler(app):
+    """Profile requests with tracemalloc when MEMORY_PROFILE is on"""
+    if not Config.MEMORY_PROFILE:
+        return
+    tracemalloc.start(Config.MEMORY_PROFILE_FRAMES)
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_on_render, app)
+    app.add_url_rule('/api/admin/memory_profile', 'memory_profile', memory_profile_view)
+
+
+# Global memory profiler instance
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,411 @@
+"""
+Prometheus metrics
+Request latency per endpoint, SQL statements and time per request,
+upstream call latency and errors per GCP/Gemini operation, cache hit
+counters and queue depths, served at /metrics in the Prometheus text
+format.
+
+Each worker process records into plain in-memory counters and writes a
+snapshot to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds; /metrics
+merges the snapshots of all workers. Counters of workers that have exited
+(max_requests recycling) are folded into an archive so totals never go
+backwards; their gauges are dropped. Without fcntl (Windows) nothing is
+written and /metrics serves the answering process's own numbers.
+"""
+
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Tuple
+from flask import Response, request
+from chat_executor import chat_executor
+from config import Config
+from db import connect_db, query_observers
+from fragment_cache import fragment_cache
+from upload_serving import fingerprint_cache_info
+from tracing import CLIENT, span
+
+try:
+    import fcntl
+except ImportError:  # Windows: no snapshots, each process serves its own metrics
+    fcntl = None
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+# Statements per request
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+ARCHIVE_FILE = 'archive.json'
+LOOPBACK = ('127.0.0.1', '::1')
+LOCK_FILE = '.lock'
+
+_lock = threading.Lock()
+_metrics = []
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.samples: Dict[tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with _lock:
+            self._inc(labels, amount)
+
+    def _inc(self, labels: tuple, amount: float = 1):
+        self.samples[labels] = self.samples.get(labels, 0) + amount
+
+    def snapshot(self) -> dict:
+        return {'type': self.type, 'help': self.help, 'labels': self.labels,
+                'samples': [[list(labels), value] for labels, value in self.samples.items()]}
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, tuple(buckets)
+        # labels -> [count per bucket (last: above the largest bound), sum]
+        self.samples: Dict[tuple, list] = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        with _lock:
+            self._observe(value, labels)
+
+    def _observe(self, value: float, labels: tuple):
+        entry = self.samples.get(labels)
+        if entry is None:
+            entry = self.samples[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def snapshot(self) -> dict:
+        return {'type': self.type, 'help': self.help, 'labels': self.labels, 'buckets': self.buckets,
+                'samples': [[list(labels), [list(counts), total]] for labels, (counts, total) in self.samples.items()]}
+
+
+REQUESTS = Counter('http_requests_total', 'Requests by endpoint, method and status',
+                   ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                            ('endpoint', 'method'))
+REQUEST_QUERIES = Histogram('db_queries_per_request', 'SQL statements run by one request',
+                            ('endpoint',), QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_SECONDS = Histogram('db_query_seconds_per_request', 'Time one request spent in SQL',
+                                  ('endpoint',))
+UPSTREAM_SECONDS = Histogram('upstream_request_duration_seconds', 'Latency of calls to GCP and Gemini',
+                             ('service', 'operation'), UPSTREAM_BUCKETS)
+UPSTREAM_ERRORS = Counter('upstream_errors_total', 'Failed calls to GCP and Gemini by exception type',
+                          ('service', 'operation', 'error'))
+
+# Callables returning (name, type, help, labels, value) samples of state kept
+# elsewhere (caches, queues). 'counter' and 'gauge' samples are written with
+# each worker's snapshot; scrape collectors run only in the worker answering
+# /metrics, for state shared by all workers (the database)
+_collectors: List[Callable[[], Iterator[tuple]]] = []
+_scrape_collectors: List[Callable[[], Iterator[tuple]]] = []
+
+
+def register_collector(collector: Callable[[], Iterator[tuple]], scrape: bool = False):
+    (_scrape_collectors if scrape else _collectors).append(collector)
+
+
+@contextmanager
+def track_upstream(service: str, operation: str):
+    """Time a call to an external API, count its failures and trace it"""
+    started = perf_counter()
+    try:
+        with span(f'{service}.{operation}', CLIENT, service=service):
+            yield
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(service, operation, type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(perf_counter() - started, service, operation)
+
+
+# Per-request state (greenlet-local under gevent)
+_request = threading.local()
+
+
+def _observe_query(cursor, sql, parameters, seconds, fetch):
+    if getattr(_request, 'active', False):
+        if not fetch:
+            _request.queries += 1
+        _request.query_seconds += seconds
+
+
+def _start_request():
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+    state = _request
+    state.queries = 0
+    state.query_seconds = 0.0
+    state.status = 500
+    state.active = True
+    state.started = perf_counter()
+
+
+def _record_status(response):
+    _request.status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    state = _request
+    if not getattr(state, 'active', False):
+        return
+    state.active = False
+    elapsed = perf_counter() - state.started
+    # One lookup through the context-local proxy, then plain attributes
+    req = request._get_current_object()
+    endpoint = req.endpoint or 'unmatched'
+    method = req.method
+    status = '500' if exc is not None else str(state.status)
+    with _lock:
+        REQUESTS._inc((endpoint, method, status))
+        REQUEST_SECONDS._observe(elapsed, (endpoint, method))
+        REQUEST_QUERIES._observe(state.queries, (endpoint,))
+        REQUEST_QUERY_SECONDS._observe(state.query_seconds, (endpoint,))
+
+
+# Snapshots
+
+_flusher_pid = None
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(Config.METRICS_DIR, f'{pid}.json')
+
+
+def snapshot() -> dict:
+    """This process's metrics in the on-disk format"""
+    with _lock:
+        data = {metric.name: metric.snapshot() for metric in _metrics}
+    for collector in _collectors:
+        for name, kind, help, labels, value in collector():
+            entry = data.setdefault(name, {'type': kind, 'help': help, 'labels': tuple(labels), 'samples': []})
+            entry['samples'].append([list(labels.values()), value])
+    return data
+
+
+def _write_json(path: str, data: dict):
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def flush():
+    """Write this process's snapshot for the worker answering /metrics"""
+    os.makedirs(Config.METRICS_DIR, exist_ok=True)
+    _write_json(_snapshot_path(os.getpid()), snapshot())
+
+
+def _start_flusher():
+    """Start the periodic flush once per process (workers fork from a preloaded master)"""
+    global _flusher_pid
+    _flusher_pid = os.getpid()
+    if fcntl is None:
+        return
+
+    def run():
+        while True:
+            time.sleep(Config.METRICS_FLUSH_INTERVAL)
+            try:
+                flush()
+            except OSError as e:
+                print(f"Metrics flush failed: {e}")
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+    atexit.register(flush)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(target: dict, source: dict, keep_gauges: bool = True):
+    """Add source's samples into target (both in the snapshot format)"""
+    for name, metric in source.items():
+        if metric['type'] == 'gauge' and not keep_gauges:
+            continue
+        entry = target.setdefault(name, dict(metric, samples=[]))
+        values = {json.dumps(labels): value for labels, value in entry['samples']}
+        for labels, value in metric['samples']:
+            key = json.dumps(labels)
+            if key not in values:
+                values[key] = value
+            elif metric['type'] == 'histogram':
+                counts, total = values[key]
+                values[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+            else:
+                values[key] += value
+        entry['samples'] = [[json.loads(key), value] for key, value in values.items()]
+
+
+def collect_all() -> Tuple[dict, int]:
+    """Merged metrics of every worker, archiving the snapshots of exited ones"""
+    if fcntl is None:
+        return snapshot(), 1
+    flush()
+    directory = Config.METRICS_DIR
+    merged, workers = {}, 0
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        try:
+            with open(archive_path) as f:
+                archive = json.load(f)
+        except (OSError, ValueError):
+            archive = {}
+        archived = False
+
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or not filename[:-5].isdigit():
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if _pid_alive(int(filename[:-5])):
+                merge(merged, data)
+                workers += 1
+            else:
+                merge(archive, data, keep_gauges=False)
+                os.unlink(path)
+                archived = True
+
+        if archived:
+            _write_json(archive_path, archive)
+    merge(merged, archive)
+    return merged, workers
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names, values, le: str = None) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def render(metrics: dict) -> str:
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric['samples'], key=lambda sample: sample[0]):
+            if metric['type'] == 'histogram':
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(list(metric['buckets']) + ['+Inf'], counts):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(metric['labels'], labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(metric['labels'], labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(metric['labels'], labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(metric['labels'], labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    # With a token set it is required; without one only local scrapers
+    # that didn't come through a proxy may read per-route traffic
+    if Config.METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {Config.METRICS_TOKEN}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in LOOPBACK or 'X-Forwarded-For' in request.headers:
+        return Response('Forbidden: set METRICS_TOKEN to scrape remotely\n', status=403, mimetype='text/plain')
+    merged, workers = collect_all()
+    extra = {}
+    for collector in _scrape_collectors:
+        try:
+            samples = list(collector())
+        except Exception as e:
+            print(f"Metrics collector {collector.__name__} failed: {e}")
+            continue
+        for name, kind, help, labels, value in samples:
+            entry = extra.setdefault(name, {'type': kind, 'help': help, 'labels': tuple(labels), 'samples': []})
+            entry['samples'].append([list(labels.values()), value])
+    extra['metrics_worker_processes'] = {'type': 'gauge', 'help': 'Worker processes reporting metrics',
+                                         'labels': (), 'samples': [[[], workers]]}
+    merge(merged, extra)
+    return Response(render(merged), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    """Register first so the request timer wraps the other hooks"""
+    if not Config.METRICS_ENABLED:
+        return
+    if _observe_query not in query_observers:
+        query_observers.append(_observe_query)
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def reset_metrics_dir():
+    """Remove snapshots of a previous server run (gunicorn on_starting)"""
+    if os.path.isdir(Config.METRICS_DIR):
+        for filename in os.listdir(Config.METRICS_DIR):
+            os.unlink(os.path.join(Config.METRICS_DIR, filename))
+
+
+# Collectors for the app's caches and queues
+
+def _cache_and_queue_metrics():
+    cache = fragment_cache.get_metrics()
+    yield 'fragment_cache_hits_total', 'counter', 'Rendered fragments served from cache', {}, cache['hits']
+    yield 'fragment_cache_misses_total', 'counter', 'Fragments rendered on a cache miss', {}, cache['misses']
+    yield 'fragment_cache_bytes', 'gauge', 'Size of cached fragments', {}, cache['bytes']
+
+    fingerprints = fingerprint_cache_info()
+    yield 'upload_fingerprint_cache_hits_total', 'counter', 'Legacy upload hashes served from cache', {}, fingerprints.hits
+    yield 'upload_fingerprint_cache_misses_total', 'counter', 'Legacy (flat) upload files hashed', {}, fingerprints.misses
+
+    chat = chat_executor.get_metrics()
+    yield 'chat_queue_depth', 'gauge', 'Chat requests waiting for an upstream slot', {}, chat['queue_depth']
+    yield 'chat_active', 'gauge', 'Chat requests calling the upstream', {}, chat['active']
+    for outcome in ('shed', 'expired', 'timed_out'):
+        yield 'chat_fallbacks_total', 'counter', 'Chat requests answered by the fallback', \
+            {'reason': outcome}, chat[outcome]
+
+
+def _image_job_metrics():
+    conn = connect_db()
+    try:
+        rows = conn.execute('SELECT status, COUNT(*) FROM image_jobs GROUP BY status').fetchall()
+    finally:
+        conn.close()
+    for status, count in rows:
+        yield 'image_jobs', 'gauge', 'Image processing jobs by status', {'status': status}, count
+
+
+register_collector(_cache_and_queue_metrics)
+register_collector(_image_job_metrics, scrape=True)
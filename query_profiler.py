@@ -0,0 +1,222 @@
+"""
+Slow-query log
+Profiles the SQL of a sample of requests (QUERY_PROFILE_SAMPLE_RATE):
+statements slower than QUERY_SLOW_MS are logged with the types of their
+parameters and their EXPLAIN QUERY PLAN, and a statement run
+QUERY_N_PLUS_ONE_THRESHOLD or more times by one request is logged as an
+N+1. Findings are kept per endpoint and statement in the query_log table,
+shared by all workers and shown on the admin dashboard.
+"""
+
+import random
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+from flask import request
+from config import Config
+from db import connect_db, query_observers
+
+SLOW = 'slow'
+N_PLUS_ONE = 'n_plus_one'
+
+# Statement kinds EXPLAIN QUERY PLAN says something useful about
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def init_query_log_tables(cursor):
+    """Create the slow-query log"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS query_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            bind_shape TEXT NOT NULL,
+            occurrences INTEGER NOT NULL DEFAULT 0,
+            total_ms REAL NOT NULL DEFAULT 0,
+            max_ms REAL NOT NULL DEFAULT 0,
+            max_repeats INTEGER NOT NULL DEFAULT 0,
+            query_plan TEXT,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (kind, endpoint, statement, bind_shape)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_query_log_last_seen ON query_log(last_seen)')
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Statement text with whitespace collapsed, as shown in the log"""
+    return ' '.join(sql.split())
+
+
+def bind_shape(parameters) -> str:
+    """Types of the bound values; the values themselves are never stored"""
+    if parameters is None:
+        return 'executemany'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(value).__name__}'
+                               for name, value in sorted(parameters.items())) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+
+def explain(connection: sqlite3.Connection, sql: str, parameters) -> Optional[str]:
+    """EXPLAIN QUERY PLAN as the indented tree the sqlite3 shell prints"""
+    if parameters is None or not normalize_sql(sql).upper().startswith(EXPLAINABLE):
+        return None
+    try:
+        # A plain cursor, so the plan lookup isn't itself observed
+        rows = sqlite3.Cursor(connection).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except sqlite3.Error as e:
+        return f'EXPLAIN failed: {e}'
+
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+class QueryProfiler:
+    def __init__(self, sample_rate: float = Config.QUERY_PROFILE_SAMPLE_RATE,
+                 slow_ms: float = Config.QUERY_SLOW_MS,
+                 n_plus_one_threshold: int = Config.QUERY_N_PLUS_ONE_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        # Per-request state (greenlet-local under gevent)
+        self._request = threading.local()
+        # Statements this process has already explained
+        self._explained = set()
+
+    def start_request(self):
+        state = self._request
+        state.sampled = random.random() < self.sample_rate
+        if state.sampled:
+            # (statement, bind shape) -> [executions, total seconds, slowest execution]
+            state.statements = {}
+            # id(cursor) -> [key, seconds so far, already logged as slow]
+            state.cursors = {}
+            state.slow = []
+
+    def observe(self, cursor, sql, parameters, seconds, fetch):
+        state = self._request
+        if not getattr(state, 'sampled', False):
+            return
+
+        if fetch:
+            current = state.cursors.get(id(cursor))
+            if current is None:
+                return
+            key = current[0]
+            current[1] += seconds
+            state.statements[key][1] += seconds
+        else:
+            key = (normalize_sql(sql), bind_shape(parameters))
+            current = state.cursors[id(cursor)] = [key, seconds, False]
+            totals = state.statements.get(key)
+            if totals is None:
+                totals = state.statements[key] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+
+        totals = state.statements[key]
+        totals[2] = max(totals[2], current[1])
+        if current[1] >= self.slow_seconds and not current[2]:
+            # Once per execution, while its connection is still open
+            current[2] = True
+            plan = None
+            if key not in self._explained:
+                self._explained.add(key)
+                plan = explain(cursor.connection, sql, parameters)
+            state.slow.append((current, plan))
+
+    def finish_request(self, exc=None):
+        state = self._request
+        if not getattr(state, 'sampled', False):
+            return
+        state.sampled = False
+        endpoint = request.endpoint or 'unmatched'
+
+        findings = []
+        for ((statement, shape), seconds, _), plan in state.slow:
+            findings.append((SLOW, endpoint, statement, shape, seconds * 1000, seconds * 1000, 1, plan))
+        for (statement, shape), (count, total, slowest) in state.statements.items():
+            if count >= self.n_plus_one_threshold:
+                findings.append((N_PLUS_ONE, endpoint, statement, shape, total * 1000, slowest * 1000, count, None))
+        if findings:
+            self.record(findings)
+
+    def record(self, findings: List[tuple]):
+        """Add (kind, endpoint, statement, bind shape, ms, max ms, repeats, plan) findings to the log"""
+        try:
+            # Not connect_db(): the log's own writes aren't part of the request's SQL
+            conn = sqlite3.connect(Config.DATABASE_PATH, timeout=1.0)
+            with conn:
+                conn.executemany('''
+                    INSERT INTO query_log (kind, endpoint, statement, bind_shape, occurrences,
+                                           total_ms, max_ms, max_repeats, query_plan)
+                    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT (kind, endpoint, statement, bind_shape) DO UPDATE SET
+                        occurrences = occurrences + 1,
+                        total_ms = total_ms + excluded.total_ms,
+                        max_ms = MAX(max_ms, excluded.max_ms),
+                        max_repeats = MAX(max_repeats, excluded.max_repeats),
+                        query_plan = COALESCE(excluded.query_plan, query_plan),
+                        last_seen = CURRENT_TIMESTAMP
+                ''', findings)
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error writing query log: {e}")
+
+    def report(self, limit: int = 50) -> List[Dict]:
+        """Most recent findings, after dropping expired and excess entries"""
+        conn = connect_db()
+        conn.row_factory = sqlite3.Row
+        with conn:
+            # datetime('now') is UTC, like the CURRENT_TIMESTAMP entries are written with
+            conn.execute("DELETE FROM query_log WHERE last_seen < datetime('now', ?)",
+                         (f'-{Config.QUERY_LOG_RETENTION_DAYS} days',))
+            conn.execute('''
+                DELETE FROM query_log WHERE id NOT IN (
+                    SELECT id FROM query_log ORDER BY last_seen DESC LIMIT ?
+                )
+            ''', (Config.QUERY_LOG_MAX_ENTRIES,))
+        rows = conn.execute('''
+            SELECT kind, endpoint, statement, bind_shape, occurrences, total_ms, max_ms,
+                   max_repeats, query_plan, first_seen, last_seen
+            FROM query_log
+            ORDER BY last_seen DESC, max_ms DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+        conn.close()
+
+        report = []
+        for row in rows:
+            entry = dict(row)
+            entry['avg_ms'] = round(entry['total_ms'] / entry['occurrences'], 2) if entry['occurrences'] else 0.0
+            report.append(entry)
+        return report
+
+    def clear(self):
+        conn = connect_db()
+        with conn:
+            conn.execute('DELETE FROM query_log')
+        conn.close()
+
+
+def init_query_profiler(app):
+    """Profile a sample of requests' SQL"""
+    if query_profiler.sample_rate <= 0:
+        return
+    if query_profiler.observe not in query_observers:
+        query_observers.append(query_profiler.observe)
+    app.before_request(query_profiler.start_request)
+    app.teardown_request(query_profiler.finish_request)
+
+
+# Global query profiler instance
+query_profiler = QueryProfiler()
@@ -4,9 +4,10 @@ Quick database check
 """
 
 import sqlite3
+from config import Config
 
 def quick_check():
-    conn = sqlite3.connect('artisan_marketplace.db')
+    conn = sqlite3.connect(Config.DATABASE_PATH)
     cursor = conn.cursor()
     
     print("📊 DATABASE QUICK CHECK")
@@ -0,0 +1,140 @@
+"""
+Token-bucket rate limiting for AI-backed routes
+Buckets live in a small SQLite database so every gunicorn worker
+enforces the same per-session and per-IP limits
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Tuple
+from flask import request, session, jsonify
+from config import Config
+
+# Idle buckets are pruned once every this many checks
+PRUNE_EVERY = 1000
+PRUNE_IDLE_SECONDS = 3600
+
+
+class RateLimiter:
+    def __init__(self, db_path: str = Config.RATE_LIMIT_DB,
+                 limits: Dict[str, Tuple[int, float]] = None,
+                 ip_multiplier: int = Config.RATE_LIMIT_IP_MULTIPLIER,
+                 enabled: bool = Config.RATE_LIMIT_ENABLED):
+        self.db_path = db_path
+        self.limits = limits if limits is not None else Config.RATE_LIMITS
+        self.ip_multiplier = ip_multiplier
+        self.enabled = enabled
+        # One connection per process, used under the lock: a thread-local
+        # would be per greenlet (so per request) under gevent
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._checks = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """The process's connection (call with the lock held); opened and migrated once per process"""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def reset_after_fork(self):
+        """Forget the connection (and lock) inherited from the parent; reopened on next use"""
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def consume(self, buckets: List[Tuple[str, int, float]]) -> Tuple[bool, float]:
+        """
+        Take one token from each bucket, atomically across processes.
+
+        Args:
+            buckets: (key, capacity, period in seconds) for every bucket the
+                request is charged to
+
+        Returns:
+            (allowed, retry_after seconds); nothing is consumed unless every
+            bucket has a token available
+        """
+        with self._lock:
+            now = time.time()
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                updates = []
+                retry_after = 0.0
+                for key, capacity, period in buckets:
+                    rate = capacity / period
+                    row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                    tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                    if tokens < 1:
+                        retry_after = max(retry_after, (1 - tokens) / rate)
+                    updates.append((key, tokens - 1))
+
+                allowed = retry_after == 0.0
+                if allowed:
+                    conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                                     [(key, tokens, now) for key, tokens in updates])
+
+                self._checks += 1
+                if self._checks % PRUNE_EVERY == 0:
+                    conn.execute('DELETE FROM buckets WHERE updated < ?', (now - PRUNE_IDLE_SECONDS,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        return allowed, retry_after
+
+    def _buckets_for_request(self, name: str) -> List[Tuple[str, int, float]]:
+        """Per-session and per-IP buckets for the current request"""
+        capacity, period = self.limits[name]
+        buckets = [(f'{name}:ip:{request.remote_addr}', capacity * self.ip_multiplier, period)]
+
+        if 'user_id' in session:
+            buckets.append((f"{name}:user:{session['user_type']}:{session['user_id']}", capacity, period))
+        elif 'chat_session_id' in session:
+            buckets.append((f"{name}:session:{session['chat_session_id']}", capacity, period))
+        return buckets
+
+    def limit(self, name: str):
+        """Decorator that answers 429 with Retry-After once a route's limit is hit"""
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not self.enabled or name not in self.limits:
+                    return view(*args, **kwargs)
+
+                try:
+                    allowed, retry_after = self.consume(self._buckets_for_request(name))
+                except sqlite3.Error as e:
+                    # Fail open: a limiter problem shouldn't take the route down
+                    print(f"Rate limiter error for {name}: {e}")
+                    return view(*args, **kwargs)
+
+                if not allowed:
+                    seconds = max(1, math.ceil(retry_after))
+                    return jsonify({
+                        'success': False,
+                        'message': f'Too many requests. Please try again in {seconds} seconds.'
+                    }), 429, {'Retry-After': str(seconds)}
+
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,148 @@
+"""
+Database schema: the tables, triggers and migrations every process expects.
+Kept apart from app.py so tools can create a database without importing the
+web app (and touching its configured database)
+"""
+
+from db import add_column_if_missing, connect_db
+from fragment_cache import init_catalog_tables
+from image_pipeline import init_image_tables
+from query_profiler import init_query_log_tables
+from upload_store import init_upload_tables
+
+
+def init_db(db_path=None):
+    conn = connect_db(db_path)
+    cursor = conn.cursor()
+    
+    # Create artisans table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS artisans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT NOT NULL,
+            location TEXT,
+            language TEXT DEFAULT 'en',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create buyers table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS buyers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT NOT NULL,
+            preferences TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create products table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            artisan_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            image_path TEXT,
+            category TEXT NOT NULL,
+            price REAL NOT NULL,
+            ai_story TEXT,
+            language TEXT DEFAULT 'en',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP,
+            FOREIGN KEY (artisan_id) REFERENCES artisans (id)
+        )
+    ''')
+    
+    # Create cart table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cart (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            buyer_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (buyer_id) REFERENCES buyers (id),
+            FOREIGN KEY (product_id) REFERENCES products (id),
+            UNIQUE(buyer_id, product_id)
+        )
+    ''')
+    
+    # Create buyer interactions table for recommendations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS buyer_interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            buyer_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            interaction_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (buyer_id) REFERENCES buyers (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+    
+    # Create admin table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create tables for responsive image variants
+    init_image_tables(cursor)
+    
+    # Reference counts for the content-addressed upload store
+    init_upload_tables(cursor)
+    
+    # Version stamp for cached catalog fragments
+    init_catalog_tables(cursor)
+    
+    # Slow-query log shown on the admin dashboard
+    init_query_log_tables(cursor)
+    
+    # products.updated_at validates cached product pages; the triggers keep it
+    # current when the product, its artisan's name or its image changes
+    add_column_if_missing(cursor, 'products', 'updated_at', 'TIMESTAMP')
+    cursor.execute('UPDATE products SET updated_at = created_at WHERE updated_at IS NULL')
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_touch_insert AFTER INSERT ON products
+        WHEN NEW.updated_at IS NULL
+        BEGIN
+            UPDATE products SET updated_at = {now} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_touch_update AFTER UPDATE ON products
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE products SET updated_at = {now} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS artisans_touch_products AFTER UPDATE OF name ON artisans
+        BEGIN
+            UPDATE products SET updated_at = {now} WHERE artisan_id = NEW.id;
+        END
+    ''')
+    for event in ('INSERT', 'UPDATE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS images_touch_products_{event.lower()} AFTER {event} ON images
+            BEGIN
+                UPDATE products SET updated_at = {now} WHERE image_path = NEW.filename;
+            END
+        ''')
+    
+    conn.commit()
+    conn.close()
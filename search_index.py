@@ -0,0 +1,180 @@
+"""
+In-memory ranked product search for the chatbot
+Inverted index over product name, category, description and artisan name,
+scored with BM25 and refreshed incrementally from the products table
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+from config import Config
+from db import connect_db
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Term weight per field (matches in the name count more than in the description)
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'description': 1, 'artisan': 1}
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = {
+    'a', 'about', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'could', 'do', 'does',
+    'for', 'from', 'get', 'give', 'have', 'i', 'in', 'is', 'it', 'its', 'like', 'looking', 'me',
+    'my', 'need', 'of', 'on', 'or', 'our', 'please', 'show', 'so', 'some', 'something', 'that',
+    'the', 'their', 'them', 'there', 'these', 'this', 'to', 'us', 'want', 'was', 'we', 'what',
+    'which', 'with', 'would', 'you', 'your',
+    # Chat filler that says "search" rather than what to search for
+    'buy', 'find', 'item', 'items', 'product', 'products', 'purchase', 'recommend', 'search',
+    'suggest'
+}
+
+PRODUCT_COLUMNS = '''
+    SELECT p.id, p.name, p.description, p.category, p.price, p.image_path, a.name as artisan_name
+    FROM products p
+    JOIN artisans a ON p.artisan_id = a.id
+'''
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping so plurals and verb forms share a term"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+        word = word[:-1]
+    if len(word) > 5 and word.endswith('ing'):
+        word = word[:-3]
+    elif len(word) > 4 and word.endswith('ed'):
+        word = word[:-2]
+    if len(word) > 3 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """Tokenize, drop stopwords and stem"""
+    return [stem(token) for token in TOKEN_PATTERN.findall((text or '').lower())
+            if token not in STOPWORDS and len(token) > 1]
+
+
+class ProductSearchIndex:
+    def __init__(self, db_path: str = Config.DATABASE_PATH,
+                 refresh_interval: float = Config.SEARCH_INDEX_REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._docs: Dict[int, tuple] = {}
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._total_length = 0.0
+        self._max_id = 0
+        self._last_refresh = None
+
+    def _add(self, row: tuple):
+        """Index one product row (id, name, description, category, price, image_path, artisan_name)"""
+        product_id = row[0]
+        fields = {'name': row[1], 'description': row[2], 'category': row[3], 'artisan': row[6]}
+
+        terms = Counter()
+        for field, text in fields.items():
+            for term in analyze(text):
+                terms[term] += FIELD_WEIGHTS[field]
+
+        length = float(sum(terms.values()))
+        self._docs[product_id] = row
+        self._doc_terms[product_id] = terms
+        self._doc_lengths[product_id] = length
+        self._total_length += length
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[product_id] = frequency
+
+    def _remove(self, product_id: int):
+        """Drop a product from the index"""
+        self._docs.pop(product_id, None)
+        self._total_length -= self._doc_lengths.pop(product_id, 0.0)
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def refresh(self, force: bool = False):
+        """
+        Bring the index up to date with the products table.
+
+        New rows are picked up by id, deleted rows by comparing counts, so a
+        refresh with no catalog changes costs a single aggregate query.
+        """
+        now = time.monotonic()
+        if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+            return
+
+        with self._lock:
+            conn = connect_db(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute('SELECT COUNT(*), MAX(id) FROM products')
+            count, max_id = cursor.fetchone()
+            max_id = max_id or 0
+
+            if max_id > self._max_id:
+                cursor.execute(PRODUCT_COLUMNS + ' WHERE p.id > ?', (self._max_id,))
+                for row in cursor.fetchall():
+                    self._add(row)
+                self._max_id = max_id
+
+            if count != len(self._docs):
+                cursor.execute('SELECT id FROM products')
+                existing = {row[0] for row in cursor.fetchall()}
+                for product_id in [pid for pid in self._docs if pid not in existing]:
+                    self._remove(product_id)
+
+            conn.close()
+            self._last_refresh = now
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, tuple]]:
+        """
+        Rank products against a free-text query.
+
+        Args:
+            query: User message or search text
+            limit: Number of results to return
+
+        Returns:
+            List of (score, product row) pairs, best first; when the query has
+            no searchable terms the newest products are returned with score 0
+        """
+        self.refresh()
+        terms = set(analyze(query))
+
+        with self._lock:
+            if not terms:
+                newest = sorted(self._docs, reverse=True)[:limit]
+                return [(0.0, self._docs[product_id]) for product_id in newest]
+
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[product_id] / average_length)
+                    scores[product_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+            return [(round(score, 4), self._docs[product_id])
+                    for product_id, score in scores.most_common(limit)]
+
+# Global product search index
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Production launcher
+Starts gunicorn with gunicorn.conf.py, which sizes the server for the
+machine it runs on (see tuned_settings) and preloads the app so workers
+fork from an initialized master
+
+    python serve.py                      # start the server
+    python serve.py --print-config       # show the resolved settings and exit
+
+Extra arguments are passed to gunicorn. Environment overrides:
+GUNICORN_WORKER_CLASS, WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_MAX_WORKERS
+"""
+
+import importlib.util
+import math
+import os
+import sys
+from typing import Dict, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(ROOT, 'gunicorn.conf.py')
+
+# Threads per gthread worker when GUNICORN_THREADS is not set
+DEFAULT_THREADS = 4
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup v2 quota (containers)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def tuned_settings(worker_class: str, cpus: int, workers: Optional[int] = None,
+                   threads: Optional[int] = None, max_workers: int = 12) -> Dict[str, int]:
+    """
+    Worker and thread counts for a worker class on a machine with cpus cores.
+
+    sync     2 x cores + 1 processes, one request each (the gunicorn rule of thumb)
+    gthread  cores + 1 processes with a few threads each
+    gevent   cores + 1 processes; concurrency comes from worker_connections,
+             the extra process covers the moments one blocks on SQLite
+
+    An explicit workers/threads value wins over the derived one.
+    """
+    if worker_class == 'sync':
+        derived_workers, derived_threads = 2 * cpus + 1, 1
+    elif worker_class == 'gthread':
+        derived_workers, derived_threads = cpus + 1, DEFAULT_THREADS
+    else:
+        derived_workers, derived_threads = cpus + 1, 1
+
+    return {
+        'workers': workers or min(derived_workers, max_workers),
+        'threads': threads or derived_threads
+    }
+
+
+def settings_from_env() -> Dict[str, int]:
+    """tuned_settings for this machine with the environment overrides applied"""
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+    workers = os.getenv('WEB_CONCURRENCY')
+    threads = os.getenv('GUNICORN_THREADS')
+    return tuned_settings(
+        worker_class,
+        available_cpus(),
+        workers=int(workers) if workers else None,
+        threads=int(threads) if threads else None,
+        max_workers=int(os.getenv('GUNICORN_MAX_WORKERS', '12'))
+    )
+
+
+def main():
+    os.chdir(ROOT)
+    if os.name == 'nt' or importlib.util.find_spec('gunicorn') is None:
+        # gunicorn needs fork(); keep local development working elsewhere
+        print("gunicorn is not available on this platform; starting the Flask development server")
+        from app import app
+        app.run(host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
+        return
+
+    os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', CONFIG_FILE, *sys.argv[1:], 'app:app'])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Template compilation cache
+Compiled Jinja templates are kept on disk so a new worker loads bytecode
+instead of parsing, and every template is compiled at startup so no
+request pays for it
+"""
+
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+from config import Config
+
+
+def warm_templates(app) -> float:
+    """Compile (or load from the bytecode cache) every template; returns seconds taken"""
+    start = time.perf_counter()
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            # A broken template should fail its own route, not the worker
+            print(f"Template warm-up failed for {name}: {e}")
+    return time.perf_counter() - start
+
+
+def init_template_cache(app):
+    """Install the bytecode cache and warm up templates per configuration"""
+    if Config.TEMPLATE_CACHE_DIR:
+        os.makedirs(Config.TEMPLATE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(Config.TEMPLATE_CACHE_DIR)
+
+    if Config.TEMPLATE_WARMUP:
+        warm_templates(app)
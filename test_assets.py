@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for fingerprinted static asset bundles
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from flask import Flask
+from assets import AssetManifest, build_bundles, cache_fingerprinted_assets
+
+def make_static():
+    """Copy of the real static sources in a temporary folder"""
+    static_folder = os.path.join(tempfile.mkdtemp(), 'static')
+    for directory in ('css', 'js'):
+        shutil.copytree(os.path.join('static', directory), os.path.join(static_folder, directory))
+    return static_folder
+
+def make_app(static_folder):
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+    app.after_request(cache_fingerprinted_assets)
+    return app
+
+def test_raw_files_without_build():
+    """Without a manifest, bundles resolve to their source files"""
+    print("Testing development fallback...")
+    static_folder = make_static()
+    manifest = AssetManifest(static_folder)
+
+    with make_app(static_folder).test_request_context():
+        assert manifest.urls('css/chatbot.css') == ['/static/css/style.css', '/static/css/chatbot.css']
+    print("✓ Raw files used")
+
+def test_fingerprinted_bundles():
+    """Built bundles are minified, content-hashed and cached for a year"""
+    print("\nTesting bundle build...")
+    static_folder = make_static()
+    build_bundles(static_folder)
+
+    with open(os.path.join(static_folder, 'dist', 'manifest.json')) as f:
+        entries = json.load(f)
+    assert set(entries) == {'css/site.css', 'css/chatbot.css', 'js/site.js', 'js/chatbot.js'}
+    assert entries['css/site.css'].startswith('dist/css/site.')
+    bundle = os.path.join(static_folder, entries['css/site.css'])
+    assert os.path.getsize(bundle) < os.path.getsize(os.path.join(static_folder, 'css', 'style.css'))
+
+    app = make_app(static_folder)
+    manifest = AssetManifest(static_folder)
+    with app.test_request_context():
+        url = manifest.urls('css/site.css')
+    assert url == ['/static/' + entries['css/site.css']]
+
+    response = app.test_client().get(url[0])
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    response.close()
+    print("✓ Bundle served as", url[0])
+
+def main():
+    """Run all tests"""
+    print("Asset Bundles - Test Suite")
+    print("=" * 40)
+
+    test_raw_files_without_build()
+    test_fingerprinted_bundles()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded chatbot upstream executor
+"""
+
+import threading
+import time
+from chat_executor import ChatExecutor
+
+def fallback():
+    return 'fallback'
+
+def test_runs_upstream_call():
+    """A job on an idle pool returns the upstream result"""
+    print("Testing upstream call on idle pool...")
+    executor = ChatExecutor(max_workers=2, max_queue=4, queue_wait_budget=1.0, response_timeout=1.0)
+
+    result = executor.run(lambda message: message.upper(), 'hello', fallback=fallback)
+    assert result == 'HELLO'
+
+    metrics = executor.get_metrics()
+    assert metrics['completed'] == 1
+    assert metrics['queue_depth'] == 0
+    print("✓ Upstream call completed")
+
+def test_sheds_when_queue_full():
+    """Once the queue is saturated new jobs get the fallback immediately"""
+    print("\nTesting load shedding...")
+    executor = ChatExecutor(max_workers=1, max_queue=1, queue_wait_budget=5.0, response_timeout=5.0)
+    release = threading.Event()
+    results = []
+
+    def slow_call():
+        release.wait(5)
+        return 'upstream'
+
+    # One job occupies the worker, the next one fills the queue
+    threads = [threading.Thread(target=lambda: results.append(executor.run(slow_call, fallback=fallback)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+
+    started = time.monotonic()
+    assert executor.run(slow_call, fallback=fallback) == 'fallback'
+    assert time.monotonic() - started < 0.5
+
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['upstream', 'upstream']
+    assert executor.get_metrics()['shed'] == 1
+    print("✓ Saturated pool answered from fallback")
+
+def test_expires_jobs_over_wait_budget():
+    """Jobs that wait longer than the budget are answered from the fallback"""
+    print("\nTesting queue wait budget...")
+    executor = ChatExecutor(max_workers=1, max_queue=4, queue_wait_budget=0.05, response_timeout=1.0)
+    results = []
+
+    def slow_call():
+        time.sleep(0.2)
+        return 'upstream'
+
+    first = threading.Thread(target=lambda: results.append(executor.run(slow_call, fallback=fallback)))
+    first.start()
+    time.sleep(0.02)
+    second = executor.run(slow_call, fallback=fallback)
+    first.join()
+
+    assert results == ['upstream']
+    assert second == 'fallback'
+
+    metrics = executor.get_metrics()
+    assert metrics['expired'] == 1
+    assert metrics['wait_max_ms'] >= 50
+    print("✓ Expired job answered from fallback")
+
+def main():
+    """Run all tests"""
+    print("Chat Executor - Test Suite")
+    print("=" * 40)
+
+    test_runs_upstream_call()
+    test_sheds_when_queue_full()
+    test_expires_jobs_over_wait_budget()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for response compression
+"""
+
+import gzip
+import os
+import tempfile
+from flask import Flask, jsonify
+from compression import compress_response, precompress_static, send_static
+
+def make_app(static_folder):
+    """Minimal app with the compression hooks installed"""
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+    app.after_request(compress_response)
+    app.view_functions['static'] = send_static
+
+    @app.route('/page')
+    def page():
+        return '<p>Handwoven silk scarf</p>' * 100
+
+    @app.route('/small')
+    def small():
+        return jsonify({'success': True})
+
+    return app
+
+def make_static():
+    """Static folder with one stylesheet"""
+    static_folder = tempfile.mkdtemp()
+    os.makedirs(os.path.join(static_folder, 'css'))
+    with open(os.path.join(static_folder, 'css', 'site.css'), 'w') as f:
+        f.write('.product-card { padding: 1rem; }\n' * 200)
+    return static_folder
+
+def test_dynamic_compression():
+    """Large HTML is gzipped for clients that accept it; small JSON is not"""
+    print("Testing dynamic compression...")
+    client = make_app(make_static()).test_client()
+
+    plain = client.get('/page')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data) / 10
+
+    refused = client.get('/page', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    print(f"✓ {len(plain.data)} bytes of HTML sent as {len(compressed.data)}")
+
+def test_precompressed_static():
+    """Precompressed assets are served without compressing per request"""
+    print("\nTesting precompressed static files...")
+    static_folder = make_static()
+    precompress_static(static_folder)
+    assert os.path.exists(os.path.join(static_folder, 'css', 'site.css.gz'))
+
+    client = make_app(static_folder).test_client()
+    response = client.get('/static/css/site.css', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'text/css'
+    body = gzip.decompress(response.get_data())
+    response.close()
+
+    identity = client.get('/static/css/site.css')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_data() == body
+    identity.close()
+    print("✓ .gz sibling served with Content-Encoding: gzip")
+
+def main():
+    """Run all tests"""
+    print("Response Compression - Test Suite")
+    print("=" * 40)
+
+    test_dynamic_compression()
+    test_precompressed_static()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for conditional GET on rendered pages
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from flask import Flask
+import conditional_get
+from assets import asset_manifest
+from conditional_get import conditional_page, page_etag, parse_timestamp
+
+# 2025-01-01, before the product below was modified
+OLD_TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+
+def with_deploy(test):
+    """Run a test against a temporary template folder and asset manifest"""
+    def run():
+        saved = conditional_get.TEMPLATE_FOLDER, asset_manifest.path
+        folder = tempfile.mkdtemp()
+        conditional_get.TEMPLATE_FOLDER = os.path.join(folder, 'templates')
+        os.makedirs(conditional_get.TEMPLATE_FOLDER)
+        asset_manifest.path = os.path.join(folder, 'manifest.json')
+        write_file(os.path.join(conditional_get.TEMPLATE_FOLDER, 'page.html'), '<h1>{{ name }}</h1>')
+        conditional_get._template_state.cache_clear()
+        try:
+            test()
+        finally:
+            conditional_get.TEMPLATE_FOLDER, asset_manifest.path = saved
+            conditional_get._template_state.cache_clear()
+    run.__name__ = test.__name__
+    return run
+
+def write_file(path, content, mtime=OLD_TIMESTAMP):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+def make_app(renders):
+    """Minimal app with one conditionally rendered page"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/product/<version>')
+    def product(version):
+        def render():
+            renders.append(version)
+            return f'<h1>Product {version}</h1>'
+        return conditional_page(page_etag('product', version), render,
+                                last_modified=parse_timestamp('2025-09-20 16:24:09.125'))
+
+    return app
+
+def test_not_modified_skips_rendering():
+    """A matching If-None-Match gets 304 without rendering"""
+    print("Testing If-None-Match...")
+    renders = []
+    client = make_app(renders).test_client()
+
+    first = client.get('/product/1')
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    repeat = client.get('/product/1', headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304 and repeat.data == b''
+    assert renders == ['1']
+
+    changed = client.get('/product/2', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    print("✓ Unchanged page answered with 304")
+
+@with_deploy
+def test_if_modified_since():
+    """If-Modified-Since is honoured, but If-None-Match takes precedence"""
+    print("\nTesting If-Modified-Since...")
+    renders = []
+    client = make_app(renders).test_client()
+
+    first = client.get('/product/1')
+    assert first.headers['Last-Modified'] == 'Sat, 20 Sep 2025 16:24:09 GMT'
+
+    assert client.get('/product/1', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert client.get('/product/1', headers={'If-Modified-Since': first.headers['Last-Modified'],
+                                             'If-None-Match': 'W/"stale"'}).status_code == 200
+
+    # Templates changed after the data: the page is that new
+    write_file(os.path.join(conditional_get.TEMPLATE_FOLDER, 'page.html'), '<h2>{{ name }}</h2>',
+               mtime=OLD_TIMESTAMP + 365 * 24 * 3600)
+    conditional_get._template_state.cache_clear()
+    assert client.get('/product/1', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 200
+    print("✓ Validators evaluated in RFC order")
+
+def test_etag_depends_on_viewer():
+    """Different users never share a page validator"""
+    print("\nTesting per-viewer ETags...")
+    client = make_app([]).test_client()
+
+    anonymous = client.get('/product/1').headers['ETag']
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['user_type'] = 'buyer'
+    assert client.get('/product/1', headers={'If-None-Match': anonymous}).status_code == 200
+    print("✓ Login changes the ETag")
+
+@with_deploy
+def test_deploy_changes_etag():
+    """New templates or a new asset build invalidate every page"""
+    print("\nTesting deploys...")
+    client = make_app([]).test_client()
+
+    def still_fresh():
+        etag = client.get('/product/1').headers['ETag']
+        return lambda: client.get('/product/1', headers={'If-None-Match': etag}).status_code == 304
+
+    fresh = still_fresh()
+    assert fresh()
+    write_file(os.path.join(conditional_get.TEMPLATE_FOLDER, 'page.html'), '<h2>{{ name }}</h2>')
+    conditional_get._template_state.cache_clear()  # a restarted worker
+    assert not fresh()
+
+    fresh = still_fresh()
+    write_file(asset_manifest.path, json.dumps({'css/site.css': 'dist/site.1111111111.css'}))
+    assert not fresh()
+    fresh = still_fresh()
+    assert fresh()
+    write_file(asset_manifest.path, json.dumps({'css/site.css': 'dist/site.2222222222.css'}),
+               mtime=OLD_TIMESTAMP + 60)
+    assert not fresh()
+    print("✓ Template and bundle changes give new ETags")
+
+def main():
+    """Run all tests"""
+    print("Conditional GET - Test Suite")
+    print("=" * 40)
+
+    test_not_modified_skips_rendering()
+    test_if_modified_since()
+    test_etag_depends_on_viewer()
+    test_deploy_changes_etag()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
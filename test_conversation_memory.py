@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for chatbot conversation memory
+"""
+
+import os
+import tempfile
+from config import Config
+
+# The module-level memory creates its table when imported, so point it at a scratch database
+saved_database, Config.DATABASE_PATH = Config.DATABASE_PATH, os.path.join(tempfile.mkdtemp(), 'test.db')
+from conversation_memory import ConversationMemory, estimate_tokens
+Config.DATABASE_PATH = saved_database
+
+def make_memory(**kwargs):
+    db_path = os.path.join(tempfile.mkdtemp(), 'memory.db')
+    return ConversationMemory(db_path=db_path, **kwargs)
+
+def test_ring_buffer_keeps_newest_messages():
+    """Only the newest max_messages rows are kept per session"""
+    print("Testing history ring buffer...")
+    memory = make_memory(max_messages=4)
+
+    for turn in range(5):
+        memory.record_exchange('abc', f'question {turn}', f'answer {turn}')
+    memory.record_exchange('other', 'unrelated', 'reply')
+
+    messages = memory.get_messages('abc')
+    assert messages == [('user', 'question 3'), ('assistant', 'answer 3'),
+                        ('user', 'question 4'), ('assistant', 'answer 4')]
+    assert len(memory.get_messages('other')) == 2
+    print("✓ Ring buffer evicts oldest messages")
+
+def test_history_fits_token_budget():
+    """Long histories are trimmed and summarized to stay within the budget"""
+    print("\nTesting history token budget...")
+    memory = make_memory(max_messages=20, token_budget=60)
+
+    assert memory.build_history('abc') == ""
+
+    memory.record_exchange('abc', 'Do you have blue pottery?', 'Yes, we have several pieces.')
+    history = memory.build_history('abc')
+    assert history == "User: Do you have blue pottery?\nAssistant: Yes, we have several pieces."
+
+    for turn in range(8):
+        memory.record_exchange('abc', f'Tell me about item {turn}', 'A fairly long answer ' * 3)
+    history = memory.build_history('abc')
+
+    assert estimate_tokens(history) <= 60 + len(history.splitlines())
+    assert history.startswith("Earlier the user asked about: Do you have blue pottery?")
+    assert history.splitlines()[-1].startswith("Assistant: A fairly long answer")
+    print("✓ History trimmed to budget with summary of older turns")
+
+def test_clear_forgets_session():
+    """Clearing a session removes its history"""
+    print("\nTesting history clear...")
+    memory = make_memory()
+
+    memory.record_exchange('abc', 'hello', 'hi there')
+    memory.clear('abc')
+
+    assert memory.get_messages('abc') == []
+    print("✓ Session history cleared")
+
+def main():
+    """Run all tests"""
+    print("Conversation Memory - Test Suite")
+    print("=" * 40)
+
+    test_ring_buffer_keeps_newest_messages()
+    test_history_fits_token_budget()
+    test_clear_forgets_session()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
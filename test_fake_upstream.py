@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the fake upstream server and its client shims
+"""
+
+import random
+import statistics
+import time
+from chatbot_service import ChatbotService
+from config import Config
+from fake_upstream import (FakeGenerativeModel, FakeTranslateClient, FakeUpstream, FakeUpstreamServer,
+                           FakeVertexModel, TokenBucket, parse_distribution, parse_latencies)
+from gcp_services import GCPServices
+
+def start(**behaviour):
+    """Fake server on a free port"""
+    behaviour.setdefault('latency', '*=fixed:0')
+    return FakeUpstreamServer(('127.0.0.1', 0), FakeUpstream(seed=1, **behaviour)).start()
+
+def test_sdk_shapes():
+    """Shims answer like the SDK calls the app makes"""
+    print("Testing client shims...")
+    server = start(latency='gemini=fixed:0.2,*=fixed:0')
+    try:
+        translated = FakeTranslateClient(server.url).translate('Hello', target_language='hi', source_language='en')
+        assert translated['translatedText'] == '[hi] Hello'
+
+        prediction = FakeVertexModel('text-bison@001', server.url).predict(instances=[{'prompt': 'story'}])
+        assert prediction.predictions[0]['content']
+
+        model = FakeGenerativeModel('gemini-pro', server.url)
+        started = time.monotonic()
+        reply = model.generate_content('hi').text
+        assert time.monotonic() - started >= 0.2
+        chunks = [chunk.text for chunk in model.generate_content('hi', stream=True)]
+        assert len(chunks) > 1 and ''.join(chunks) == reply
+        assert server.upstream.stats['gemini'] == {200: 2}
+    finally:
+        server.shutdown()
+    print("✓ Translate, predict and (streamed) generate_content")
+
+def test_failures_and_throttling():
+    """Configured errors raise the Google exceptions; over the rate limit is a 429"""
+    print("\nTesting failures...")
+    server = start(error_rate=1.0)
+    try:
+        FakeTranslateClient(server.url).translate('Hello', target_language='hi')
+        assert False, 'expected an error'
+    except Exception as e:
+        assert getattr(e, 'code', None) == 503
+    finally:
+        server.shutdown()
+
+    server = start(rate_limit='1/60')
+    try:
+        model = FakeGenerativeModel('gemini-pro', server.url)
+        model.generate_content('first')
+        try:
+            model.generate_content('second')
+            assert False, 'expected a 429'
+        except Exception as e:
+            assert getattr(e, 'code', None) == 429
+    finally:
+        server.shutdown()
+    print("✓ 503s and 429s surfaced")
+
+def test_services_use_fake_backend():
+    """AI_BACKEND=fake routes the services' calls to the server"""
+    print("\nTesting backend selection...")
+    server = start()
+    saved = Config.AI_BACKEND, Config.FAKE_UPSTREAM_URL
+    Config.AI_BACKEND, Config.FAKE_UPSTREAM_URL = 'fake', server.url
+    try:
+        services = GCPServices()
+        assert services.translate_text('Hello', 'es') == '[es] Hello'
+        assert services.generate_ai_story('A vase', 'pottery')
+        assert server.upstream.stats['translate'] == {200: 1} and server.upstream.stats['vertex'] == {200: 1}
+    finally:
+        Config.AI_BACKEND, Config.FAKE_UPSTREAM_URL = saved
+        server.shutdown()
+    print("✓ Services call the fake upstream")
+
+def test_latency_distributions():
+    """Latency specs sample the configured distributions per operation"""
+    print("\nTesting latency distributions...")
+    rng = random.Random(3)
+    assert parse_distribution('fixed:0.25')(rng) == 0.25
+    uniform = [parse_distribution('uniform:0.1:0.3')(rng) for _ in range(1000)]
+    assert 0.1 <= min(uniform) and max(uniform) <= 0.3
+    normal = [parse_distribution('normal:0.05:0.1')(rng) for _ in range(1000)]
+    assert min(normal) == 0.0  # clamped, never negative
+    lognormal = [parse_distribution('lognormal:0.5:0.4')(rng) for _ in range(2000)]
+    assert 0.45 < statistics.median(lognormal) < 0.55 and max(lognormal) > 1.0
+    try:
+        parse_distribution('pareto:1')
+        assert False, 'expected a ValueError'
+    except ValueError:
+        pass
+
+    latencies = parse_latencies('translate=fixed:0.1,*=fixed:2')
+    assert latencies['translate'](rng) == 0.1 and latencies['gemini'](rng) == 2.0
+    assert all(sample(rng) == 0 for sample in parse_latencies('').values())
+
+    bucket = TokenBucket(2, 10.0)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert 4.5 < bucket.take() <= 5.0
+    print("✓ fixed, uniform, normal and lognormal; token bucket waits")
+
+def test_simulated_latency_on_mocks():
+    """SIMULATED_UPSTREAM_LATENCY delays the in-process mock services"""
+    print("\nTesting simulated latency on mock services...")
+    saved = Config.AI_BACKEND, Config.SIMULATED_UPSTREAM_LATENCY
+    Config.AI_BACKEND = 'mock'
+    try:
+        services, chatbot = GCPServices(), ChatbotService()
+        for latency in (0.2, 0):
+            Config.SIMULATED_UPSTREAM_LATENCY = latency
+            for call in (lambda: services.translate_text('Hello', 'es'),
+                         lambda: services.generate_ai_story('A vase', 'pottery'),
+                         lambda: chatbot.get_chat_response('what is the meaning of life')):
+                started = time.monotonic()
+                assert call()
+                elapsed = time.monotonic() - started
+                assert elapsed >= 0.2 if latency else elapsed < 0.2
+    finally:
+        Config.AI_BACKEND, Config.SIMULATED_UPSTREAM_LATENCY = saved
+    print("✓ Translate, story and chat mocks delayed")
+
+def main():
+    """Run all tests"""
+    print("Fake Upstream - Test Suite")
+    print("=" * 40)
+
+    test_sdk_shapes()
+    test_failures_and_throttling()
+    test_services_use_fake_backend()
+    test_latency_distributions()
+    test_simulated_latency_on_mocks()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the catalog fragment cache
+"""
+
+import os
+import sqlite3
+import tempfile
+from fragment_cache import FragmentCache, bump_catalog_version, init_catalog_tables
+
+def make_db():
+    """Database with only the catalog version table"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'catalog.db')
+    conn = sqlite3.connect(db_path)
+    init_catalog_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    return db_path
+
+def renderer(calls, html):
+    def render():
+        calls.append(html)
+        return html
+    return render
+
+def test_hits_until_catalog_changes():
+    """Fragments are reused until the catalog version is bumped"""
+    print("Testing catalog versioning...")
+    db_path = make_db()
+    cache = FragmentCache(max_entries=10, max_bytes=10000, enabled=True, db_path=db_path)
+    calls = []
+
+    assert cache.get_or_render(('browse', 'all'), renderer(calls, '<p>v1</p>')) == '<p>v1</p>'
+    assert cache.get_or_render(('browse', 'all'), renderer(calls, '<p>v2</p>')) == '<p>v1</p>'
+    assert len(calls) == 1
+
+    conn = sqlite3.connect(db_path)
+    bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    assert cache.get_or_render(('browse', 'all'), renderer(calls, '<p>v2</p>')) == '<p>v2</p>'
+    assert len(calls) == 2
+    print("✓ Version bump invalidated the fragment")
+
+def test_lru_bounds():
+    """Least recently used fragments are evicted by count and size"""
+    print("\nTesting LRU eviction...")
+    cache = FragmentCache(max_entries=2, max_bytes=25, enabled=True, db_path=make_db())
+    calls = []
+
+    cache.get_or_render('a', renderer(calls, 'a' * 10))
+    cache.get_or_render('b', renderer(calls, 'b' * 10))
+    cache.get_or_render('a', renderer(calls, 'a' * 10))
+    cache.get_or_render('c', renderer(calls, 'c' * 10))
+    assert cache.get_metrics()['entries'] == 2
+
+    # 'b' was least recently used
+    cache.get_or_render('b', renderer(calls, 'b' * 10))
+    assert calls == ['a' * 10, 'b' * 10, 'c' * 10, 'b' * 10]
+
+    cache.get_or_render('big', renderer(calls, 'x' * 20))
+    assert cache.get_metrics()['bytes'] <= 25
+
+    cache.get_or_render('huge', renderer(calls, 'x' * 100))
+    assert 'huge' not in cache._entries
+    print("✓ Cache stayed within its bounds")
+
+def main():
+    """Run all tests"""
+    print("Fragment Cache - Test Suite")
+    print("=" * 40)
+
+    test_hits_until_catalog_changes()
+    test_lru_bounds()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
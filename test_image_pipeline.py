@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Tests for the image derivative pipeline
+"""
+
+import base64
+import io
+import os
+import tempfile
+from flask import Flask, render_template_string
+from PIL import ExifTags, Image
+from config import Config
+from image_pipeline import make_placeholder, placeholder_for_file, process_image, strip_metadata
+from upload_serving import upload_url
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def save_photo(folder, filename, size=(1000, 500), orientation=None, **kwargs):
+    """Solid photo, optionally with a camera EXIF block and orientation"""
+    image = Image.new('RGB', size, (180, 90, 40))
+    # Mark the top-left corner so rotations can be checked
+    image.paste((0, 0, 255), (0, 0, size[0] // 4, size[1] // 4))
+    if orientation:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        exif[ExifTags.Base.Make] = 'PocketCam'
+        kwargs['exif'] = exif.tobytes()
+    image.save(os.path.join(folder, filename), **kwargs)
+
+def is_blue(pixel):
+    return pixel[2] > 200 and pixel[0] < 60
+
+def test_variant_sizes_and_formats():
+    """Every configured width below the original, plus the original, in WebP and JPEG"""
+    print("Testing variant sizes and formats...")
+    folder = tempfile.mkdtemp()
+    save_photo(folder, 'vase.jpg')
+
+    info = process_image('vase.jpg', folder)
+    assert (info['width'], info['height']) == (1000, 500)
+    widths = sorted({width for width, _, _, _ in info['variants']})
+    assert widths == [w for w in Config.IMAGE_VARIANT_WIDTHS if w < 1000] + [1000]
+
+    for width, height, fmt, variant in info['variants']:
+        assert height == round(500 * width / 1000)
+        assert variant == f'vase_{width}w.' + ('webp' if fmt == 'webp' else 'jpg')
+        with Image.open(os.path.join(folder, variant)) as image:
+            assert image.size == (width, height)
+            assert image.format == fmt.upper()
+    assert len(info['variants']) == 2 * len(widths)
+    print(f"✓ {len(info['variants'])} variants at widths {widths}")
+
+def test_large_original_capped():
+    """Originals wider than the largest variant are scaled down to it"""
+    print("\nTesting large original...")
+    folder = tempfile.mkdtemp()
+    save_photo(folder, 'rug.png', size=(3000, 1500))
+
+    info = process_image('rug.png', folder)
+    assert (info['width'], info['height']) == (3000, 1500)
+    assert max(width for width, _, _, _ in info['variants']) == Config.IMAGE_VARIANT_WIDTHS[-1]
+    print("✓ Largest variant capped at", Config.IMAGE_VARIANT_WIDTHS[-1])
+
+def test_exif_orientation():
+    """Variants of a sideways photo come out upright and without metadata"""
+    print("\nTesting EXIF orientation...")
+    folder = tempfile.mkdtemp()
+    # Orientation 6: the camera was turned clockwise, display rotated 90° clockwise
+    save_photo(folder, 'bowl.jpg', orientation=6, quality=95)
+
+    info = process_image('bowl.jpg', folder)
+    assert (info['width'], info['height']) == (500, 1000)
+    for width, height, fmt, variant in info['variants']:
+        with Image.open(os.path.join(folder, variant)) as image:
+            assert image.size == (width, height)
+            assert not image.getexif()
+            # The marked corner ends up top-right
+            rgb = image.convert('RGB')
+            assert is_blue(rgb.getpixel((width - 2, 2))) and not is_blue(rgb.getpixel((1, 1)))
+    print("✓ Variants upright with no EXIF")
+
+def test_strip_metadata():
+    """Uploads lose their EXIF and are rewritten upright; clean files are untouched"""
+    print("\nTesting metadata stripping...")
+    folder = tempfile.mkdtemp()
+    save_photo(folder, 'cup.jpg', orientation=6, quality=95)
+    save_photo(folder, 'clean.jpg', quality=95)
+    path, clean = os.path.join(folder, 'cup.jpg'), os.path.join(folder, 'clean.jpg')
+    with open(clean, 'rb') as f:
+        clean_bytes = f.read()
+
+    assert strip_metadata(path)
+    with Image.open(path) as image:
+        assert image.size == (500, 1000)
+        assert 'exif' not in image.info and not image.getexif()
+    assert not strip_metadata(path)
+    assert not strip_metadata(clean)
+    with open(clean, 'rb') as f:
+        assert f.read() == clean_bytes
+
+    with open(os.path.join(folder, 'notes.jpg'), 'wb') as f:
+        f.write(b'not an image')
+    assert not strip_metadata(os.path.join(folder, 'notes.jpg'))
+    print("✓ EXIF removed, clean and unreadable files left alone")
+
+def test_transparency_flattened():
+    """JPEG variants of transparent RGBA and palette images are flattened onto white"""
+    print("\nTesting mode flattening...")
+    folder = tempfile.mkdtemp()
+    rgba = Image.new('RGBA', (400, 200), (0, 0, 0, 0))
+    rgba.paste((200, 30, 30, 255), (200, 0, 400, 200))
+    rgba.save(os.path.join(folder, 'charm.png'))
+    palette = rgba.convert('RGB').convert('P')
+    palette.save(os.path.join(folder, 'badge.png'), transparency=palette.getpixel((0, 0)))
+
+    for filename in ('charm.png', 'badge.png'):
+        info = process_image(filename, folder)
+        variants = {(fmt, width): variant for width, _, fmt, variant in info['variants']}
+
+        with Image.open(os.path.join(folder, variants[('jpeg', 400)])) as jpeg:
+            assert jpeg.mode == 'RGB'
+            assert min(jpeg.getpixel((20, 100))) > 240  # transparent half is white
+            assert jpeg.getpixel((380, 100))[0] > 150 and jpeg.getpixel((380, 100))[1] < 80
+        with Image.open(os.path.join(folder, variants[('webp', 400)])) as webp:
+            assert webp.mode == 'RGBA'
+            assert webp.getpixel((20, 100))[3] == 0
+    print("✓ JPEG variants on white, WebP variants keep alpha")
+
+def decode_placeholder(uri):
+    """Image inside a placeholder data URI"""
+    prefix = 'data:image/webp;base64,'
+    assert uri.startswith(prefix)
+    return Image.open(io.BytesIO(base64.b64decode(uri[len(prefix):], validate=True)))
+
+def test_placeholder_format_and_size():
+    """Placeholders are tiny WebP data URIs of the configured width, whatever the original size"""
+    print("\nTesting placeholder format and size...")
+    for size in [(1000, 750), (4000, 3000), (600, 4000), (7, 5)]:
+        noise = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+        uri = make_placeholder(noise)
+        assert len(uri) < 1024, (size, len(uri))
+        with decode_placeholder(uri) as thumbnail:
+            assert thumbnail.format == 'WEBP'
+            assert thumbnail.width == Config.IMAGE_PLACEHOLDER_WIDTH
+            assert thumbnail.height == max(1, round(size[1] * thumbnail.width / size[0]))
+
+    # Transparency is flattened like the JPEG variants
+    with decode_placeholder(make_placeholder(Image.new('RGBA', (100, 100), (0, 0, 0, 0)))) as thumbnail:
+        assert thumbnail.mode == 'RGB' and min(thumbnail.getpixel((10, 10))) > 240
+    print("✓ WebP data URIs under 1 KB")
+
+def test_placeholder_for_file():
+    """Existing uploads get their oriented dimensions and a placeholder"""
+    print("\nTesting placeholders for existing files...")
+    folder = tempfile.mkdtemp()
+    save_photo(folder, 'plate.jpg', size=(1200, 800), orientation=6, quality=95)
+
+    info = placeholder_for_file(os.path.join(folder, 'plate.jpg'))
+    assert (info['width'], info['height']) == (800, 1200)
+    with decode_placeholder(info['placeholder']) as thumbnail:
+        assert thumbnail.size == (Config.IMAGE_PLACEHOLDER_WIDTH, 30)
+    processed = process_image('plate.jpg', folder)
+    assert (processed['width'], processed['height']) == (info['width'], info['height'])
+    print("✓ Dimensions", (info['width'], info['height']))
+
+def test_placeholder_in_template():
+    """product_image reserves the image's size and shows the placeholder behind it"""
+    print("\nTesting placeholder in templates...")
+    folder = tempfile.mkdtemp()
+    save_photo(folder, 'jug.jpg', size=(800, 600))
+    info = process_image('jug.jpg', folder)
+
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.jinja_env.globals['upload_url'] = upload_url
+    app.add_url_rule('/static/uploads/<path:filename>', 'uploaded_file', lambda filename: '')
+    macro = '{% from "macros.html" import product_image %}{{ product_image(filename, "Jug", images) }}'
+
+    def render(filename, images):
+        with app.test_request_context():
+            return render_template_string(macro, filename=filename, images=images)
+
+    ready = {'status': 'ready', 'width': info['width'], 'height': info['height'],
+             'placeholder': info['placeholder'],
+             'webp': [(w, v) for w, _, fmt, v in info['variants'] if fmt == 'webp'],
+             'jpeg': [(w, v) for w, _, fmt, v in info['variants'] if fmt == 'jpeg']}
+    html = render('jug.jpg', {'jug.jpg': ready})
+    assert '<picture>' in html and 'width="800" height="600"' in html
+    assert f'class="lqip" style="background-image: url({info["placeholder"]})"' in html
+
+    # Legacy images without variants still get the preview; unknown ones get neither
+    legacy = dict(ready, webp=[], jpeg=[])
+    html = render('jug.jpg', {'jug.jpg': legacy})
+    assert '<picture>' not in html and 'class="lqip"' in html and 'width="800"' in html
+    html = render('jug.jpg', {})
+    assert 'lqip' not in html and 'width=' not in html
+    pending = render('jug.jpg', {'jug.jpg': {'status': 'pending', 'width': None, 'placeholder': None}})
+    assert 'image-pending' in pending and 'lqip' not in pending
+    print("✓ Dimensions and preview emitted")
+
+def main():
+    """Run all tests"""
+    print("Image Pipeline - Test Suite")
+    print("=" * 40)
+
+    test_variant_sizes_and_formats()
+    test_large_original_capped()
+    test_exif_orientation()
+    test_strip_metadata()
+    test_transparency_flattened()
+    test_placeholder_format_and_size()
+    test_placeholder_for_file()
+    test_placeholder_in_template()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the background image worker's job queue
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+from PIL import Image
+from config import Config
+from fragment_cache import init_catalog_tables
+from image_pipeline import init_image_tables, process_image
+from image_worker import ImageWorker, enqueue_image_job
+from upload_store import UploadStore, init_upload_tables
+
+def make_worker(*filenames):
+    """Worker over a temporary database with the given uploads queued"""
+    folder = tempfile.mkdtemp()
+    db_path = os.path.join(folder, 'worker.db')
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    init_image_tables(cursor)
+    init_catalog_tables(cursor)
+    init_upload_tables(cursor)
+    for filename in filenames:
+        enqueue_image_job(cursor, filename)
+    conn.commit()
+    return ImageWorker(db_path=db_path, upload_folder=folder, processes=1), conn
+
+def job_row(conn, job_id):
+    return conn.execute('SELECT status, attempts, error FROM image_jobs WHERE id = ?', (job_id,)).fetchone()
+
+def age_job(conn, job_id, seconds):
+    """Pretend the job was last updated the given number of seconds ago"""
+    conn.execute("UPDATE image_jobs SET updated_at = datetime('now', ?) WHERE id = ?",
+                 (f'-{seconds} seconds', job_id))
+    conn.commit()
+
+def test_claim():
+    """Jobs are claimed in order, once, and count an attempt"""
+    print("Testing job claims...")
+    worker, conn = make_worker('a.jpg', 'b.jpg', 'c.jpg')
+
+    first = worker.claim_jobs(2)
+    assert [filename for _, filename in first] == ['a.jpg', 'b.jpg']
+    assert job_row(conn, first[0][0])[:2] == ('processing', 1)
+    assert [filename for _, filename in worker.claim_jobs(5)] == ['c.jpg']
+    assert worker.claim_jobs(5) == []
+    print("✓ Each job handed out exactly once")
+
+def test_retry_backoff():
+    """Failed jobs wait out a doubling backoff, then fail for good"""
+    print("\nTesting retry and backoff...")
+    worker, conn = make_worker('broken.jpg')
+    backoff = Config.IMAGE_WORKER_RETRY_BACKOFF
+
+    for attempt in range(1, Config.IMAGE_WORKER_MAX_ATTEMPTS):
+        (job_id, filename), = worker.claim_jobs(1)
+        worker.fail_job(job_id, filename, ValueError('cannot identify image'))
+        assert job_row(conn, job_id) == ('pending', attempt, 'cannot identify image')
+
+        # Not retried until the backoff for this attempt has passed
+        delay = backoff * 2 ** (attempt - 1)
+        age_job(conn, job_id, delay - 2)
+        assert worker.claim_jobs(1) == []
+        age_job(conn, job_id, delay)
+
+    (job_id, filename), = worker.claim_jobs(1)
+    worker.fail_job(job_id, filename, ValueError('cannot identify image'))
+    assert job_row(conn, job_id)[:2] == ('failed', Config.IMAGE_WORKER_MAX_ATTEMPTS)
+    assert conn.execute("SELECT status FROM images WHERE filename = 'broken.jpg'").fetchone() == ('failed',)
+    age_job(conn, job_id, 3600)
+    assert worker.claim_jobs(1) == []
+    print(f"✓ Gave up after {Config.IMAGE_WORKER_MAX_ATTEMPTS} attempts")
+
+def test_stale_recovery():
+    """Abandoned jobs are requeued; jobs this worker still runs are not"""
+    print("\nTesting stale job recovery...")
+    worker, conn = make_worker('abandoned.jpg', 'running.jpg')
+    (abandoned, _), (running, _) = worker.claim_jobs(2)
+    age_job(conn, abandoned, Config.IMAGE_WORKER_STALE_AFTER + 1)
+    age_job(conn, running, Config.IMAGE_WORKER_STALE_AFTER + 1)
+
+    worker.touch_jobs([running])
+    worker.recover_stale_jobs()
+    assert job_row(conn, abandoned)[0] == 'pending'
+    assert job_row(conn, running)[0] == 'processing'
+
+    # Requeued after a crash, so picked up again straight after its backoff
+    age_job(conn, abandoned, Config.IMAGE_WORKER_RETRY_BACKOFF)
+    assert worker.claim_jobs(1) == [(abandoned, 'abandoned.jpg')]
+    assert job_row(conn, abandoned)[1] == 2
+    print("✓ Abandoned job requeued, running job left alone")
+
+def test_released_while_processing():
+    """Jobs whose upload was deleted mid-processing leave no rows or files behind"""
+    print("\nTesting uploads released while processing...")
+    worker, conn = make_worker()
+    store = UploadStore(upload_folder=worker.upload_folder)
+    cursor = conn.cursor()
+    paths = []
+    for color in ((200, 120, 40), (40, 120, 200)):
+        photo = io.BytesIO()
+        Image.new('RGB', (400, 300), color).save(photo, 'JPEG')
+        photo.seek(0)
+        path, _ = store.commit(cursor, store.stage(photo, 'mug.jpg'))
+        enqueue_image_job(cursor, path)
+        paths.append(path)
+    conn.commit()
+
+    (done_id, done_path), (failed_id, failed_path) = worker.claim_jobs(2)
+    info = process_image(done_path, worker.upload_folder)
+    for path in paths:
+        store.release(cursor, path)
+    conn.commit()
+
+    worker.complete_job(done_id, done_path, info)
+    worker.fail_job(failed_id, failed_path, ValueError('cannot identify image'))
+    for table in ('images', 'image_variants', 'image_jobs', 'upload_blobs'):
+        assert conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == 0, table
+    leftovers = [name for _, _, names in os.walk(worker.upload_folder) for name in names
+                 if name != 'worker.db']
+    assert leftovers == [], leftovers
+    print("✓ Variants removed, nothing recorded, no error")
+
+def test_run_once():
+    """A run recovers stale jobs, processes the queue and records failures"""
+    print("\nTesting worker run...")
+    worker, conn = make_worker('mug.jpg', 'missing.jpg', 'stale.jpg')
+    Image.new('RGB', (400, 300), (200, 120, 40)).save(os.path.join(worker.upload_folder, 'mug.jpg'))
+    Image.new('RGB', (400, 300), (40, 120, 200)).save(os.path.join(worker.upload_folder, 'stale.jpg'))
+    conn.execute("UPDATE image_jobs SET status = 'processing', attempts = 1, "
+                 "updated_at = datetime('now', '-1 day') WHERE filename = 'stale.jpg'")
+    conn.commit()
+
+    worker.run(once=True)
+    statuses = dict(conn.execute('SELECT filename, status FROM image_jobs').fetchall())
+    assert statuses == {'mug.jpg': 'done', 'missing.jpg': 'pending', 'stale.jpg': 'pending'}
+    assert conn.execute("SELECT status FROM images WHERE filename = 'mug.jpg'").fetchone() == ('ready',)
+    assert conn.execute("SELECT COUNT(*) FROM image_variants WHERE filename = 'mug.jpg'").fetchone()[0] > 0
+    print("✓ Image processed, missing file queued for retry, stale job recovered")
+
+def main():
+    """Run all tests"""
+    print("Image Worker - Test Suite")
+    print("=" * 40)
+
+    test_claim()
+    test_retry_backoff()
+    test_stale_recovery()
+    test_released_while_processing()
+    test_run_once()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
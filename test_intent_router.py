@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for chatbot intent routing
+"""
+
+from chatbot_service import FALLBACK_RESPONSES
+from intent_router import IntentRouter, intent_router
+
+def test_routes_common_messages():
+    """Typical messages land on the expected intent"""
+    print("Testing intent routing...")
+
+    assert intent_router.route('show me blue pottery please')[0] == 'product_search'
+    assert intent_router.route('do you have silver earrings')[0] == 'product_search'
+    assert intent_router.route('hello there')[0] == 'hello'
+    assert intent_router.route('what categories are there')[0] == 'categories'
+    print("✓ Messages routed to expected intents")
+
+def test_keyword_alone_does_not_misroute():
+    """A product keyword inside another question no longer forces a product search"""
+    print("\nTesting keyword misroutes...")
+
+    assert intent_router.route('I cannot find the register page')[0] == 'register'
+    assert intent_router.route('find')[0] == 'chat'
+    print("✓ Ambiguous messages avoid the product finder")
+
+def test_shipping_not_answered_as_price():
+    """Delivery questions aren't given the price or checkout answer; price questions are"""
+    print("\nTesting shipping and price questions...")
+
+    for message in ("what's the shipping cost", 'how much does delivery cost', 'do you ship abroad',
+                    'how long until my order arrives'):
+        intent = intent_router.route(message)[0]
+        assert intent == 'shipping' and intent not in FALLBACK_RESPONSES, (message, intent)
+    for message in ('how much does the necklace cost', 'what is the price', 'price of pottery',
+                    'what currency are prices in'):
+        assert intent_router.route(message)[0] == 'price', message
+    assert intent_router.route('how do i place an order')[0] == 'buy'
+    print("✓ Shipping left to the assistant, prices answered locally")
+
+def test_custom_intents_and_threshold():
+    """Intents and the confidence threshold are configurable"""
+    print("\nTesting custom intents...")
+    intents = {
+        'refund': {'patterns': ['refund'], 'examples': ['i want a refund', 'refund my order']},
+        'chat': {'patterns': [], 'examples': ['tell me a story']}
+    }
+
+    router = IntentRouter(intents=intents, threshold=0.5)
+    intent, confidence = router.route('Can I get a refund?')
+    assert intent == 'refund' and confidence >= 0.5
+
+    strict = IntentRouter(intents=intents, threshold=0.999)
+    assert strict.route('refund')[0] == 'chat'
+    print("✓ Custom intents routed with threshold")
+
+def main():
+    """Run all tests"""
+    print("Intent Router - Test Suite")
+    print("=" * 40)
+
+    test_routes_common_messages()
+    test_keyword_alone_does_not_misroute()
+    test_shipping_not_answered_as_price()
+    test_custom_intents_and_threshold()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
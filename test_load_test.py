@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the route-level load test
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stderr
+from generate_data import generate
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from load_test import percentile, print_table, summarize
+
+def test_percentile():
+    """Nearest-rank percentiles of an ascending list"""
+    print("Testing percentiles...")
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 51
+    assert percentile(values, 0.95) == 96
+    assert percentile(values, 0.99) == 100
+    assert percentile(values, 1.0) == 100
+    assert percentile(values, 0.0) == 1
+    assert percentile([7.5], 0.99) == 7.5
+    assert percentile([], 0.5) == 0.0
+    print("✓ p50, p95 and p99 by nearest rank")
+
+def test_summarize():
+    """Per-route and total counts, errors, throughput and latency"""
+    print("\nTesting summaries...")
+    samples = [('browse', 0.010, True), ('browse', 0.030, True), ('browse', 0.020, False),
+               ('cart', 0.100, True)]
+    result = summarize(samples, duration=2.0)
+
+    browse = result['routes']['browse']
+    assert browse == {'requests': 3, 'errors': 1, 'rps': 1.5, 'mean_ms': 20.0, 'p50_ms': 20.0,
+                      'p95_ms': 30.0, 'p99_ms': 30.0, 'max_ms': 30.0}
+    assert list(result['routes']) == ['browse', 'cart']
+    total = result['total']
+    assert total['requests'] == 4 and total['errors'] == 1 and total['rps'] == 2.0
+    assert total['mean_ms'] == 40.0 and total['max_ms'] == 100.0
+
+    empty = summarize([], duration=1.0)
+    assert empty == {'total': {'requests': 0, 'errors': 0, 'rps': 0.0, 'mean_ms': 0.0, 'p50_ms': 0.0,
+                               'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}, 'routes': {}}
+    print("✓ Route and total statistics")
+
+def test_compare_table():
+    """The table shows rps and p95 changes against a baseline run"""
+    print("\nTesting baseline comparison...")
+    baseline = summarize([('browse', 0.020, True)] * 10, duration=1.0)
+    result = summarize([('browse', 0.030, True)] * 20 + [('cart', 0.010, True)], duration=1.0)
+    output = io.StringIO()
+    with redirect_stderr(output):
+        print_table(result, baseline)
+    lines = {line.split()[0]: line for line in output.getvalue().splitlines()}
+    assert lines['browse'].rstrip().endswith('+100% / +50%')
+    assert '/' not in lines['cart']  # no baseline for this route
+    assert lines['total'].rstrip().endswith('+110% / +50%')
+    print("✓ Changes per route and in total")
+
+def test_short_run():
+    """A short in-process run against a tiny dataset and the fake upstream"""
+    print("\nTesting a short run...")
+    workdir = tempfile.mkdtemp()
+    database, output = os.path.join(workdir, 'bench.db'), os.path.join(workdir, 'run.json')
+    generate(database, 'tiny', artisans=3, buyers=10, products=30, interactions=100, carts=5)
+    env = dict(os.environ, DATABASE_PATH=database)
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'load_test.py'), '--users', '2',
+               '--duration', '2', '--warmup', '0.5', '--upstream', 'fake', '--output', output]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    with open(output) as f:
+        run = json.load(f)
+    assert run['mode'] == 'in-process' and run['upstream'] == 'fake'
+    assert run['dataset']['products'] == 30
+    assert run['total']['requests'] > 0 and run['total']['errors'] == 0
+    assert sum(stats['requests'] for stats in run['routes'].values()) == run['total']['requests']
+    assert 'upstream_calls' in run
+    print(f"✓ {run['total']['requests']} requests over {len(run['routes'])} routes")
+
+def main():
+    """Run all tests"""
+    print("Load Test - Test Suite")
+    print("=" * 40)
+
+    test_percentile()
+    test_summarize()
+    test_compare_table()
+    test_short_run()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for per-route memory profiling and budgets
+"""
+
+import os
+import subprocess
+import sys
+from flask import Flask, render_template_string
+from config import Config
+from memory_profiler import MemoryProfiler, memory_profiler
+
+def test_request_profile():
+    """Peak counts what a request held at once, retained what it kept"""
+    print("Testing request profile...")
+    kept = []
+    profiler = MemoryProfiler(top_sites=5)
+
+    def build():
+        rows = [str(i) * 10 for i in range(20000)]
+        kept.append(bytearray(100_000))
+        return len(rows)
+
+    _, profile = profiler.measure(build, 'GET /build')
+    assert profile.peak > 1_000_000
+    assert 100_000 <= profile.retained < 200_000
+    assert any(site.location.startswith('test_memory_budgets.py:') for site in profile.top_sites)
+
+    _, quick = profiler.measure(lambda: None, 'GET /build', sites=False)
+    assert quick.top_sites == [] and quick.peak < 50_000
+    entry, = profiler.report()
+    assert entry['route'] == 'GET /build' and entry['requests'] == 2
+    print("✓ Peak, retained and allocation sites measured")
+
+def test_render_checkpoint():
+    """Sites are taken when the template starts rendering, while its context is alive"""
+    print("\nTesting render checkpoint...")
+    saved = Config.MEMORY_PROFILE, Config.MEMORY_PROFILE_SAMPLE_RATE
+    Config.MEMORY_PROFILE, Config.MEMORY_PROFILE_SAMPLE_RATE = True, 1.0
+    try:
+        from memory_profiler import init_memory_profiler
+        app = Flask(__name__)
+        init_memory_profiler(app)
+
+        @app.route('/page')
+        def page():
+            rows = [str(i) * 10 for i in range(20000)]
+            return render_template_string('{{ rows|length }}', rows=rows)
+
+        memory_profiler.reset()
+        assert app.test_client().get('/page').data == b'20000'
+    finally:
+        Config.MEMORY_PROFILE, Config.MEMORY_PROFILE_SAMPLE_RATE = saved
+
+    entry, = memory_profiler.report()
+    assert entry['route'] == 'GET /page' and entry['peak_max_kb'] > 1000
+    assert entry['top_sites'][0]['location'].startswith('test_memory_budgets.py:')
+    memory_profiler.reset()
+    print("✓ Rows built by the view found at render time")
+
+def test_budgets():
+    """Every budgeted route stays within its budget on the synthetic dataset"""
+    print("\nTesting memory budgets...")
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, os.path.join(root, 'benchmarks', 'memory_budgets.py')],
+                            cwd=root, capture_output=True, text=True, timeout=600)
+    report = result.stdout[result.stdout.find('Memory per request'):]
+    print(report)
+    assert result.returncode == 0, report + result.stderr
+    print("✓ All routes within budget")
+
+def main():
+    """Run all tests"""
+    print("Memory Budgets - Test Suite")
+    print("=" * 40)
+
+    test_request_profile()
+    test_render_checkpoint()
+    test_budgets()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from flask import Flask, Response
+import metrics
+from config import Config
+from db import connect_db
+
+def make_app(metrics_dir):
+    """Instrumented app with a route that runs a few statements"""
+    Config.METRICS_DIR = metrics_dir
+    app = Flask(__name__)
+    metrics.init_metrics(app)
+
+    @app.route('/items')
+    def items():
+        conn = connect_db(':memory:')
+        conn.execute('CREATE TABLE items (id INTEGER)')
+        conn.executemany('INSERT INTO items VALUES (?)', [(1,), (2,)])
+        count = conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        conn.close()
+        return str(count)
+
+    return app
+
+def test_exposition():
+    """Requests, statements and upstream calls show up in the text format"""
+    print("Testing exposition...")
+    saved = Config.METRICS_DIR
+    try:
+        client = make_app(tempfile.mkdtemp()).test_client()
+        assert client.get('/items').data == b'2'
+        assert client.get('/missing').status_code == 404
+        try:
+            with metrics.track_upstream('gemini', 'test'):
+                raise TimeoutError('slow')
+        except TimeoutError:
+            pass
+
+        response = client.get('/metrics')
+        assert response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        assert 'http_requests_total{endpoint="items",method="GET",status="200"} 1' in text
+        assert 'http_requests_total{endpoint="unmatched",method="GET",status="404"}' in text
+        assert 'db_queries_per_request_sum{endpoint="items"} 3.0' in text
+        assert 'http_request_duration_seconds_bucket{endpoint="items",method="GET",le="+Inf"} 1' in text
+        assert 'upstream_errors_total{service="gemini",operation="test",error="TimeoutError"} 1' in text
+        assert 'metrics_worker_processes 1' in text
+    finally:
+        Config.METRICS_DIR = saved
+    print("✓ Per-route, SQL and upstream series rendered")
+
+def test_merge_across_workers():
+    """Live workers are summed; exited workers keep their counters but not gauges"""
+    print("\nTesting multi-process merge...")
+    saved = Config.METRICS_DIR
+    Config.METRICS_DIR = directory = tempfile.mkdtemp()
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+
+    def worker_snapshot(requests, queue_depth):
+        return {
+            'http_requests_total': {'type': 'counter', 'help': 'h', 'labels': ['endpoint', 'method', 'status'],
+                                    'samples': [[['merged', 'GET', '200'], requests]]},
+            'chat_queue_depth': {'type': 'gauge', 'help': 'h', 'labels': [], 'samples': [[[], queue_depth]]}
+        }
+
+    try:
+        for pid, requests in ((os.getppid(), 5), (exited.pid, 7)):
+            with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+                json.dump(worker_snapshot(requests, 2), f)
+
+        for _ in range(2):  # the exited worker is archived on the first pass
+            merged, workers = metrics.collect_all()
+            text = metrics.render(merged)
+            assert 'http_requests_total{endpoint="merged",method="GET",status="200"} 12' in text
+            assert 'chat_queue_depth 2' in text
+            assert workers == 2  # the parent and this process
+        assert not os.path.exists(os.path.join(directory, f'{exited.pid}.json'))
+    finally:
+        Config.METRICS_DIR = saved
+    print("✓ Counters survive worker exit")
+
+def test_token_and_overhead():
+    """Scrapes are local-only without a token, and need it when set; the request hooks stay cheap"""
+    print("\nTesting token and overhead...")
+    saved = Config.METRICS_DIR, Config.METRICS_TOKEN
+    try:
+        app = make_app(tempfile.mkdtemp())
+        client = app.test_client()
+        Config.METRICS_TOKEN = None
+        assert client.get('/metrics').status_code == 200
+        assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
+        assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 403
+
+        Config.METRICS_TOKEN = 'secret'
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+        response = Response('ok')
+        with app.test_request_context('/items'):
+            started = time.perf_counter()
+            for _ in range(10000):
+                metrics._start_request()
+                metrics._record_status(response)
+                metrics._finish_request(None)
+            per_request = (time.perf_counter() - started) / 10000
+        # Around 4µs here; generous bound for slow CI machines
+        assert per_request < 50e-6, per_request
+    finally:
+        Config.METRICS_DIR, Config.METRICS_TOKEN = saved
+    print(f"✓ {per_request * 1e6:.1f}µs per request")
+
+def test_without_fcntl():
+    """Without fcntl (Windows) the app imports and /metrics serves this process's numbers"""
+    print("\nTesting without fcntl...")
+    directory = os.path.join(tempfile.mkdtemp(), 'metrics')
+    script = f"""
+import sys
+sys.modules['fcntl'] = None  # as on Windows
+from flask import Flask
+from config import Config
+Config.METRICS_DIR = {directory!r}
+import metrics
+app = Flask(__name__)
+metrics.init_metrics(app)
+app.add_url_rule('/ping', 'ping', lambda: 'pong')
+client = app.test_client()
+client.get('/ping')
+print(client.get('/metrics').get_data(as_text=True))
+"""
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert 'http_requests_total{endpoint="ping",method="GET",status="200"} 1' in result.stdout
+    assert not os.path.exists(directory)
+    print("✓ In-process metrics without snapshots")
+
+def main():
+    """Run all tests"""
+    print("Metrics - Test Suite")
+    print("=" * 40)
+
+    test_exposition()
+    test_merge_across_workers()
+    test_token_and_overhead()
+    test_without_fcntl()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
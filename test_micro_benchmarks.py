@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the micro-benchmark suite
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from config import Config
+
+# Importing app creates its tables in the configured database, so point it at a scratch one
+saved_database, Config.DATABASE_PATH = Config.DATABASE_PATH, os.path.join(tempfile.mkdtemp(), 'test.db')
+from app import build_browse_query, cart_total
+Config.DATABASE_PATH = saved_database
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from micro_benchmarks import compare, mann_whitney_p
+
+def test_extracted_helpers():
+    """The browse query builder and cart total behave as they did inline"""
+    print("Testing browse query and cart total...")
+    query, params = build_browse_query('jewelry', 'silver', 'price_low')
+    assert query.rstrip().endswith('ORDER BY p.price ASC')
+    assert params == ['jewelry', '%silver%', '%silver%']
+    query, params = build_browse_query()
+    assert 'p.category = ?' not in query and params == []
+    assert cart_total([(1, 2, 7, 'Vase', '', 10.5), (2, 1, 8, 'Ring', '', 4.0)]) == 25.0
+    assert cart_total([]) == 0
+    print("✓ Query, parameters and total match")
+
+def test_regression_statistics():
+    """A clear slowdown is significant; resampled noise is not"""
+    print("\nTesting regression statistics...")
+    rng = random.Random(7)
+    before = [100 + rng.gauss(0, 5) for _ in range(20)]
+    same = [100 + rng.gauss(0, 5) for _ in range(20)]
+    slower = [130 + rng.gauss(0, 5) for _ in range(20)]
+    assert mann_whitney_p(before, slower) < 0.001
+    assert mann_whitney_p(slower, before) > 0.99
+    assert mann_whitney_p(before, same) > 0.01
+    assert mann_whitney_p([1.0] * 5, [1.0] * 5) == 1.0
+
+    def run(samples):
+        median = sorted(samples)[len(samples) // 2]
+        return {'sizes': {'tiny': {'cart_total': {'median_us': median, 'samples_us': samples}}}}
+
+    (row,) = compare(run(slower), run(before), alpha=0.01, threshold=0.10)
+    assert row[-1] == 'REGRESSION'
+    (row,) = compare(run(same), run(before), alpha=0.01, threshold=0.10)
+    assert row[-1] == ''
+    (row,) = compare(run(before), run(slower), alpha=0.01, threshold=0.10)
+    assert row[-1] == 'faster'
+    print("✓ Slowdowns flagged, noise ignored")
+
+def test_history_and_baseline():
+    """Runs append to the history; a later run is compared with the saved baseline"""
+    print("\nTesting history and baseline...")
+    workdir = tempfile.mkdtemp()
+    history, baseline = os.path.join(workdir, 'history.jsonl'), os.path.join(workdir, 'baseline.json')
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'micro_benchmarks.py'),
+               '--sizes', 'tiny', '--processes', '1', '--samples', '3', '--min-time', '0.001',
+               '--data-dir', workdir, '--history', history, '--baseline', baseline,
+               '--benchmarks', 'browse_search', 'chatbot_search', 'cart_total']
+    first = subprocess.run(command + ['--save-baseline'], cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert first.returncode == 0, first.stdout + first.stderr
+    # A threshold high enough that the check can't fail on a noisy machine
+    second = subprocess.run(command + ['--threshold', '100'], cwd=ROOT, capture_output=True, text=True,
+                            timeout=300)
+    assert second.returncode == 0, second.stdout + second.stderr
+    assert 'Against baseline' in second.stdout
+
+    with open(history) as f:
+        runs = [json.loads(line) for line in f]
+    assert len(runs) == 2
+    stats = runs[1]['sizes']['tiny']['chatbot_search']
+    assert len(stats['samples_us']) == 3 and stats['median_us'] > 0
+    assert runs[1]['regressions'] == []
+    with open(baseline) as f:
+        assert json.load(f)['timestamp'] == runs[0]['timestamp']
+    print("✓ Two runs recorded, second compared with the first")
+
+def main():
+    """Run all tests"""
+    print("Micro-benchmarks - Test Suite")
+    print("=" * 40)
+
+    test_extracted_helpers()
+    test_regression_statistics()
+    test_history_and_baseline()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
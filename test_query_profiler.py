@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the slow-query log
+"""
+
+import os
+import tempfile
+import time
+from flask import Flask
+from config import Config
+from db import connect_db, query_observers
+from query_profiler import QueryProfiler, bind_shape, init_query_log_tables
+
+def make_app(profiler):
+    """App whose /items route runs one query per item (an N+1)"""
+    app = Flask(__name__)
+    app.before_request(profiler.start_request)
+    app.teardown_request(profiler.finish_request)
+
+    @app.route('/items')
+    def items():
+        conn = connect_db()
+        ids = [row[0] for row in conn.execute('SELECT id FROM items WHERE price > ?', (1.5,)).fetchall()]
+        names = [conn.execute('SELECT name FROM items WHERE id = ?', (item_id,)).fetchone()[0] for item_id in ids]
+        conn.close()
+        return ','.join(names)
+
+    return app
+
+def with_database(test):
+    """Run a test against a fresh database holding the log and an items table"""
+    def run():
+        saved = Config.DATABASE_PATH
+        Config.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+        conn = connect_db()
+        init_query_log_tables(conn.cursor())
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)')
+        conn.executemany('INSERT INTO items (name, price) VALUES (?, ?)', [(f'item{i}', i) for i in range(5)])
+        conn.commit()
+        conn.close()
+        try:
+            test()
+        finally:
+            Config.DATABASE_PATH = saved
+    run.__name__ = test.__name__
+    return run
+
+@with_database
+def test_slow_and_n_plus_one():
+    """Slow statements get their plan; repeated statements are an N+1"""
+    print("Testing slow queries and N+1...")
+    profiler = QueryProfiler(sample_rate=1.0, slow_ms=0, n_plus_one_threshold=3)
+    query_observers.append(profiler.observe)
+    try:
+        client = make_app(profiler).test_client()
+        assert client.get('/items').data == b'item2,item3,item4'
+        client.get('/items')
+    finally:
+        query_observers.remove(profiler.observe)
+
+    entries = {(entry['kind'], entry['statement']): entry for entry in profiler.report()}
+    n_plus_one = entries[('n_plus_one', 'SELECT name FROM items WHERE id = ?')]
+    assert n_plus_one['endpoint'] == 'items'
+    assert n_plus_one['occurrences'] == 2 and n_plus_one['max_repeats'] == 3
+    assert n_plus_one['bind_shape'] == '(int)'
+
+    slow = entries[('slow', 'SELECT id FROM items WHERE price > ?')]
+    assert slow['occurrences'] == 2 and slow['bind_shape'] == '(float)'
+    assert slow['query_plan'] == 'SCAN items'
+    lookup = entries[('slow', 'SELECT name FROM items WHERE id = ?')]
+    assert 'USING INTEGER PRIMARY KEY' in lookup['query_plan']
+    print("✓ Plans captured and N+1 flagged")
+
+@with_database
+def test_sampling_and_retention():
+    """Unsampled requests cost nothing; the log keeps the newest entries"""
+    print("\nTesting sampling and retention...")
+    profiler = QueryProfiler(sample_rate=0.0, slow_ms=0, n_plus_one_threshold=3)
+    query_observers.append(profiler.observe)
+    try:
+        make_app(profiler).test_client().get('/items')
+    finally:
+        query_observers.remove(profiler.observe)
+    assert profiler.report() == []
+
+    profiler.record([('slow', 'old', 'SELECT 1', '()', 5.0, 5.0, 1, None)])
+    conn = connect_db()
+    conn.execute("UPDATE query_log SET last_seen = '2000-01-01 00:00:00'")
+    conn.commit()
+    conn.close()
+    saved = Config.QUERY_LOG_MAX_ENTRIES
+    Config.QUERY_LOG_MAX_ENTRIES = 2
+    try:
+        profiler.record([('slow', f'endpoint{i}', 'SELECT 1', '()', 5.0, 5.0, 1, None) for i in range(3)])
+        endpoints = [entry['endpoint'] for entry in profiler.report()]
+        assert len(endpoints) == 2 and 'old' not in endpoints
+    finally:
+        Config.QUERY_LOG_MAX_ENTRIES = saved
+
+    assert bind_shape(None) == 'executemany'
+    assert bind_shape({'id': 1, 'name': 'x'}) == '{id: int, name: str}'
+    print("✓ Sampling respected and old entries pruned")
+
+@with_database
+def test_utc_timestamps():
+    """Entries are stamped and expired in UTC whatever the server's timezone"""
+    print("\nTesting timestamps away from UTC...")
+    saved_tz = os.environ.get('TZ')
+    os.environ['TZ'] = 'Etc/GMT-14'  # UTC+14
+    time.tzset()
+    try:
+        profiler = QueryProfiler(sample_rate=1.0, slow_ms=0, n_plus_one_threshold=3)
+        profiler.record([('slow', 'recent', 'SELECT 1', '()', 5.0, 5.0, 1, None)])
+        profiler.record([('slow', 'recent', 'SELECT 1', '()', 5.0, 5.0, 1, None)])
+        conn = connect_db()
+        (drift,) = conn.execute("SELECT ABS(julianday(last_seen) - julianday('now')) * 86400 "
+                                "FROM query_log").fetchone()
+        assert drift < 60, drift
+
+        # Just inside the retention window in UTC
+        conn.execute("UPDATE query_log SET last_seen = datetime('now', ?, '+2 hours')",
+                     (f'-{Config.QUERY_LOG_RETENTION_DAYS} days',))
+        conn.commit()
+        conn.close()
+        assert [entry['endpoint'] for entry in profiler.report()] == ['recent']
+    finally:
+        if saved_tz is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = saved_tz
+        time.tzset()
+    print("✓ Last seen matches UTC and retention uses it")
+
+def main():
+    """Run all tests"""
+    print("Query Profiler - Test Suite")
+    print("=" * 40)
+
+    test_slow_and_n_plus_one()
+    test_sampling_and_retention()
+    test_utc_timestamps()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for token-bucket rate limiting
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from flask import Flask, jsonify
+from rate_limiter import RateLimiter
+
+def make_limiter(limits):
+    db_path = os.path.join(tempfile.mkdtemp(), 'limits.db')
+    return RateLimiter(db_path=db_path, limits=limits, ip_multiplier=2, enabled=True)
+
+def test_bucket_refills_over_time():
+    """Tokens run out after the burst and come back at the refill rate"""
+    print("Testing token bucket...")
+    limiter = make_limiter({})
+    bucket = [('test:key', 2, 10.0)]
+
+    assert limiter.consume(bucket) == (True, 0.0)
+    assert limiter.consume(bucket) == (True, 0.0)
+    allowed, retry_after = limiter.consume(bucket)
+    assert not allowed
+    assert 0 < retry_after <= 5.0
+    print("✓ Bucket exhausted with retry hint")
+
+def test_route_returns_429():
+    """Limited routes answer 429 with Retry-After; other routes are untouched"""
+    print("\nTesting limited route...")
+    limiter = make_limiter({'story': (2, 60.0)})
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/story')
+    @limiter.limit('story')
+    def story():
+        return jsonify({'success': True})
+
+    @app.route('/browse')
+    def browse():
+        return jsonify({'success': True})
+
+    # Guests are only charged to the per-IP bucket (2 x 2 tokens)
+    client = app.test_client()
+    for _ in range(4):
+        assert client.get('/story').status_code == 200
+
+    response = client.get('/story')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['success'] is False
+
+    assert client.get('/browse').status_code == 200
+    print("✓ 429 returned once the limit is hit")
+
+def test_ip_limit_shared_across_sessions():
+    """Logged-in users get their own bucket but share the per-IP one"""
+    print("\nTesting per-session and per-IP buckets...")
+    limiter = make_limiter({'chat': (1, 60.0)})
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/chat')
+    @limiter.limit('chat')
+    def chat():
+        return jsonify({'success': True})
+
+    statuses = []
+    for user_id in (1, 2, 3):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['user_type'] = 'buyer'
+        statuses.append(client.get('/chat').status_code)
+        statuses.append(client.get('/chat').status_code)
+
+    # Each user gets one request; the IP bucket (1 x 2) stops the third user
+    assert statuses == [200, 429, 200, 429, 429, 429]
+    print("✓ Session and IP buckets enforced together")
+
+# 50 concurrent greenlets under gevent's monkey patching, as in a gunicorn gevent worker
+GREENLET_SCRIPT = """
+from gevent import monkey; monkey.patch_all()
+import sqlite3, sys, gevent
+import rate_limiter
+connects, real_connect = [], sqlite3.connect
+def connect(*args, **kwargs):
+    connects.append(args)
+    return real_connect(*args, **kwargs)
+sqlite3.connect = connect
+limiter = rate_limiter.RateLimiter(db_path=sys.argv[1], limits={}, enabled=True)
+jobs = [gevent.spawn(limiter.consume, [('chat:ip:1', 30, 60.0)]) for _ in range(50)]
+gevent.joinall(jobs, raise_error=True)
+print(len(connects), sum(job.value[0] for job in jobs))
+"""
+
+def test_one_connection_per_process():
+    """Concurrent greenlets share the process's connection instead of opening one each"""
+    print("\nTesting connection reuse under gevent...")
+    db_path = os.path.join(tempfile.mkdtemp(), 'limits.db')
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', GREENLET_SCRIPT, db_path], cwd=root,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stdout + result.stderr
+    connects, allowed = map(int, result.stdout.split())
+    assert connects == 1 and allowed == 30
+    print(f"✓ {connects} connection for 50 greenlets, {allowed} of 50 allowed")
+
+def main():
+    """Run all tests"""
+    print("Rate Limiter - Test Suite")
+    print("=" * 40)
+
+    test_bucket_refills_over_time()
+    test_route_returns_429()
+    test_ip_limit_shared_across_sessions()
+    test_one_connection_per_process()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the chatbot product search index
+"""
+
+import os
+import sqlite3
+import tempfile
+from search_index import ProductSearchIndex, analyze
+
+def make_catalog():
+    """Small catalog in a temporary database"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'search.db')
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE artisans (id INTEGER PRIMARY KEY, name TEXT)')
+    cursor.execute('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY, artisan_id INTEGER, name TEXT, description TEXT,
+                               category TEXT, price REAL, image_path TEXT)
+    ''')
+    cursor.execute("INSERT INTO artisans VALUES (1, 'Maria Garcia')")
+    cursor.executemany('INSERT INTO products VALUES (?, 1, ?, ?, ?, ?, NULL)', [
+        (1, 'Blue Ceramic Vase', 'Hand-painted blue vase in the Spanish style', 'pottery', 500.0),
+        (2, 'Terracotta Pots', 'Set of three plain clay pots', 'pottery', 300.0),
+        (3, 'Silk Scarf', 'Blue silk scarf with hand-dyed patterns', 'textile', 900.0)
+    ])
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_analyze_drops_filler_and_stems():
+    """Chat filler is dropped and word forms share a term"""
+    print("Testing query analysis...")
+
+    assert analyze('show me blue pottery please') == ['blu', 'pottery']
+    assert analyze('vases') == analyze('vase')
+    assert analyze('painted') == analyze('painting')
+    print("✓ Stopwords removed and terms stemmed")
+
+def test_ranked_search():
+    """Matches are ranked instead of requiring every word"""
+    print("\nTesting ranked search...")
+    index = ProductSearchIndex(db_path=make_catalog())
+
+    results = index.search('show me blue pottery please')
+    assert [row[0] for score, row in results] == [1, 2, 3]
+    assert results[0][0] > results[1][0] > 0
+
+    assert index.search('silk')[0][1][1] == 'Silk Scarf'
+    assert index.search('submarine') == []
+    print("✓ Products ranked by BM25 score")
+
+def test_incremental_refresh():
+    """New and deleted products are picked up on refresh"""
+    print("\nTesting incremental refresh...")
+    db_path = make_catalog()
+    index = ProductSearchIndex(db_path=db_path, refresh_interval=3600)
+    assert len(index.search('pottery')) == 2
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO products VALUES (4, 1, 'Pottery Bowl', 'Glazed bowl', 'pottery', 200.0, NULL)")
+    conn.execute('DELETE FROM products WHERE id = 1')
+    conn.commit()
+    conn.close()
+
+    assert len(index.search('pottery')) == 2
+    index.refresh(force=True)
+    assert sorted(row[0] for score, row in index.search('pottery')) == [2, 4]
+    print("✓ Index refreshed incrementally")
+
+def main():
+    """Run all tests"""
+    print("Product Search Index - Test Suite")
+    print("=" * 40)
+
+    test_analyze_drops_filler_and_stems()
+    test_ranked_search()
+    test_incremental_refresh()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
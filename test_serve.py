@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for server sizing and fork safety
+"""
+
+import os
+from serve import tuned_settings
+from chat_executor import ChatExecutor
+from chatbot_service import ChatbotService
+
+def test_worker_sizing():
+    """Workers and threads follow the worker class and CPU count"""
+    print("Testing worker sizing...")
+    assert tuned_settings('sync', 4) == {'workers': 9, 'threads': 1}
+    assert tuned_settings('gthread', 4) == {'workers': 5, 'threads': 4}
+    assert tuned_settings('gevent', 1) == {'workers': 2, 'threads': 1}
+    # Large machines are capped, explicit values win
+    assert tuned_settings('sync', 32)['workers'] == 12
+    assert tuned_settings('sync', 4, workers=2, threads=3) == {'workers': 2, 'threads': 3}
+    print("✓ Sizing derived from CPUs")
+
+def test_executor_usable_after_fork():
+    """An executor inherited from the master starts a fresh pool"""
+    print("\nTesting executor reset...")
+    executor = ChatExecutor(max_workers=2, max_queue=4, queue_wait_budget=5, response_timeout=5)
+    assert executor.run(lambda: 'parent', fallback=lambda: 'fallback') == 'parent'
+    inherited = executor._executor
+
+    executor.reset_after_fork()
+    assert executor._executor is None
+    assert executor.run(lambda: 'child', fallback=lambda: 'fallback') == 'child'
+    assert executor._executor is not inherited
+    inherited.shutdown()
+    print("✓ Fresh pool after fork")
+
+def test_gemini_configured_lazily():
+    """No client is created until a worker first uses the model"""
+    print("\nTesting lazy Gemini setup...")
+    service = ChatbotService()
+    assert service._initialized_pid is None
+    service.model
+    assert service._initialized_pid == os.getpid()
+    print("✓ Gemini set up on first use")
+
+def main():
+    """Run all tests"""
+    print("Server Launcher - Test Suite")
+    print("=" * 40)
+
+    test_worker_sizing()
+    test_executor_usable_after_fork()
+    test_gemini_configured_lazily()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for request tracing
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template_string
+from config import Config
+from db import connect_db
+from tracing import init_tracing, load_traces, make_collector, propagate, traced
+
+@traced('lookup')
+def lookup():
+    conn = connect_db(':memory:')
+    value = conn.execute('SELECT 41 + 1').fetchone()[0]
+    conn.close()
+    return value
+
+def make_app():
+    """App whose route runs SQL, a traced call on a pool thread and a render"""
+    app = Flask(__name__)
+    init_tracing(app)
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    @app.route('/page')
+    def page():
+        value = pool.submit(propagate(lookup)).result()
+        return render_template_string('<p>{{ value }}</p>', value=value)
+
+    return app
+
+def traced_requests(*headers, exporter='jsonl', sample_rate=1.0, trust_parent=False):
+    """Run /page once per header set and return the exported traces (one request is sampled)"""
+    saved = (Config.TRACE_SAMPLE_RATE, Config.TRACE_FILE, Config.TRACE_EXPORTER,
+             Config.TRACE_OTLP_ENDPOINT, Config.TRACE_EXPORT_INTERVAL, Config.TRACE_TRUST_PARENT)
+    Config.TRACE_SAMPLE_RATE, Config.TRACE_EXPORT_INTERVAL, Config.TRACE_EXPORTER = sample_rate, 0.0, exporter
+    Config.TRACE_TRUST_PARENT = trust_parent
+    Config.TRACE_FILE = os.path.join(tempfile.mkdtemp(), 'traces.jsonl')
+    collector = None
+    if exporter == 'otlp':
+        collector = make_collector('127.0.0.1', 0, Config.TRACE_FILE)
+        threading.Thread(target=collector.serve_forever, daemon=True).start()
+        Config.TRACE_OTLP_ENDPOINT = f'http://127.0.0.1:{collector.server_address[1]}/v1/traces'
+    try:
+        client = make_app().test_client()
+        responses = [client.get('/page', headers=h) for h in headers]
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            traces = load_traces(Config.TRACE_FILE) if os.path.exists(Config.TRACE_FILE) else {}
+            if traces:  # a trace's spans are exported in one write
+                break
+            time.sleep(0.05)
+        return responses, traces
+    finally:
+        if collector is not None:
+            collector.shutdown()
+        (Config.TRACE_SAMPLE_RATE, Config.TRACE_FILE, Config.TRACE_EXPORTER,
+         Config.TRACE_OTLP_ENDPOINT, Config.TRACE_EXPORT_INTERVAL, Config.TRACE_TRUST_PARENT) = saved
+
+def test_span_tree():
+    """SQL, traced calls on other threads and renders nest under the request"""
+    print("Testing span tree...")
+    responses, traces = traced_requests({})
+    assert responses[0].data == b'<p>42</p>'
+    (trace_id, spans), = traces.items()
+    assert responses[0].headers['traceparent'].startswith(f'00-{trace_id}-')
+
+    by_name = {s['name']: s for s in spans}
+    root = by_name['GET page']
+    assert root['kind'] == 'server' and root['attributes']['http.status_code'] == 200
+    job = by_name['executor.job']
+    assert job['parent_span_id'] == root['span_id']
+    assert by_name['lookup']['parent_span_id'] == job['span_id']
+    assert by_name['sqlite']['parent_span_id'] == by_name['lookup']['span_id']
+    assert by_name['sqlite']['attributes']['db.statement'] == 'SELECT 41 + 1'
+    render = next(s for s in spans if s['name'].startswith('render'))
+    assert render['parent_span_id'] == root['span_id']
+    print("✓ Request, executor, SQL and render spans linked")
+
+def test_traceparent_and_otlp():
+    """A trusted traceparent decides sampling; spans survive an OTLP round trip"""
+    print("\nTesting traceparent and OTLP export...")
+    caller_trace, caller_span = 'ab' * 16, 'cd' * 8
+    responses, traces = traced_requests({'traceparent': f'00-{caller_trace}-{caller_span}-00'},
+                                        {'traceparent': f'00-{caller_trace}-{caller_span}-01'},
+                                        exporter='otlp', trust_parent=True)
+    assert 'traceparent' not in responses[0].headers
+    assert list(traces) == [caller_trace]
+    root = next(s for s in traces[caller_trace] if s['kind'] == 'server')
+    assert root['parent_span_id'] == caller_span and root['name'] == 'GET page'
+    assert any(s['attributes'].get('db.statement') == 'SELECT 41 + 1' for s in traces[caller_trace])
+    print("✓ Caller's sampling decision kept, collector received the spans")
+
+def test_untrusted_traceparent():
+    """By default a caller can't force sampling, but a sampled request joins its trace"""
+    print("\nTesting untrusted traceparent...")
+    caller_trace, caller_span = 'ef' * 16, '12' * 8
+    responses, traces = traced_requests({'traceparent': f'00-{caller_trace}-{caller_span}-01'},
+                                        sample_rate=1e-9)
+    assert 'traceparent' not in responses[0].headers and traces == {}
+
+    responses, traces = traced_requests({'traceparent': f'00-{caller_trace}-{caller_span}-00'})
+    assert list(traces) == [caller_trace]
+    root = next(s for s in traces[caller_trace] if s['kind'] == 'server')
+    assert root['parent_span_id'] == caller_span
+    print("✓ Local sample rate applied, caller's trace id kept")
+
+def main():
+    """Run all tests"""
+    print("Tracing - Test Suite")
+    print("=" * 40)
+
+    test_span_tree()
+    test_traceparent_and_otlp()
+    test_untrusted_traceparent()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for cache-friendly upload serving
+"""
+
+import hashlib
+import os
+import tempfile
+from flask import Flask
+from config import Config
+from upload_serving import file_fingerprint, fingerprint_cache_info, send_upload, upload_url
+
+def with_uploads(test):
+    """Run a test with a temporary upload folder holding pots/vase.jpg and a hidden staging file"""
+    def run():
+        saved = Config.UPLOAD_FOLDER, Config.UPLOAD_SENDFILE_MODE
+        Config.UPLOAD_FOLDER = tempfile.mkdtemp()
+        os.makedirs(os.path.join(Config.UPLOAD_FOLDER, 'pots'))
+        os.makedirs(os.path.join(Config.UPLOAD_FOLDER, '.tmp'))
+        with open(os.path.join(Config.UPLOAD_FOLDER, 'pots', 'vase.jpg'), 'wb') as f:
+            f.write(b'vase photo ' * 100)
+        with open(os.path.join(Config.UPLOAD_FOLDER, '.tmp', 'upload.jpg'), 'wb') as f:
+            f.write(b'half written')
+        try:
+            test()
+        finally:
+            Config.UPLOAD_FOLDER, Config.UPLOAD_SENDFILE_MODE = saved
+    run.__name__ = test.__name__
+    return run
+
+def make_client(x_sendfile=False):
+    app = Flask(__name__)
+    app.config['USE_X_SENDFILE'] = x_sendfile
+    app.add_url_rule('/static/uploads/<path:filename>', 'uploaded_file', send_upload)
+    return app, app.test_client()
+
+@with_uploads
+def test_cache_headers():
+    """Fingerprinted URLs are immutable for a year; stale or missing fingerprints revalidate"""
+    print("Testing cache headers...")
+    app, client = make_client()
+    fingerprint = file_fingerprint(os.path.join(Config.UPLOAD_FOLDER, 'pots', 'vase.jpg'))
+    with app.test_request_context():
+        url = upload_url('pots/vase.jpg')
+    assert url == f'/static/uploads/pots/vase.jpg?v={fingerprint}'
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.data == b'vase photo ' * 100
+    cache_control = response.cache_control
+    assert cache_control.public and cache_control.immutable
+    assert cache_control.max_age == Config.UPLOAD_CACHE_MAX_AGE
+    assert not cache_control.no_cache and 'no-cache' not in response.headers['Cache-Control']
+    assert response.get_etag() == (fingerprint, False)
+
+    for stale in ('/static/uploads/pots/vase.jpg?v=0000000000000000', '/static/uploads/pots/vase.jpg'):
+        response = client.get(stale)
+        assert response.status_code == 200
+        assert response.cache_control.max_age == 0 and response.cache_control.must_revalidate
+        assert not response.cache_control.immutable
+    print("✓ Immutable with ?v=<fingerprint>, must-revalidate otherwise")
+
+@with_uploads
+def test_conditional_and_range():
+    """If-None-Match answers 304 and Range answers 206"""
+    print("\nTesting conditional and range requests...")
+    _, client = make_client()
+    fingerprint = file_fingerprint(os.path.join(Config.UPLOAD_FOLDER, 'pots', 'vase.jpg'))
+
+    response = client.get('/static/uploads/pots/vase.jpg', headers={'If-None-Match': f'"{fingerprint}"'})
+    assert response.status_code == 304 and response.data == b''
+
+    response = client.get('/static/uploads/pots/vase.jpg', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206 and response.data == b'vase photo'
+    assert response.headers['Content-Range'] == 'bytes 0-9/1100'
+    print("✓ 304 and 206 answered")
+
+@with_uploads
+def test_proxy_handoff():
+    """X-Sendfile and X-Accel-Redirect leave the bytes to the front proxy"""
+    print("\nTesting proxy hand-off...")
+    _, client = make_client(x_sendfile=True)
+    response = client.get('/static/uploads/pots/vase.jpg')
+    assert response.headers['X-Sendfile'] == os.path.abspath(os.path.join(Config.UPLOAD_FOLDER, 'pots', 'vase.jpg'))
+    assert response.data == b''
+
+    Config.UPLOAD_SENDFILE_MODE = 'x-accel'
+    _, client = make_client()
+    response = client.get('/static/uploads/pots/vase.jpg')
+    assert response.status_code == 200 and response.data == b''
+    assert response.headers['X-Accel-Redirect'] == Config.UPLOAD_ACCEL_PREFIX + 'pots/vase.jpg'
+    assert response.mimetype == 'image/jpeg'
+    fingerprint = file_fingerprint(os.path.join(Config.UPLOAD_FOLDER, 'pots', 'vase.jpg'))
+    response = client.get('/static/uploads/pots/vase.jpg', headers={'If-None-Match': f'"{fingerprint}"'})
+    assert response.status_code == 304 and 'X-Accel-Redirect' not in response.headers
+    print("✓ X-Sendfile and X-Accel-Redirect headers set")
+
+@with_uploads
+def test_hidden_and_traversal():
+    """Hidden files, traversal and missing files are 404"""
+    print("\nTesting hidden and traversal names...")
+    _, client = make_client()
+    for path in ('.tmp/upload.jpg', 'pots/.hidden.jpg', '../config.py', 'pots/../../config.py',
+                 'pots/missing.jpg', 'pots'):
+        assert client.get('/static/uploads/' + path).status_code == 404, path
+    print("✓ Hidden, traversal and missing names refused")
+
+@with_uploads
+def test_store_paths_fingerprinted_by_name():
+    """Store originals and variants take their fingerprint from the name, without reading the file"""
+    print("\nTesting content-addressed fingerprints...")
+    app, client = make_client()
+    data = b'mug photo ' * 100
+    sha = hashlib.sha256(data).hexdigest()
+    original, variant = f'{sha[:2]}/{sha[2:4]}/{sha}.jpg', f'{sha[:2]}/{sha[2:4]}/{sha}_320w.webp'
+
+    misses = fingerprint_cache_info().misses
+    with app.test_request_context():
+        # Rendering doesn't need the files at all
+        assert upload_url(variant) == f'/static/uploads/{variant}?v={sha[:16]}'
+        os.makedirs(os.path.join(Config.UPLOAD_FOLDER, sha[:2], sha[2:4]))
+        for name in (original, variant):
+            with open(os.path.join(Config.UPLOAD_FOLDER, name), 'wb') as f:
+                f.write(data)
+        url = upload_url(original)
+    assert url == f'/static/uploads/{original}?v={sha[:16]}'
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.cache_control.immutable
+    assert response.get_etag() == (sha[:16], False)
+    assert client.get(f'/static/uploads/{variant}?v={sha[:16]}').cache_control.immutable
+    assert fingerprint_cache_info().misses == misses
+    # The same fingerprint hashing the original gives
+    assert file_fingerprint(os.path.join(Config.UPLOAD_FOLDER, original)) == sha[:16]
+    print("✓ Fingerprint read from the content address")
+
+def main():
+    """Run all tests"""
+    print("Upload Serving - Test Suite")
+    print("=" * 40)
+
+    test_cache_headers()
+    test_conditional_and_range()
+    test_proxy_handoff()
+    test_hidden_and_traversal()
+    test_store_paths_fingerprinted_by_name()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
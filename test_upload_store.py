@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed upload store
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from PIL import Image
+from config import Config
+
+# The image worker and app bind the configured database when imported, so point them at a scratch one
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+saved_database, Config.DATABASE_PATH = Config.DATABASE_PATH, DATABASE_PATH
+from image_pipeline import init_image_tables, process_image
+from upload_store import UploadStore, init_upload_tables
+Config.DATABASE_PATH = saved_database
+
+def make_store():
+    """Store and database in a temporary directory"""
+    folder = tempfile.mkdtemp()
+    conn = sqlite3.connect(os.path.join(folder, 'store.db'))
+    cursor = conn.cursor()
+    init_image_tables(cursor)
+    init_upload_tables(cursor)
+    return UploadStore(upload_folder=os.path.join(folder, 'uploads')), conn, cursor
+
+def test_sharded_content_address():
+    """Uploads are stored under their SHA-256 in sharded directories"""
+    print("Testing content addressing...")
+    store, conn, cursor = make_store()
+    data = b'clay pot photo' * 1000
+    sha = hashlib.sha256(data).hexdigest()
+
+    staged = store.stage(io.BytesIO(data), 'Pot.JPEG')
+    assert staged.sha256 == sha and staged.size == len(data)
+
+    path, is_new = store.commit(cursor, staged)
+    conn.commit()
+    assert is_new
+    assert path == f'{sha[:2]}/{sha[2:4]}/{sha}.jpeg'
+    with open(os.path.join(store.upload_folder, path), 'rb') as f:
+        assert f.read() == data
+    assert os.listdir(store.temp_folder) == []
+    print("✓ Upload stored at", path)
+
+def test_deduplication_and_gc():
+    """Identical uploads share a file that is deleted with its last reference"""
+    print("\nTesting deduplication and garbage collection...")
+    store, conn, cursor = make_store()
+    data = b'keychain photo'
+
+    first, first_new = store.commit(cursor, store.stage(io.BytesIO(data), 'Keychain.jpg'))
+    second, second_new = store.commit(cursor, store.stage(io.BytesIO(data), '20250920_Keychain.jpg'))
+    assert first == second and first_new and not second_new
+    cursor.execute('SELECT refcount FROM upload_blobs WHERE path = ?', (first,))
+    assert cursor.fetchone()[0] == 2
+
+    # A variant written by the image pipeline goes with the original
+    variant = first.rsplit('.', 1)[0] + '_160w.webp'
+    open(os.path.join(store.upload_folder, variant), 'wb').close()
+    cursor.execute("INSERT INTO images (filename, width, height) VALUES (?, 160, 160)", (first,))
+    cursor.execute("INSERT INTO image_variants (filename, width, height, format, variant) "
+                   "VALUES (?, 160, 160, 'webp', ?)", (first, variant))
+
+    assert not store.release(cursor, first)
+    assert os.path.exists(os.path.join(store.upload_folder, first))
+    assert store.release(cursor, first)
+    conn.commit()
+    assert not os.path.exists(os.path.join(store.upload_folder, first))
+    assert not os.path.exists(os.path.join(store.upload_folder, variant))
+    cursor.execute('SELECT COUNT(*) FROM image_variants')
+    assert cursor.fetchone()[0] == 0
+    print("✓ Shared file kept until its last reference was released")
+
+def test_legacy_paths_untouched():
+    """Releasing a flat legacy upload leaves the file alone"""
+    print("\nTesting legacy uploads...")
+    store, conn, cursor = make_store()
+    os.makedirs(store.upload_folder)
+    legacy = os.path.join(store.upload_folder, 'Pot.jpeg')
+    open(legacy, 'wb').close()
+
+    assert not store.release(cursor, 'Pot.jpeg')
+    assert not store.release(cursor, None)
+    assert os.path.exists(legacy)
+    print("✓ Legacy file kept")
+
+def test_metadata_stripped_before_hashing():
+    """EXIF uploads are stored upright and clean, under the hash of what is on disk"""
+    print("\nTesting EXIF stripping...")
+    store, conn, cursor = make_store()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90° clockwise to display
+    exif[0x010F] = 'Phone maker'
+    buffer = io.BytesIO()
+    Image.new('RGB', (80, 40), (200, 120, 40)).save(buffer, 'JPEG', exif=exif)
+    original = buffer.getvalue()
+
+    staged = store.stage(io.BytesIO(original), 'photo.jpg')
+    assert staged.sha256 != hashlib.sha256(original).hexdigest()
+    path, is_new = store.commit(cursor, staged)
+    full_path = os.path.join(store.upload_folder, path)
+    with open(full_path, 'rb') as f:
+        stored = f.read()
+    assert hashlib.sha256(stored).hexdigest() == staged.sha256 and len(stored) == staged.size
+    with Image.open(full_path) as image:
+        assert image.size == (40, 80) and 'exif' not in image.info
+
+    # The same original again is a duplicate; variants don't touch the master
+    assert store.commit(cursor, store.stage(io.BytesIO(original), 'photo.jpg')) == (path, False)
+    process_image(path, store.upload_folder)
+    with open(full_path, 'rb') as f:
+        assert f.read() == stored
+    print("✓ Stored", path, "matches its content address")
+
+def test_failed_uploads_leave_no_temp_files():
+    """add_product validates before staging and discards the upload when it fails"""
+    print("\nTesting failed product uploads...")
+    saved_database, Config.DATABASE_PATH = Config.DATABASE_PATH, DATABASE_PATH
+    import app as app_module
+    from upload_store import upload_store
+    app_module.init_db()  # in case app was already imported against another database
+    saved = upload_store.upload_folder, upload_store.temp_folder, app_module.generate_ai_story
+    folder = tempfile.mkdtemp()
+    upload_store.upload_folder, upload_store.temp_folder = folder, os.path.join(folder, '.tmp')
+
+    def failing_story(*args):
+        raise RuntimeError('upstream down')
+
+    try:
+        client = app_module.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+            session['user_type'] = 'artisan'
+        form = {'name': 'Vase', 'description': 'Blue vase', 'category': 'pottery', 'price': 'cheap'}
+
+        response = client.post('/add_product', data=dict(form, image=(io.BytesIO(b'photo'), 'vase.jpg')))
+        assert response.get_json() == {'success': False, 'message': 'Invalid product details'}
+        assert not os.path.exists(upload_store.temp_folder) or os.listdir(upload_store.temp_folder) == []
+
+        app_module.generate_ai_story = failing_story
+        form['price'] = '450'
+        response = client.post('/add_product', data=dict(form, image=(io.BytesIO(b'photo'), 'vase.jpg')))
+        assert response.status_code == 500
+        assert os.listdir(upload_store.temp_folder) == []
+    finally:
+        upload_store.upload_folder, upload_store.temp_folder, app_module.generate_ai_story = saved
+        Config.DATABASE_PATH = saved_database
+
+    store, _, _ = make_store()
+    os.makedirs(store.temp_folder)
+    for name, age in (('old', 2 * 3600), ('recent', 60)):
+        path = os.path.join(store.temp_folder, name)
+        open(path, 'wb').close()
+        os.utime(path, (time.time() - age, time.time() - age))
+    assert store.purge_stale_temp_files() == 1
+    assert os.listdir(store.temp_folder) == ['recent']
+    print("✓ Invalid and failed uploads cleaned up, stale temp files purged")
+
+def main():
+    """Run all tests"""
+    print("Upload Store - Test Suite")
+    print("=" * 40)
+
+    test_sharded_content_address()
+    test_deduplication_and_gc()
+    test_legacy_paths_untouched()
+    test_metadata_stripped_before_hashing()
+    test_failed_uploads_leave_no_temp_files()
+
+    print("\n" + "=" * 40)
+    print("Test completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Request tracing
+A sampled request gets a trace: a span for the request with child spans
+for every SQL statement, GCPServices and ChatbotService call, upstream API
+call and Jinja render, including work handed to the chat executor. Traces
+are written by a background thread to a JSONL file (TRACE_EXPORTER=jsonl)
+or posted as OTLP/HTTP JSON to a collector (TRACE_EXPORTER=otlp).
+Requests that aren't sampled pay for a header lookup and a random() call.
+
+Sampling follows an incoming W3C traceparent header when there is one,
+otherwise TRACE_SAMPLE_RATE.
+
+    python tracing.py collect [--port 4318]     # OTLP collector stub writing TRACE_FILE
+    python tracing.py show [--slowest 5] [--name buyer_dashboard]
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from flask import before_render_template, request, template_rendered
+from config import Config
+from db import query_observers
+
+SERVER, CLIENT, INTERNAL = 'server', 'client', 'internal'
+OTLP_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List['Span'] = []
+        self.dropped = 0
+        self.exported = False
+        # id(cursor) -> span of the statement it last ran
+        self.statements: Dict[int, 'Span'] = {}
+
+
+class Span:
+    __slots__ = ('trace', 'parent', 'span_id', 'parent_id', 'name', 'kind', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, trace: Trace, parent: Optional['Span'], name: str, kind: str = INTERNAL,
+                 attributes: Dict[str, Any] = None, start: int = None, parent_id: str = None):
+        self.trace = trace
+        self.parent = parent
+        self.span_id = os.urandom(8).hex()
+        # The caller's span for a request that arrived with a traceparent
+        self.parent_id = parent.span_id if parent is not None else parent_id
+        self.name = name
+        self.kind = kind
+        self.start = start or time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def finish(self, end: int = None):
+        self.end = end or time.time_ns()
+        if self.trace.exported:
+            # Outlived its request (an executor job that timed out)
+            exporter.export([self])
+        else:
+            self.trace.spans.append(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_unix_nano': self.start,
+            'end_unix_nano': self.end,
+            'duration_ms': round((self.end - self.start) / 1e6, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+            'pid': os.getpid()
+        }
+
+
+# Innermost open span of this thread (greenlet under gevent)
+_local = threading.local()
+
+
+def current_span() -> Optional[Span]:
+    return getattr(_local, 'span', None)
+
+
+def _child(name: str, kind: str, attributes: Dict, start: int = None) -> Optional[Span]:
+    """New span under the current one, or None when not tracing or over TRACE_MAX_SPANS"""
+    parent = current_span()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if len(trace.spans) >= Config.TRACE_MAX_SPANS:
+        trace.dropped += 1
+        return None
+    return Span(trace, parent, name, kind, attributes, start)
+
+
+@contextmanager
+def span(name: str, kind: str = INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """Child span of the current one; does nothing outside a sampled trace"""
+    child = _child(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+    _local.span = child
+    try:
+        yield child
+    except Exception as e:
+        child.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _local.span = child.parent
+        child.finish()
+
+
+def traced(name: str, kind: str = INTERNAL):
+    """Decorator running a function inside a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_span() is None:
+                return fn(*args, **kwargs)
+            with span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn: Callable, name: str = 'executor.job') -> Callable:
+    """Carry the current trace into a function run on another thread"""
+    parent = current_span()
+    if parent is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        saved = current_span()
+        _local.span = parent
+        try:
+            with span(name, thread=threading.current_thread().name):
+                return fn(*args, **kwargs)
+        finally:
+            _local.span = saved
+    return wrapper
+
+
+# Request, SQL and template hooks
+
+def _start_request():
+    _local.span = None
+    match = TRACEPARENT.match(request.headers.get('traceparent', ''))
+    if match and Config.TRACE_TRUST_PARENT:
+        if not int(match.group(3), 16) & 1:
+            return
+    elif random.random() >= Config.TRACE_SAMPLE_RATE:
+        return
+    # A sampled request joins the caller's trace when there is one
+    if match:
+        trace_id, parent_id = match.group(1), match.group(2)
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+    _local.span = Span(Trace(trace_id), None, request.method, SERVER,
+                       {'http.method': request.method, 'http.target': request.path}, parent_id=parent_id)
+
+
+def _record_response(response):
+    active = current_span()
+    if active is not None:
+        while active.parent is not None:
+            active = active.parent
+        active.attributes['http.status_code'] = response.status_code
+        response.headers['traceparent'] = f'00-{active.trace.trace_id}-{active.span_id}-01'
+    return response
+
+
+def _finish_request(exc):
+    root = current_span()
+    if root is None:
+        return
+    _local.span = None
+    # A template that raised never sent template_rendered; close what's still open
+    while root.parent is not None:
+        root.error = root.error or 'unfinished'
+        root.finish()
+        root = root.parent
+
+    root.name = f'{request.method} {request.endpoint or "unmatched"}'
+    if request.url_rule is not None:
+        root.attributes['http.route'] = request.url_rule.rule
+    if exc is not None:
+        root.error = f'{type(exc).__name__}: {exc}'
+        root.attributes['http.status_code'] = 500
+    if root.trace.dropped:
+        root.attributes['dropped_spans'] = root.trace.dropped
+    root.finish()
+    root.trace.exported = True
+    exporter.export(root.trace.spans)
+
+
+def _observe_query(cursor, sql, parameters, seconds, fetch):
+    parent = current_span()
+    if parent is None:
+        return
+    now = time.time_ns()
+    if fetch:
+        # Rows are stepped through after execute returned; extend its span
+        statement = parent.trace.statements.get(id(cursor))
+        if statement is not None:
+            statement.end = now
+        return
+    statement = _child('sqlite', CLIENT, {'db.system': 'sqlite', 'db.statement': ' '.join(sql.split())},
+                       start=now - int(seconds * 1e9))
+    if statement is not None:
+        statement.finish(now)
+        parent.trace.statements[id(cursor)] = statement
+
+
+def _start_render(sender, template, context, **extra):
+    child = _child(f'render {template.name}', INTERNAL, {'template': template.name})
+    if child is not None:
+        _local.span = child
+
+
+def _end_render(sender, template, context, **extra):
+    active = current_span()
+    if active is not None and active.name == f'render {template.name}':
+        _local.span = active.parent
+        active.finish()
+
+
+# Export
+
+def otlp_payload(spans: List[Dict]) -> Dict:
+    """Spans (as written to the JSONL file) in the OTLP/HTTP JSON encoding"""
+    def value(v):
+        if isinstance(v, bool):
+            return {'boolValue': v}
+        if isinstance(v, int):
+            return {'intValue': str(v)}
+        if isinstance(v, float):
+            return {'doubleValue': v}
+        return {'stringValue': str(v)}
+
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': Config.TRACE_SERVICE_NAME}}]},
+        'scopeSpans': [{
+            'scope': {'name': 'tracing'},
+            'spans': [{
+                'traceId': s['trace_id'],
+                'spanId': s['span_id'],
+                'parentSpanId': s['parent_span_id'] or '',
+                'name': s['name'],
+                'kind': OTLP_KINDS[s['kind']],
+                'startTimeUnixNano': str(s['start_unix_nano']),
+                'endTimeUnixNano': str(s['end_unix_nano']),
+                'attributes': [{'key': k, 'value': value(v)} for k, v in s['attributes'].items() if v is not None]
+                              + [{'key': 'process.pid', 'value': value(s['pid'])}],
+                'status': {'code': 2, 'message': s['error']} if s['error'] else {'code': 1}
+            } for s in spans]
+        }]
+    }]}
+
+
+def from_otlp(payload: Dict) -> Iterator[Dict]:
+    """Back from the OTLP/HTTP JSON encoding to JSONL records"""
+    kinds = {number: name for name, number in OTLP_KINDS.items()}
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for s in scope_spans.get('spans', []):
+                attributes = {a['key']: next(iter(a['value'].values())) for a in s.get('attributes', [])}
+                start, end = int(s['startTimeUnixNano']), int(s['endTimeUnixNano'])
+                yield {
+                    'trace_id': s['traceId'],
+                    'span_id': s['spanId'],
+                    'parent_span_id': s.get('parentSpanId') or None,
+                    'name': s['name'],
+                    'kind': kinds.get(s.get('kind'), INTERNAL),
+                    'start_unix_nano': start,
+                    'end_unix_nano': end,
+                    'duration_ms': round((end - start) / 1e6, 3),
+                    'attributes': attributes,
+                    'error': s.get('status', {}).get('message') if s.get('status', {}).get('code') == 2 else None,
+                    'pid': int(attributes.pop('process.pid', 0))
+                }
+
+
+class Exporter:
+    """Writes finished spans from a background thread, off the request path"""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pid = None
+        self.dropped = 0
+
+    def export(self, spans: List[Span]):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait([s.to_dict() for s in spans])
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        """Once per process (workers fork from a preloaded master)"""
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            time.sleep(Config.TRACE_EXPORT_INTERVAL)
+            self._write(batch + self._drain())
+
+    def _drain(self) -> List[Dict]:
+        spans = []
+        while True:
+            try:
+                spans.extend(self._queue.get_nowait())
+            except queue.Empty:
+                return spans
+
+    def flush(self):
+        spans = self._drain()
+        if spans:
+            self._write(spans)
+
+    def _write(self, spans: List[Dict]):
+        try:
+            if Config.TRACE_EXPORTER == 'otlp':
+                body = json.dumps(otlp_payload(spans)).encode()
+                req = urllib.request.Request(Config.TRACE_OTLP_ENDPOINT, data=body,
+                                             headers={'Content-Type': 'application/json'})
+                urllib.request.urlopen(req, timeout=5).close()
+            else:
+                write_jsonl(Config.TRACE_FILE, spans)
+        except Exception as e:
+            print(f"Trace export failed ({len(spans)} spans): {e}")
+
+
+def write_jsonl(path: str, spans: List[Dict]):
+    """Append whole lines in one write so workers sharing the file don't interleave"""
+    try:
+        if os.path.getsize(path) >= Config.TRACE_FILE_MAX_BYTES:
+            os.replace(path, f'{path}.1')
+    except OSError:
+        pass
+    with open(path, 'a') as f:
+        f.write(''.join(json.dumps(s) + '\n' for s in spans))
+
+
+# Global exporter instance
+exporter = Exporter()
+
+
+def init_tracing(app):
+    """Trace a sample of requests"""
+    if Config.TRACE_SAMPLE_RATE <= 0:
+        return
+    if _observe_query not in query_observers:
+        query_observers.append(_observe_query)
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_end_render, app)
+
+
+# Collector stub and viewer
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != '/v1/traces':
+            self.send_error(404)
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            spans = list(from_otlp(payload))
+        except (ValueError, KeyError) as e:
+            self.send_error(400, str(e))
+            return
+        with self.server.lock:
+            write_jsonl(self.server.output, spans)
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_collector(host: str, port: int, output: str) -> ThreadingHTTPServer:
+    """OTLP/HTTP JSON receiver appending the spans it gets to a JSONL file"""
+    server = ThreadingHTTPServer((host, port), CollectorHandler)
+    server.output, server.lock = output, threading.Lock()
+    return server
+
+
+def collect(host: str, port: int, output: str):
+    server = make_collector(host, port, output)
+    print(f"Collecting OTLP traces on http://{host}:{server.server_address[1]}/v1/traces into {output}")
+    server.serve_forever()
+
+
+def load_traces(path: str) -> Dict[str, List[Dict]]:
+    traces = {}
+    with open(path) as f:
+        for line in f:
+            s = json.loads(line)
+            traces.setdefault(s['trace_id'], []).append(s)
+    return traces
+
+
+def format_trace(spans: List[Dict]) -> str:
+    """Indented span tree with each span's offset into the request and duration"""
+    ids = {s['span_id'] for s in spans}
+    children = {}
+    for s in sorted(spans, key=lambda s: s['start_unix_nano']):
+        parent = s['parent_span_id'] if s['parent_span_id'] in ids else None
+        children.setdefault(parent, []).append(s)
+    roots = children.get(None, [])
+    origin = min(s['start_unix_nano'] for s in spans)
+
+    lines = []
+    def walk(s, depth):
+        label = s['attributes'].get('db.statement') or s['name']
+        error = f"  !! {s['error']}" if s['error'] else ''
+        lines.append(f"{(s['start_unix_nano'] - origin) / 1e6:9.1f}ms {s['duration_ms']:9.1f}ms  "
+                     f"{'  ' * depth}{label[:100]}{error}")
+        for child in children.get(s['span_id'], []):
+            walk(child, depth + 1)
+    for root in roots:
+        walk(root, 0)
+    return '\n'.join(lines)
+
+
+def show(path: str, slowest: int, name: Optional[str]):
+    traces = []
+    for spans in load_traces(path).values():
+        root = next((s for s in spans if s['kind'] == SERVER), None)
+        if root is not None and (name is None or name in root['name']):
+            traces.append((root['duration_ms'], root['name'], spans))
+    for duration, root_name, spans in sorted(traces, key=lambda t: t[0], reverse=True)[:slowest]:
+        print(f"\n{root_name}  {duration:.1f}ms  trace {spans[0]['trace_id']}")
+        print(format_trace(spans))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collect and inspect request traces')
+    commands = parser.add_subparsers(dest='command', required=True)
+    collector = commands.add_parser('collect', help='run an OTLP/HTTP collector stub')
+    collector.add_argument('--host', default='127.0.0.1')
+    collector.add_argument('--port', type=int, default=4318)
+    collector.add_argument('--output', default=Config.TRACE_FILE)
+    viewer = commands.add_parser('show', help='print the slowest traces as span trees')
+    viewer.add_argument('--file', default=Config.TRACE_FILE)
+    viewer.add_argument('--slowest', type=int, default=5)
+    viewer.add_argument('--name', help='only requests whose span name contains this, e.g. buyer_dashboard')
+    args = parser.parse_args()
+
+    if args.command == 'collect':
+        collect(args.host, args.port, args.output)
+    else:
+        show(args.file, args.slowest, args.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cache-friendly serving of uploaded files
+Upload URLs carry a content fingerprint so browsers and shared caches can
+keep them for a year; responses have strong ETags, answer conditional and
+range requests, and can hand the bytes off to a front proxy
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from urllib.parse import quote
+from flask import Response, abort, request, send_file, url_for
+from werkzeug.security import safe_join
+from config import Config
+
+# Hex digits of the SHA-256 used as the URL fingerprint
+FINGERPRINT_LENGTH = 16
+
+# Originals in the content-addressed store (ab/cd/<sha256>.ext) and the
+# variants written next to them (<sha256>_640w.webp). Variants are derived
+# from the original and never rewritten in place, so its hash fingerprints
+# them as well
+STORE_PATH = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})(?:_\d+w)?\.\w+$')
+
+
+@lru_cache(maxsize=4096)
+def _hash_file(path: str, mtime_ns: int, size: int) -> str:
+    """Content fingerprint, memoized per file version (mtime and size are part of the key)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def file_fingerprint(path: str):
+    """Fingerprint of the file at path, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _hash_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+def fingerprint_cache_info():
+    """Hits, misses and size of the fingerprint cache (functools cache_info)"""
+    return _hash_file.cache_info()
+
+
+def upload_fingerprint(filename: str):
+    """
+    Fingerprint of an upload. Read from the name for files in the store, so
+    rendering a page of images touches no files; legacy flat uploads are
+    hashed from disk (None if missing).
+    """
+    match = STORE_PATH.match(filename)
+    if match:
+        return match.group('sha256')[:FINGERPRINT_LENGTH]
+    return file_fingerprint(os.path.join(Config.UPLOAD_FOLDER, filename))
+
+
+def upload_url(filename: str) -> str:
+    """URL for an uploaded file, fingerprinted with its content hash when known"""
+    fingerprint = upload_fingerprint(filename)
+    if fingerprint:
+        return url_for('uploaded_file', filename=filename, v=fingerprint)
+    return url_for('uploaded_file', filename=filename)
+
+
+def send_upload(filename: str) -> Response:
+    """
+    Serve an uploaded file.
+
+    Requests whose ?v= matches the current fingerprint get
+    `Cache-Control: public, max-age=1y, immutable`; anything else must
+    revalidate. The fingerprint doubles as a strong ETag, and
+    If-None-Match / If-Modified-Since / Range are handled by send_file.
+    """
+    # Hidden entries (the store's .tmp staging folder) are never served
+    if any(part.startswith('.') for part in filename.split('/')):
+        abort(404)
+    path = safe_join(Config.UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    fingerprint = upload_fingerprint(filename)
+    immutable = request.args.get('v') == fingerprint
+
+    if Config.UPLOAD_SENDFILE_MODE == 'x-accel':
+        # nginx serves the bytes (and ranges) from its internal location
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.set_etag(fingerprint)
+        response.last_modified = os.path.getmtime(path)
+        response.make_conditional(request)
+        if response.status_code == 200:
+            response.headers['X-Accel-Redirect'] = Config.UPLOAD_ACCEL_PREFIX + quote(filename)
+    else:
+        # With USE_X_SENDFILE set, send_file emits X-Sendfile instead of the body
+        response = send_file(os.path.abspath(path), conditional=True, etag=fingerprint)
+
+    response.cache_control.public = True
+    if immutable:
+        # send_file's conditional mode adds no-cache, which would make browsers revalidate anyway
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = Config.UPLOAD_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+    return response
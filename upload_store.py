@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for uploaded product images
+Uploads are streamed to disk while their SHA-256 is computed and kept
+once per content under hash-prefix sharded directories
+(ab/cd/abcd....jpg); reference counts let deleted products release
+images that nothing else uses
+
+Run directly to move flat legacy uploads into the store:
+    python upload_store.py [--prune]
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from typing import NamedTuple, Optional, Tuple
+from config import Config
+from db import connect_db
+from fragment_cache import bump_catalog_version, init_catalog_tables
+from image_pipeline import init_image_tables, strip_metadata
+from image_worker import enqueue_image_job
+
+# Two levels of 256 directories each
+SHARD_LEVELS = 2
+CHUNK_SIZE = 1024 * 1024
+
+# Temporary files of uploads that never reached commit() are removed after this
+STALE_TEMP_SECONDS = 3600
+
+
+class StagedUpload(NamedTuple):
+    temp_path: str
+    sha256: str
+    extension: str
+    size: int
+
+
+def init_upload_tables(cursor):
+    """Create the blob reference-count table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Sharded path of a blob relative to the upload folder"""
+    shards = [sha256[2 * level:2 * level + 2] for level in range(SHARD_LEVELS)]
+    return '/'.join(shards + [f'{sha256}.{extension}'])
+
+
+def _hash_file(path: str) -> Tuple[str, int]:
+    """Hex SHA-256 and size of a file on disk"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class UploadStore:
+    def __init__(self, upload_folder: str = Config.UPLOAD_FOLDER):
+        self.upload_folder = upload_folder
+        self.temp_folder = os.path.join(upload_folder, '.tmp')
+
+    def stage(self, stream, filename: str) -> StagedUpload:
+        """
+        Stream an upload to a temporary file, hashing it on the way.
+
+        Images with EXIF metadata are then rewritten upright without it and
+        hashed again, so the stored file always matches its content address
+        and re-uploads of the same original still share it.
+
+        Nothing is visible to other requests until commit(), so this can
+        run before slow work (AI story generation) without holding a
+        database write lock.
+        """
+        os.makedirs(self.temp_folder, exist_ok=True)
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_folder)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            if strip_metadata(temp_path):
+                sha256, size = _hash_file(temp_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return StagedUpload(temp_path, sha256, extension, size)
+
+    def commit(self, cursor, staged: StagedUpload) -> Tuple[str, bool]:
+        """
+        Add a reference to a staged upload inside the caller's transaction.
+
+        The file is moved into place while the transaction holds the write
+        lock, so a concurrent release() of the same blob can't delete it
+        underneath us.
+
+        Returns:
+            (path relative to the upload folder, True if the content is new)
+        """
+        cursor.execute('UPDATE upload_blobs SET refcount = refcount + 1 WHERE sha256 = ?', (staged.sha256,))
+        if cursor.rowcount:
+            os.remove(staged.temp_path)
+            cursor.execute('SELECT path FROM upload_blobs WHERE sha256 = ?', (staged.sha256,))
+            return cursor.fetchone()[0], False
+
+        path = blob_path(staged.sha256, staged.extension)
+        cursor.execute('INSERT INTO upload_blobs (sha256, path, size, refcount) VALUES (?, ?, ?, 1)',
+                       (staged.sha256, path, staged.size))
+        full_path = os.path.join(self.upload_folder, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(staged.temp_path, full_path)
+        return path, True
+
+    def discard(self, staged: Optional[StagedUpload]):
+        """Drop a staged upload that won't be committed"""
+        if staged and os.path.exists(staged.temp_path):
+            os.remove(staged.temp_path)
+
+    def release(self, cursor, path: Optional[str]) -> bool:
+        """
+        Drop one reference to a blob and delete it with its variants once
+        unused. Call inside the transaction that removed the reference and
+        commit afterwards. Paths outside the store (legacy flat uploads)
+        are left alone.
+
+        Returns:
+            True if the blob was garbage-collected
+        """
+        if not path:
+            return False
+        cursor.execute('UPDATE upload_blobs SET refcount = refcount - 1 WHERE path = ?', (path,))
+        if not cursor.rowcount:
+            return False
+
+        cursor.execute('SELECT refcount FROM upload_blobs WHERE path = ?', (path,))
+        if cursor.fetchone()[0] > 0:
+            return False
+
+        cursor.execute('SELECT variant FROM image_variants WHERE filename = ?', (path,))
+        files = [path] + [row[0] for row in cursor.fetchall()]
+        cursor.execute('DELETE FROM image_variants WHERE filename = ?', (path,))
+        cursor.execute('DELETE FROM images WHERE filename = ?', (path,))
+        cursor.execute('DELETE FROM image_jobs WHERE filename = ?', (path,))
+        cursor.execute('DELETE FROM upload_blobs WHERE path = ?', (path,))
+
+        for name in files:
+            try:
+                os.remove(os.path.join(self.upload_folder, name))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def purge_stale_temp_files(self) -> int:
+        """Remove temporary files left by uploads that were never committed"""
+        if not os.path.isdir(self.temp_folder):
+            return 0
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        removed = 0
+        for entry in os.scandir(self.temp_folder):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+
+# Global upload store instance
+upload_store = UploadStore()
+
+
+def migrate_legacy_uploads(prune: bool = False, db_path: str = Config.DATABASE_PATH):
+    """
+    Move flat uploads referenced by products into the store, merging
+    duplicates and queueing variants for the new paths.
+
+    Args:
+        prune: Also delete flat files that no product references
+    """
+    folder = upload_store.upload_folder
+    conn = connect_db(db_path)
+    cursor = conn.cursor()
+    init_image_tables(cursor)
+    init_upload_tables(cursor)
+    init_catalog_tables(cursor)
+
+    cursor.execute('''
+        SELECT image_path, COUNT(*) FROM products
+        WHERE image_path IS NOT NULL AND image_path NOT LIKE '%/%'
+        GROUP BY image_path
+    ''')
+    legacy = cursor.fetchall()
+
+    migrated = []
+    for filename, references in legacy:
+        source = os.path.join(folder, filename)
+        if not os.path.isfile(source):
+            print(f"✗ Missing file for {filename}")
+            continue
+
+        with open(source, 'rb') as f:
+            staged = upload_store.stage(f, filename)
+        path, is_new = upload_store.commit(cursor, staged)
+        cursor.execute('UPDATE upload_blobs SET refcount = refcount + ? WHERE path = ?', (references - 1, path))
+        cursor.execute('UPDATE products SET image_path = ? WHERE image_path = ?', (path, filename))
+        if is_new:
+            enqueue_image_job(cursor, path)
+        bump_catalog_version(cursor)
+        conn.commit()
+
+        migrated.append(filename)
+        print(f"✓ {filename} -> {path}" + ("" if is_new else " (duplicate content)"))
+
+    # Flat originals are no longer referenced; their variants are regenerated
+    # next to the stored copy by the image worker
+    flat_files = {entry.name for entry in os.scandir(folder) if entry.is_file()}
+    cursor.execute("SELECT filename FROM images WHERE filename NOT LIKE '%/%'")
+    flat_images = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT DISTINCT image_path FROM products WHERE image_path IS NOT NULL')
+    referenced = {row[0] for row in cursor.fetchall()}
+
+    removable = set(migrated) | ((flat_files | set(flat_images)) - referenced if prune else set())
+    for filename in removable & set(flat_images):
+        cursor.execute('SELECT variant FROM image_variants WHERE filename = ?', (filename,))
+        removable.update(row[0] for row in cursor.fetchall())
+        cursor.execute('DELETE FROM image_variants WHERE filename = ?', (filename,))
+        cursor.execute('DELETE FROM images WHERE filename = ?', (filename,))
+    conn.commit()
+    conn.close()
+
+    removed = 0
+    for filename in removable - referenced:
+        if filename in flat_files:
+            os.remove(os.path.join(folder, filename))
+            removed += 1
+
+    print(f"\nMigrated {len(migrated)} of {len(legacy)} referenced uploads, "
+          f"removed {removed} flat files")
+    kept = len(flat_files) - removed
+    if kept and not prune:
+        print(f"{kept} unreferenced flat files kept; rerun with --prune to delete them")
+    print(f"Removed {upload_store.purge_stale_temp_files()} stale temporary files")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Move flat uploads into the content-addressed store')
+    parser.add_argument('--prune', action='store_true', help='delete flat files no product references')
+    args = parser.parse_args()
+    migrate_legacy_uploads(prune=args.prune)